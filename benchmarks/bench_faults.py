@@ -0,0 +1,172 @@
+"""
+上流の障害を注入したときのリトライ・バックオフと劣化時の挙動のベンチマーク
+
+偽 OpenWeather サーバー（fake_openweather.py）に障害を注入し、シナリオごとに API サーバーを起動して
+load_test.py と同じ複数ターンの会話・/weather/query で負荷をかける。
+
+シナリオ:
+  baseline     障害なし
+  429_burst    5秒ごとに1.5秒間、すべての応答が 429
+  503_storm    60% の応答が 503
+  slow         20% の応答が 3秒遅れる
+  hang         5% の応答が 12秒遅れる（クライアントのタイムアウト 10秒を超える）
+  reset        10% の応答がヘッダー送信後に切断される
+
+計測:
+  - ルートごとの p50/p95/p99 レイテンシと、ユーザーに見えるエラーの割合
+  - 上流への試行回数（偽サーバーの集計、リトライを含む）と1リクエストあたりの回数
+  - リトライ回数（aerocast_retries_total）
+  - ワーカースレッドの使用状況（aerocast_worker_threads を一定間隔で取得した最大・平均）
+
+使い方:
+  python benchmarks/bench_faults.py
+  python benchmarks/bench_faults.py --scenario 503_storm --scenario reset --users 30 --duration 20
+  python benchmarks/bench_faults.py --output faults.json
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from load_test import run_load, spawn_servers, stop_servers
+
+SCENARIOS: dict[str, list[str]] = {
+    "baseline": [],
+    "429_burst": ["429:rate=1,period=5,duty=0.3"],
+    "503_storm": ["503:rate=0.6"],
+    "slow": ["slow:rate=0.2,delay_ms=3000"],
+    "hang": ["slow:rate=0.05,delay_ms=12000"],
+    "reset": ["reset:rate=0.1"],
+}
+
+_SAMPLE_RE = re.compile(r'^(aerocast_[a-z_]+)(?:\{([^}]*)\})? (\S+)$')
+
+
+def parse_metrics(text: str) -> dict[tuple[str, tuple], float]:
+    """Prometheus のテキスト形式から (名前, ラベル) → 値"""
+    samples = {}
+    for line in text.splitlines():
+        m = _SAMPLE_RE.match(line)
+        if not m:
+            continue
+        labels = tuple(sorted(re.findall(r'(\w+)="([^"]*)"', m.group(2) or "")))
+        samples[(m.group(1), labels)] = float(m.group(3))
+    return samples
+
+
+def _retries_total(samples: dict) -> float:
+    return sum(v for (name, _), v in samples.items() if name == "aerocast_retries_total")
+
+
+def _worker_threads(samples: dict) -> dict[str, float]:
+    return {
+        f"{dict(labels)['pool']}_{dict(labels)['state']}": v
+        for (name, labels), v in samples.items()
+        if name == "aerocast_worker_threads"
+    }
+
+
+async def _scrape(client: httpx.AsyncClient) -> dict:
+    return parse_metrics((await client.get("/metrics")).text)
+
+
+async def sample_threads(app_url: str, stop: asyncio.Event, interval: float) -> dict[str, list[float]]:
+    """stop まで aerocast_worker_threads を一定間隔で取得する"""
+    series: dict[str, list[float]] = defaultdict(list)
+    async with httpx.AsyncClient(base_url=app_url, timeout=5) as client:
+        while not stop.is_set():
+            try:
+                for key, value in _worker_threads(await _scrape(client)).items():
+                    series[key].append(value)
+            except httpx.HTTPError:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+    return series
+
+
+async def run_scenario(app_url: str, fake_url: str, args) -> dict:
+    async with httpx.AsyncClient(base_url=app_url, timeout=5) as client:
+        retries_before = _retries_total(await _scrape(client))
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_threads(app_url, stop, args.sample_interval))
+    try:
+        result = await run_load(app_url, fake_url, args.users, args.duration, args.query_ratio, args.seed)
+    finally:
+        stop.set()
+        series = await sampler
+
+    async with httpx.AsyncClient(base_url=app_url, timeout=5) as client:
+        retries_after = _retries_total(await _scrape(client))
+
+    result["upstream_attempts"] = sum(result["upstream_calls"].values())
+    result["retries"] = retries_after - retries_before
+    result["worker_threads"] = {
+        key: {"max": max(values), "mean": sum(values) / len(values)}
+        for key, values in sorted(series.items())
+        if values
+    }
+    return result
+
+
+def print_scenario(name: str, result: dict) -> None:
+    print(f"== {name}  ({result['requests']} requests, {result['throughput_rps']:.1f} req/s)")
+    print(f"  {'route':<16} {'requests':>9} {'error %':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, r in result["routes"].items():
+        error_pct = r["errors"] / r["requests"] * 100 if r["requests"] else 0.0
+        print(
+            f"  {route:<16} {r['requests']:>9} {error_pct:>8.1f} "
+            f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}"
+        )
+    print(
+        f"  upstream attempts: {result['upstream_attempts']} "
+        f"({result['upstream_calls_per_request']:.2f} per request), retries: {result['retries']:.0f}"
+    )
+    threads = ", ".join(
+        f"{key} max={v['max']:.0f} mean={v['mean']:.1f}" for key, v in result["worker_threads"].items()
+    )
+    print(f"  worker threads: {threads}")
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Fault-injection benchmark")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="実行するシナリオ（省略時はすべて）")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="シナリオごとに負荷をかける時間（秒）")
+    parser.add_argument("--query-ratio", type=float, default=0.2)
+    parser.add_argument("--latency", default="lognormal:60,0.5", help="障害のない応答の遅延の分布")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--sample-interval", type=float, default=0.25, help="スレッド使用状況の取得間隔（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果を JSON で保存するパス")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        fake_args = ["--latency", args.latency, "--seed", str(args.seed)]
+        for spec in SCENARIOS[name]:
+            fake_args += ["--fault", spec]
+        app_url, fake_url, procs = spawn_servers(fake_args, args.workers)
+        try:
+            results[name] = asyncio.run(run_scenario(app_url, fake_url, args))
+        finally:
+            stop_servers(procs)
+        print_scenario(name, results[name])
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
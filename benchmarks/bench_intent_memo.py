@@ -0,0 +1,96 @@
+"""
+意図解析キャッシュの効果を問い合わせログの再生で測るベンチマーク
+
+問い合わせログ（1行1件、または JSONL の "message" / "input"）を normalize_user_input →
+parse_weather_intent に順に流し、キャッシュなし / ありの requests/sec とヒット率を比べる。
+ログを指定しない場合は、実際のチャットに近い偏り（Zipf 分布）を持つログを生成する。
+
+使い方:
+  python benchmarks/bench_intent_memo.py
+  python benchmarks/bench_intent_memo.py --requests 500000 --distinct 5000
+  python benchmarks/bench_intent_memo.py --log queries.jsonl
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(src_path))
+
+from aerocast import intent_parser
+from aerocast.intent_parser import IntentMemo, parse_weather_intent
+from aerocast.metrics import cache_requests
+from aerocast.preprocessor import normalize_user_input
+
+_TIMES = ["", "今日の", "明日の", "明後日の", "週末の", "3日後の"]
+_CITIES = ["東京", "札幌", "那覇市", "大阪", "名古屋", "福岡", "ニューヨーク", "大阪府堺市"]
+_TRIGGERS = ["の天気", "の天気予報", "は雨", "の気温", "は寒い"]
+_ENDINGS = ["", "？", "教えて", "を教えて下さい。", "について知りたい"]
+
+
+def make_log(n: int, distinct: int, seed: int) -> list[str]:
+    """上位の問い合わせほど多く届く（Zipf 分布）ログを生成する"""
+    rng = random.Random(seed)
+    queries = ["".join(p) for p in itertools.product(_TIMES, _CITIES, _TRIGGERS, _ENDINGS)]
+    rng.shuffle(queries)
+    queries = queries[:distinct]
+    weights = [1.0 / rank for rank in range(1, len(queries) + 1)]
+    return rng.choices(queries, weights=weights, k=n)
+
+
+def load_log(path: str) -> list[str]:
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                line = record.get("message") or record.get("input") or ""
+            queries.append(line)
+    return queries
+
+
+def replay(queries: list[str], memo_size: int) -> tuple[float, float]:
+    """ログを再生し、(requests/sec, ヒット率) を返す"""
+    intent_parser._memo = IntentMemo(memo_size)
+    hits = cache_requests.labels("intent", "hit")
+    misses = cache_requests.labels("intent", "miss")
+    hits_before, misses_before = hits.value(), misses.value()
+
+    start = time.perf_counter()
+    for q in queries:
+        parse_weather_intent(normalize_user_input(q))
+    elapsed = time.perf_counter() - start
+
+    hit_count = hits.value() - hits_before
+    total = hit_count + misses.value() - misses_before
+    return len(queries) / elapsed, hit_count / total if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent memo replay benchmark")
+    parser.add_argument("--log", help="問い合わせログ（1行1件 or JSONL）")
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=1000, help="生成するログの異なる問い合わせ数")
+    parser.add_argument("--memo-size", type=int, default=intent_parser.DEFAULT_INTENT_MEMO_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = load_log(args.log) if args.log else make_log(args.requests, args.distinct, args.seed)
+    print(f"requests={len(queries)} distinct={len(set(queries))} memo_size={args.memo_size}")
+
+    for label, size in (("no memo", 0), ("memo", args.memo_size)):
+        runs = [replay(queries, size) for _ in range(args.repeat)]
+        best_rps = max(rps for rps, _ in runs)
+        print(f"{label:>8}: {best_rps:,.0f} requests/sec (best of {args.repeat}), hit ratio {runs[0][1]:.1%}")
+
+
+if __name__ == "__main__":
+    main()
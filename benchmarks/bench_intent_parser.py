@@ -0,0 +1,57 @@
+"""
+入力の正規化と意図解析のスループットベンチマーク
+
+normalize_user_input → parse_weather_intent を、実際の問い合わせに近い入力の列に対して実行し、
+1秒あたりの処理件数（requests/sec）を測る。
+解析結果のキャッシュは無効にして、毎回の解析の速さを測る（キャッシュの効果は bench_intent_memo.py）。
+
+使い方:
+  python benchmarks/bench_intent_parser.py
+  python benchmarks/bench_intent_parser.py --requests 200000 --repeat 5
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(src_path))
+os.environ.setdefault("AEROCAST_INTENT_MEMO_SIZE", "0")
+
+from aerocast.intent_parser import parse_weather_intent
+from aerocast.preprocessor import normalize_user_input
+
+_TIMES = ["", "今日の", "明日の", "明後日の", "3日後の"]
+_CITIES = ["東京", "札幌", "那覇市", "ニューヨーク", "大阪府堺市"]
+_TRIGGERS = ["の天気", "の天気予報", "は雨", "の気温"]
+_ENDINGS = ["", "？", "教えて", "を教えて下さい。", "について知りたい"]
+
+
+def make_queries(n: int) -> list[str]:
+    queries = ["".join(p) for p in itertools.product(_TIMES, _CITIES, _TRIGGERS, _ENDINGS)]
+    return list(itertools.islice(itertools.cycle(queries), n))
+
+
+def run_once(queries: list[str]) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        parse_weather_intent(normalize_user_input(q))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent parser throughput benchmark")
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    queries = make_queries(args.requests)
+    best = max(run_once(queries) for _ in range(args.repeat))
+    print(f"requests={args.requests}")
+    print(f"normalize + parse: {best:,.0f} requests/sec (best of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
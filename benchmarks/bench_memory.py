@@ -0,0 +1,248 @@
+"""
+セッション・キャッシュ・WeatherResult の1件あたりのメモリ使用量ベンチマーク
+
+N 件ずつ作って保持し、tracemalloc で増えたバイト数を1件あたりに割る。
+あわせて、保持されているメモリの確保元（ファイル:行）の上位を表示する。
+解放された領域が free list から再利用されると、最初に確保した行に数えられることがある（合計は正確）。
+
+  session         SessionManager（InMemorySessionBackend）に保存したセッション
+  weather_result  forecast API のレスポンスから作った WeatherResult（保持するリストを含む）
+  render_cache    地点ごとに組み立てた返信（RenderCache のキーと RenderedReply）
+  llm_cache       LLM の整形結果（SlotTTLCache のキーと Markdown）
+  intent_memo     発話の解析結果（IntentMemo のキーと WeatherIntent）
+
+入力（セッションID・都市名・発話・API のレスポンス）は計測の前に作るため、1件あたりの値には含まない。
+時刻はフィクスチャの取得時刻（weather_tokyo.json の dt）に固定する。
+BUDGETS は1件あたりの上限（バイト）で、--check では超えた項目があれば終了コード 1 で終わる。
+tests/test_memory_budget.py も同じ上限で確認する。
+
+使い方:
+  python benchmarks/bench_memory.py                        # 各 20,000 件
+  python benchmarks/bench_memory.py --items 20000 --top 5
+  python benchmarks/bench_memory.py --scenario render_cache --check
+"""
+import argparse
+import gc
+import hashlib
+import json
+import sys
+import sysconfig
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+from unittest.mock import patch
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(src_path))
+
+from aerocast import advice_engine, intent_parser, render_cache, weather_api, weather_summary
+from aerocast.intent_parser import IntentMemo, parse_weather_intent
+from aerocast.llm_cache import SlotTTLCache
+from aerocast.render_cache import RenderCache, render_reply
+from aerocast.session import InMemorySessionBackend, SessionManager
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+CITIES = ["東京", "大阪", "札幌", "福岡", "名古屋", "那覇", "仙台", "広島"]
+_WHEN = ["今日", "明日", "明後日", "3日後", "4日後"]
+
+# 1件あたりの上限（バイト）。20,000 件での計測値に3割ほどの余裕を持たせた値
+BUDGETS: dict[str, int] = {
+    "session": 200,
+    "weather_result": 260,
+    "render_cache": 2000,
+    "llm_cache": 900,
+    "intent_memo": 400,
+}
+
+
+# datetime.now を使うモジュール
+_CLOCK_MODULES = (weather_api, weather_summary, advice_engine, render_cache)
+
+
+def frozen_clock() -> ExitStack:
+    """各モジュールの datetime.now をフィクスチャの取得時刻に固定する"""
+    current = json.loads((FIXTURES / "weather_tokyo.json").read_text(encoding="utf-8"))
+    at = datetime.fromtimestamp(current["dt"], tz=timezone.utc)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return at.astimezone(tz) if tz else at.replace(tzinfo=None)
+
+    stack = ExitStack()
+    for module in _CLOCK_MODULES:
+        stack.enter_context(patch.object(module, "datetime", FrozenDatetime))
+    return stack
+
+
+def _forecast() -> dict:
+    return json.loads((FIXTURES / "forecast_tokyo.json").read_text(encoding="utf-8"))
+
+
+def _city_names(n: int) -> list[str]:
+    """地点ごとに異なる都市名（キャッシュのキーが重ならないようにする）"""
+    return [f"{CITIES[i % len(CITIES)]}{i}" for i in range(n)]
+
+
+def _weather_results(n: int) -> list:
+    forecast = _forecast()
+    return [weather_api._parse_forecast_weather(city, forecast, 1 + i % 4) for i, city in enumerate(_city_names(n))]
+
+
+def setup_session(n: int) -> Callable[[], object]:
+    session_ids = [f"session-{i:08d}" for i in range(n)]
+
+    def build():
+        manager = SessionManager(InMemorySessionBackend())
+        for i, sid in enumerate(session_ids):
+            with manager.session(sid) as context:
+                context.update(city=CITIES[i % len(CITIES)], days=i % 6, intent="forecast")
+        return manager
+
+    return build
+
+
+def setup_weather_result(n: int) -> Callable[[], object]:
+    forecast = _forecast()
+    cities = _city_names(n)
+
+    def build():
+        return [weather_api._parse_forecast_weather(city, forecast, 1 + i % 4) for i, city in enumerate(cities)]
+
+    return build
+
+
+def setup_render_cache(n: int) -> Callable[[], object]:
+    results = _weather_results(n)
+
+    def build():
+        cache = RenderCache(maxsize=n)
+        with patch.object(render_cache, "_cache", cache):
+            for w in results:
+                render_reply(w, days_offset=1)
+        return cache
+
+    return build
+
+
+def setup_llm_cache(n: int) -> Callable[[], object]:
+    results = _weather_results(n)
+
+    def build():
+        cache = SlotTTLCache(maxsize=n)
+        for w in results:
+            markdown = render_cache._render(w, 1).markdown
+            cache.put(hashlib.sha256(markdown.encode("utf-8")).hexdigest(), markdown)
+        return cache
+
+    return build
+
+
+def setup_intent_memo(n: int) -> Callable[[], object]:
+    texts = [f"{city}の{_WHEN[i % len(_WHEN)]}の天気" for i, city in enumerate(_city_names(n))]
+
+    def build():
+        memo = IntentMemo(maxsize=n)
+        with patch.object(intent_parser, "_memo", memo):
+            for text in texts:
+                parse_weather_intent(text)
+        return memo
+
+    return build
+
+
+SCENARIOS: dict[str, Callable[[int], Callable[[], object]]] = {
+    "session": setup_session,
+    "weather_result": setup_weather_result,
+    "render_cache": setup_render_cache,
+    "llm_cache": setup_llm_cache,
+    "intent_memo": setup_intent_memo,
+}
+
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def measure(name: str, n: int, top: int = 10) -> dict:
+    """
+    1件あたりのバイト数と、保持されているメモリの確保元の上位。
+    遅延して読み込まれるもの（判定テーブル・正規表現など）を数えないよう、先に少数で一度作っておく。
+    """
+    setup = SCENARIOS[name]
+    with frozen_clock():
+        setup(min(n, 8))()
+        build = setup(n)
+        gc.collect()
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        held = build()
+        gc.collect()
+        after = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        tracemalloc.stop()
+
+    stats = after.compare_to(before, "lineno")
+    total = sum(stat.size_diff for stat in stats)
+    sites = [
+        {
+            "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "bytes": stat.size_diff,
+            "blocks": stat.count_diff,
+        }
+        for stat in sorted(stats, key=lambda s: s.size_diff, reverse=True)[:top]
+        if stat.size_diff > 0
+    ]
+    del held
+    return {"items": n, "bytes": total, "bytes_per_item": total / n, "top_sites": sites}
+
+
+def _short(site: str) -> str:
+    """確保元のパスをリポジトリ・標準ライブラリからの相対表記にする"""
+    for root in (str(src_path), sysconfig.get_paths()["stdlib"]):
+        prefix = root + "/"
+        if site.startswith(prefix):
+            return site[len(prefix):]
+    return site
+
+
+def print_report(results: dict[str, dict]) -> None:
+    for name, r in results.items():
+        budget = BUDGETS.get(name)
+        status = "" if budget is None else f"  (budget {budget:,} {'OK' if r['bytes_per_item'] <= budget else 'OVER'})"
+        print(f"== {name}: {r['bytes_per_item']:,.1f} bytes/item, {r['bytes'] / 1024 / 1024:,.1f} MiB "
+              f"for {r['items']:,} items{status}")
+        for site in r["top_sites"]:
+            print(f"  {site['bytes'] / r['items']:>9,.1f} B/item {site['blocks']:>10,} blocks  {_short(site['site'])}")
+
+
+def over_budget(results: dict[str, dict]) -> list[str]:
+    return [name for name, r in results.items() if name in BUDGETS and r["bytes_per_item"] > BUDGETS[name]]
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Memory footprint benchmark")
+    parser.add_argument("--items", type=int, default=20_000, help="各シナリオで作る件数")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="実行するシナリオ（省略時はすべて）")
+    parser.add_argument("--top", type=int, default=10, help="表示する確保元の数")
+    parser.add_argument("--check", action="store_true", help="1件あたりの上限（BUDGETS）を超えたら終了コード 1")
+    parser.add_argument("--output", help="結果を JSON で保存するパス")
+    args = parser.parse_args(argv)
+
+    results = {name: measure(name, args.items, args.top) for name in args.scenario or list(SCENARIOS)}
+    print_report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.check:
+        over = over_budget(results)
+        if over:
+            print(f"budget exceeded: {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+パイプラインの段階ごとのマイクロベンチマーク（ネットワークなし）
+
+記録済みのフィクスチャ（benchmarks/fixtures/）を入力に、各段階の1件あたりの所要時間を測る。
+時刻はフィクスチャの取得時刻（weather_tokyo.json の dt）に固定するため、予報枠の選択も毎回同じになる。
+
+  normalize        normalize_user_input（問い合わせログ）
+  parse_intent     parse_weather_intent（キャッシュなし）
+  decode_forecast  forecast API のレスポンス（JSON 文字列）の読み込み
+  parse_current    weather API のレスポンス → WeatherResult
+  parse_forecast   forecast API のレスポンス → 指定日の枠の選択 → WeatherResult
+  select_nowcast   forecast API のレスポンスから直近の枠の選択
+  rules            decide_all
+  build_summary    build_summary
+  build_advice     build_advice（判定済みの結果を渡す）
+  markdown         format_to_markdown
+  asdict           dataclasses.asdict(WeatherResult)
+  serialize        /weather/query 相当のレスポンスの JSON 化
+
+使い方:
+  python benchmarks/bench_pipeline.py
+  python benchmarks/bench_pipeline.py --output baseline.json
+  python benchmarks/bench_pipeline.py --compare baseline.json --threshold 0.2
+  python benchmarks/bench_pipeline.py --stage parse_forecast --stage rules
+
+--compare では、いずれかの段階が基準より threshold（割合）を超えて遅くなった場合に終了コード 1 で終わる。
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+from unittest.mock import patch
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(src_path))
+os.environ.setdefault("AEROCAST_INTENT_MEMO_SIZE", "0")
+
+from aerocast import weather_api, weather_summary
+from aerocast.advice_engine import build_advice
+from aerocast.formatter import format_to_markdown
+from aerocast.intent_parser import parse_weather_intent
+from aerocast.preprocessor import normalize_user_input
+from aerocast.rules import decide_all
+from aerocast.weather_summary import build_summary
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+FORECAST_DAYS = (1, 2, 3, 4)
+
+
+def load_fixtures(fixtures: Path = FIXTURES) -> dict:
+    queries = [
+        line.strip()
+        for line in (fixtures / "queries.txt").read_text(encoding="utf-8").splitlines()
+        if line.strip()
+    ]
+    forecast_text = (fixtures / "forecast_tokyo.json").read_text(encoding="utf-8")
+    current = json.loads((fixtures / "weather_tokyo.json").read_text(encoding="utf-8"))
+    return {
+        "queries": queries,
+        "forecast_text": forecast_text,
+        "forecast": json.loads(forecast_text),
+        "current": current,
+        "captured_at": datetime.fromtimestamp(current["dt"], tz=timezone.utc),
+    }
+
+
+def frozen_datetime(at: datetime) -> type:
+    """now() が常に at を返す datetime"""
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return at.astimezone(tz) if tz else at.replace(tzinfo=None)
+
+    return FrozenDatetime
+
+
+def build_stages(fx: dict) -> dict[str, tuple[Callable[[], object], int]]:
+    """段階名 → (1回分の処理, 1回あたりの件数)"""
+    queries = fx["queries"]
+    normalized = [normalize_user_input(q) for q in queries]
+    forecast_text = fx["forecast_text"]
+    forecast = fx["forecast"]
+    current = fx["current"]
+
+    results = [weather_api._parse_current_weather("東京", current)]
+    results += [weather_api._parse_forecast_weather("東京", forecast, d) for d in FORECAST_DAYS]
+    offsets = (0,) + FORECAST_DAYS
+    decisions = [decide_all(w) for w in results]
+    summaries = [build_summary(w, days_offset=d) for w, d in zip(results, offsets)]
+    advices = [
+        build_advice(w, umbrella=u, wind=wi, comfort=c)
+        for w, (u, wi, c) in zip(results, decisions)
+    ]
+    responses = [
+        {
+            "reply": format_to_markdown(s, a),
+            "location": w.city,
+            "forecast": asdict(w),
+            "judgement": {"umbrella": asdict(u), "wind": asdict(wi), "comfort": asdict(c)},
+        }
+        for w, s, a, (u, wi, c) in zip(results, summaries, advices, decisions)
+    ]
+
+    return {
+        "normalize": (lambda: [normalize_user_input(q) for q in queries], len(queries)),
+        "parse_intent": (lambda: [parse_weather_intent(q) for q in normalized], len(normalized)),
+        "decode_forecast": (lambda: json.loads(forecast_text), 1),
+        "parse_current": (lambda: weather_api._parse_current_weather("東京", current), 1),
+        "parse_forecast": (
+            lambda: [weather_api._parse_forecast_weather("東京", forecast, d) for d in FORECAST_DAYS],
+            len(FORECAST_DAYS),
+        ),
+        "select_nowcast": (lambda: weather_api._parse_nowcast(forecast), 1),
+        "rules": (lambda: [decide_all(w) for w in results], len(results)),
+        "build_summary": (
+            lambda: [build_summary(w, days_offset=d) for w, d in zip(results, offsets)],
+            len(results),
+        ),
+        "build_advice": (
+            lambda: [
+                build_advice(w, umbrella=u, wind=wi, comfort=c)
+                for w, (u, wi, c) in zip(results, decisions)
+            ],
+            len(results),
+        ),
+        "markdown": (lambda: [format_to_markdown(s, a) for s, a in zip(summaries, advices)], len(results)),
+        "asdict": (lambda: [asdict(w) for w in results], len(results)),
+        "serialize": (lambda: [json.dumps(r, ensure_ascii=False) for r in responses], len(responses)),
+    }
+
+
+def measure(fn: Callable[[], object], ops: int, repeat: int, min_time: float) -> dict:
+    """1件あたりの所要時間（ns、repeat 回の最小値）"""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return {
+        "ns_per_op": best / (number * ops) * 1e9,
+        "ops_per_call": ops,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def run(stage_names: list[str], repeat: int, min_time: float) -> dict:
+    fx = load_fixtures()
+    clock = frozen_datetime(fx["captured_at"])
+    with patch.object(weather_api, "datetime", clock), patch.object(weather_summary, "datetime", clock):
+        stages = build_stages(fx)
+        unknown = [name for name in stage_names if name not in stages]
+        if unknown:
+            raise SystemExit(f"unknown stage: {', '.join(unknown)} (choose from {', '.join(stages)})")
+        results = {
+            name: measure(fn, ops, repeat, min_time)
+            for name, (fn, ops) in stages.items()
+            if not stage_names or name in stage_names
+        }
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "captured_at": fx["captured_at"].isoformat(),
+        "stages": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """基準と比べて表を出力し、threshold を超えて遅くなった段階名を返す"""
+    regressions = []
+    print(f"{'stage':<16} {'baseline ns':>12} {'current ns':>12} {'change':>8}")
+    for name, result in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if base is None:
+            print(f"{name:<16} {'-':>12} {result['ns_per_op']:>12.0f} {'new':>8}")
+            continue
+        ratio = result["ns_per_op"] / base["ns_per_op"]
+        mark = ""
+        if ratio > 1.0 + threshold:
+            regressions.append(name)
+            mark = "  REGRESSION"
+        print(f"{name:<16} {base['ns_per_op']:>12.0f} {result['ns_per_op']:>12.0f} {ratio - 1.0:>+8.1%}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline stage benchmark")
+    parser.add_argument("--stage", action="append", default=[], help="測る段階（複数指定可、省略時はすべて）")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="1回の計測の最短時間（秒）")
+    parser.add_argument("--output", help="結果を JSON で保存するパス")
+    parser.add_argument("--compare", help="比較する基準の JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="許容する遅くなる割合（0.2 = 20%%）")
+    args = parser.parse_args()
+
+    result = run(args.stage, args.repeat, args.min_time)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"regressed beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        return
+
+    print(f"{'stage':<16} {'ns/op':>10} {'ops/sec':>12}")
+    for name, r in result["stages"].items():
+        print(f"{name:<16} {r['ns_per_op']:>10.0f} {1e9 / r['ns_per_op']:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
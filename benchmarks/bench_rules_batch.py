@@ -0,0 +1,70 @@
+"""
+判断ルールの一括評価ベンチマーク
+
+同じ予報枠の列を rules.py（1件ずつ、dataclass を生成）と rules_batch.py（NumPy）で判定し、
+所要時間を比較する。
+
+使い方:
+  python benchmarks/bench_rules_batch.py
+  python benchmarks/bench_rules_batch.py --slots 100000 --repeat 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(src_path))
+
+from aerocast.models import WeatherResult
+from aerocast.rules import decide_all
+from aerocast.rules_batch import decide_batch, columns_from_results
+
+
+def make_slots(n: int, seed: int = 0) -> list[WeatherResult]:
+    rng = np.random.default_rng(seed)
+    pop = rng.integers(0, 101, n)
+    wind = rng.uniform(0, 25, n).round(1)
+    feels_like = rng.uniform(-15, 40, n).round(1)
+    return [
+        WeatherResult(
+            city="東京", weather="晴れ", temp=float(f), feels_like=float(f), humidity=60,
+            rain_probability=int(p), wind_speed=float(w), type="forecast",
+        )
+        for p, w, f in zip(pop, wind, feels_like)
+    ]
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch rules benchmark")
+    parser.add_argument("--slots", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    slots = make_slots(args.slots)
+    pop, wind, feels_like = columns_from_results(slots)
+
+    scalar = best_of(args.repeat, lambda: [decide_all(w) for w in slots])
+    batch = best_of(args.repeat, lambda: decide_batch(pop, wind, feels_like))
+    with_columns = best_of(args.repeat, lambda: decide_batch(*columns_from_results(slots)))
+
+    print(f"slots={args.slots}")
+    print(f"{'':<28} {'ms (best)':>10} {'speedup':>8}")
+    print(f"{'scalar (decide_all)':<28} {scalar * 1000:>10.2f} {1.0:>7.1f}x")
+    print(f"{'batch (arrays)':<28} {batch * 1000:>10.2f} {scalar / batch:>7.1f}x")
+    print(f"{'batch (from WeatherResult)':<28} {with_columns * 1000:>10.2f} {scalar / with_columns:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+セッションバックエンドの1ターンあたりのオーバーヘッド計測
+
+session() の読み込み → 更新 → 保存 を繰り返し、1ターンあたりの平均時間を表示する。
+
+使い方:
+  python benchmarks/bench_session_backend.py
+  python benchmarks/bench_session_backend.py --turns 50000 --sessions 1000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(src_path))
+
+from aerocast.session import InMemorySessionBackend, SessionManager, SQLiteSessionBackend
+
+
+def run_turns(manager: SessionManager, turns: int, sessions: int) -> float:
+    """1ターンあたりの平均時間（マイクロ秒）を返す"""
+    start = time.perf_counter()
+    for i in range(turns):
+        with manager.session(f"session-{i % sessions}") as context:
+            context.update(city="東京", days=i % 6, intent="forecast")
+    return (time.perf_counter() - start) / turns * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session backend per-turn overhead")
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--sessions", type=int, default=1000)
+    args = parser.parse_args()
+
+    memory = SessionManager(InMemorySessionBackend())
+    print(f"memory: {run_turns(memory, args.turns, args.sessions):8.2f} us/turn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite = SessionManager(SQLiteSessionBackend(str(Path(tmp) / "sessions.db")))
+        # 1周目は行の作成、2周目以降は既存行の読み書き
+        run_turns(sqlite, args.sessions, args.sessions)
+        sqlite.backend.flush()
+        print(f"sqlite: {run_turns(sqlite, args.turns, args.sessions):8.2f} us/turn")
+        sqlite.close()
+
+
+if __name__ == "__main__":
+    main()
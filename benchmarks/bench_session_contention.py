@@ -0,0 +1,78 @@
+"""
+セッションマネージャーの競合ベンチマーク
+
+複数スレッドから get_context / session / clear_session を混ぜて呼び、
+シャード数（1 = 単一ロック相当）ごとのスループットを比較する。
+
+使い方:
+  python benchmarks/bench_session_contention.py
+  python benchmarks/bench_session_contention.py --threads 32 --sessions 10000 --ops 20000
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(src_path))
+
+from aerocast.session import SessionManager
+
+
+def _worker(manager: SessionManager, session_ids: list[str], ops: int, seed: int, barrier: threading.Barrier):
+    rnd = random.Random(seed)
+    barrier.wait()
+    for i in range(ops):
+        sid = session_ids[rnd.randrange(len(session_ids))]
+        r = i % 20
+        if r == 0:
+            manager.clear_session(sid)
+        elif r < 10:
+            with manager.session(sid) as context:
+                context.update(city="東京", days=(context.last_days or 0) % 5 + 1)
+        else:
+            manager.get_context(sid)
+
+
+def run_once(num_shards: int, threads: int, sessions: int, ops: int) -> float:
+    """1回分を実行し、ops/sec を返す"""
+    manager = SessionManager(num_shards=num_shards)
+    session_ids = [f"session-{i}" for i in range(sessions)]
+    barrier = threading.Barrier(threads + 1)
+    workers = [
+        threading.Thread(target=_worker, args=(manager, session_ids, ops, seed, barrier))
+        for seed in range(threads)
+    ]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SessionManager contention benchmark")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--ops", type=int, default=20000, help="スレッドあたりの操作回数")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"threads={args.threads} sessions={args.sessions} ops/thread={args.ops}")
+    print(f"{'shards':>8} {'ops/sec (best)':>16}")
+    for shards in args.shards:
+        best = max(
+            run_once(shards, args.threads, args.sessions, args.ops)
+            for _ in range(args.repeat)
+        )
+        print(f"{shards:>8} {best:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
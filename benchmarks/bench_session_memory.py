@@ -0,0 +1,103 @@
+"""
+セッション文脈のメモリ使用量ベンチマーク
+
+N 件のセッションを InMemorySessionBackend に保存し、tracemalloc で
+1セッションあたりのバイト数を計測する。比較のため、従来の dataclass 表現
+（__dict__・datetime・セッションごとの timedelta）も同じ条件で計測する。
+
+使い方:
+  python benchmarks/bench_session_memory.py              # 1,000,000 セッション
+  python benchmarks/bench_session_memory.py --sessions 100000
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(src_path))
+
+from aerocast.session import ConversationContext, InMemorySessionBackend
+
+CITIES = ["東京", "大阪", "札幌", "福岡", "名古屋", "那覇", "仙台", "広島"]
+
+
+@dataclass
+class LegacyConversationContext:
+    """比較用: 変更前の ConversationContext と同じ表現"""
+    last_city: Optional[str] = None
+    last_days: Optional[int] = None
+    last_intent: Optional[str] = None
+    last_updated: Optional[datetime] = None
+    session_timeout: timedelta = field(default_factory=lambda: timedelta(minutes=30))
+
+    def update(self, city=None, days=None, intent=None):
+        if city is not None:
+            self.last_city = city
+        if days is not None:
+            self.last_days = days
+        if intent is not None:
+            self.last_intent = intent
+        self.last_updated = datetime.now()
+
+
+def _city(i: int) -> str:
+    # API から来る文字列と同様、毎回別オブジェクトとして作る
+    return "".join(list(CITIES[i % len(CITIES)]))
+
+
+def measure_contexts(factory, n: int) -> float:
+    """文脈オブジェクトのみの1件あたりのバイト数"""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    items = []
+    for i in range(n):
+        context = factory()
+        context.update(city=_city(i), days=i % 6, intent="forecast")
+        items.append(context)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # リスト本体の分（1要素8バイト）は除く
+    return (after - before) / n - 8
+
+
+def measure_backend(n: int) -> float:
+    """セッションID・シャード辞書を含めた1セッションあたりのバイト数"""
+    session_ids = [f"session-{i:08d}" for i in range(n)]
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    backend = InMemorySessionBackend()
+    for i, sid in enumerate(session_ids):
+        context = ConversationContext()
+        context.update(city=_city(i), days=i % 6, intent="forecast")
+        backend.save(sid, context)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert backend.count() == n
+    return (after - before) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ConversationContext memory benchmark")
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    args = parser.parse_args()
+    n = args.sessions
+
+    legacy = measure_contexts(LegacyConversationContext, n)
+    compact = measure_contexts(ConversationContext, n)
+    backend = measure_backend(n)
+
+    print(f"sessions={n:,}")
+    print(f"legacy dataclass context : {legacy:8.1f} bytes/session")
+    print(f"slotted context          : {compact:8.1f} bytes/session")
+    print(f"backend (context + table): {backend:8.1f} bytes/session (セッションID文字列を除く)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+負荷試験用の偽 OpenWeather サーバー
+
+geo/1.0/direct・/data/2.5/weather・/data/2.5/forecast を、記録済みのフィクスチャ
+（benchmarks/fixtures/）をもとにローカルで返す。応答の遅延は分布で指定し、一定の割合でエラーを返せる。
+予報の枠はリクエスト時刻の予報枠から始まるようずらすため、いつ実行しても当日〜5日後の枠がそろう。
+
+遅延の指定（--latency）:
+  const:MS             常に MS ミリ秒
+  uniform:LO,HI        LO〜HI ミリ秒の一様分布
+  lognormal:MEDIAN,S   中央値 MEDIAN ミリ秒・対数標準偏差 S の対数正規分布（裾の重い上流を模す）
+
+障害の注入（--fault、複数指定可）:
+  429:rate=1,period=5,duty=0.3   5秒ごとに1.5秒間、すべての応答を 429（Retry-After: 1）にする
+  503:rate=0.6                   60% の応答を 503 にする（ステータスは任意の数値）
+  slow:rate=0.2,delay_ms=3000    20% の応答を 3秒遅らせる
+  reset:rate=0.1                 10% の応答をヘッダー送信後に切断する（接続リセット相当）
+  rate は発生確率、period（秒）と duty（0〜1）は障害が起きる時間帯。period を省略すると常に有効。
+
+GET /__stats で エンドポイントごとの呼び出し数を返し、POST /__stats/reset で 0 に戻す。
+
+使い方:
+  python benchmarks/fake_openweather.py --port 8900
+  python benchmarks/fake_openweather.py --latency lognormal:80,0.6 --error-rate 0.02 --error-status 503
+  python benchmarks/fake_openweather.py --fault 503:rate=0.6 --fault slow:rate=0.1,delay_ms=2000
+  OPENWEATHER_BASE_URL=http://127.0.0.1:8900 OPENWEATHER_API_KEY=dummy python run_api.py
+"""
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse, Response
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# OpenWeather の予報枠（UTC 0,3,6,... 時始まりの3時間）
+SLOT_SECONDS = 3 * 60 * 60
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """遅延の指定から、遅延（秒）を返す関数を作る"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "const" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        lo, hi = values
+        return lambda rng: rng.uniform(lo, hi) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        mu = math.log(median)
+        return lambda rng: rng.lognormvariate(mu, sigma) / 1000
+    raise ValueError(f"遅延の指定が正しくありません: {spec}")
+
+
+@dataclass(frozen=True)
+class Fault:
+    """注入する障害"""
+    kind: str                 # HTTP ステータス（"429" など）/ "slow" / "reset"
+    rate: float = 1.0         # 有効な時間帯に障害が起きる確率
+    period: float = 0.0       # 障害の周期（秒）。0 なら常に有効
+    duty: float = 1.0         # 周期のうち障害が起きる割合
+    delay_ms: float = 0.0     # slow の遅延
+
+    def active(self, elapsed: float, rng: random.Random) -> bool:
+        if self.period > 0 and (elapsed % self.period) >= self.duty * self.period:
+            return False
+        return rng.random() < self.rate
+
+
+def parse_fault(spec: str) -> Fault:
+    """障害の指定（例: 503:rate=0.6 / slow:rate=0.2,delay_ms=3000）"""
+    kind, _, args = spec.partition(":")
+    if not (kind.isdigit() or kind in ("slow", "reset")):
+        raise ValueError(f"障害の種類が正しくありません: {spec}")
+    params = {}
+    for pair in filter(None, args.split(",")):
+        key, _, value = pair.partition("=")
+        if key not in ("rate", "period", "duty", "delay_ms"):
+            raise ValueError(f"障害の指定が正しくありません: {spec}")
+        params[key] = float(value)
+    return Fault(kind=kind, **params)
+
+
+class _ResetResponse(Response):
+    """ヘッダーを送ったあと本文を送らずに例外で切断する（上流の接続リセットを模す）"""
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", b"1024")],
+        })
+        raise ConnectionResetError("injected reset")
+
+
+def _coords(city: str) -> tuple[float, float]:
+    """都市名から決まる日本国内の座標（同じ都市は常に同じ座標）"""
+    digest = hashlib.sha256(city.encode("utf-8")).digest()
+    lat = 26.0 + digest[0] / 255 * 19.0
+    lon = 127.0 + digest[1] / 255 * 18.0
+    return round(lat, 4), round(lon, 4)
+
+
+def create_app(
+    latency: str = "const:0",
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    seed: Optional[int] = None,
+    fixtures: Path = FIXTURES,
+    faults: tuple[Fault, ...] = (),
+) -> FastAPI:
+    current_template = json.loads((fixtures / "weather_tokyo.json").read_text(encoding="utf-8"))
+    forecast_template = json.loads((fixtures / "forecast_tokyo.json").read_text(encoding="utf-8"))
+    template_start = forecast_template["list"][0]["dt"]
+    rng = random.Random(seed)
+    delay = parse_latency(latency)
+    calls: Counter[str] = Counter()
+    # 予報枠ごとにずらした予報（同じ枠の間は使い回す）
+    shifted: dict[int, dict] = {}
+    started = time.monotonic()
+
+    app = FastAPI(title="Fake OpenWeather")
+
+    async def respond(endpoint: str, body) -> Response:
+        calls[endpoint] += 1
+        await asyncio.sleep(delay(rng))
+        elapsed = time.monotonic() - started
+        for fault in faults:
+            if not fault.active(elapsed, rng):
+                continue
+            calls[f"{endpoint}_{fault.kind}"] += 1
+            if fault.kind == "slow":
+                await asyncio.sleep(fault.delay_ms / 1000)
+                continue
+            if fault.kind == "reset":
+                return _ResetResponse()
+            status = int(fault.kind)
+            headers = {"Retry-After": "1"} if status == 429 else None
+            return JSONResponse({"cod": status, "message": "injected fault"}, status_code=status, headers=headers)
+        if error_rate and rng.random() < error_rate:
+            calls[f"{endpoint}_error"] += 1
+            return JSONResponse({"cod": error_status, "message": "injected error"}, status_code=error_status)
+        return JSONResponse(body)
+
+    def forecast_body(lat: float, lon: float) -> dict:
+        slot_start = int(time.time()) // SLOT_SECONDS * SLOT_SECONDS
+        body = shifted.get(slot_start)
+        if body is None:
+            body = copy.deepcopy(forecast_template)
+            offset = slot_start - template_start
+            for item in body["list"]:
+                item["dt"] += offset
+                item["dt_txt"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(item["dt"]))
+            shifted.clear()
+            shifted[slot_start] = body
+        return {**body, "city": {**body["city"], "coord": {"lat": lat, "lon": lon}}}
+
+    @app.get("/geo/1.0/direct")
+    async def geo(q: str, limit: int = 5, appid: str = ""):
+        city = q.split(",")[0]
+        lat, lon = _coords(city)
+        return await respond("geo", [{
+            "name": city,
+            "local_names": {"ja": city},
+            "lat": lat,
+            "lon": lon,
+            "country": "JP",
+        }])
+
+    @app.get("/data/2.5/weather")
+    async def weather(lat: float, lon: float, appid: str = "", units: str = "", lang: str = ""):
+        body = {**current_template, "dt": int(time.time()), "coord": {"lat": lat, "lon": lon}}
+        return await respond("weather", body)
+
+    @app.get("/data/2.5/forecast")
+    async def forecast(lat: float, lon: float, cnt: int = Query(40), appid: str = "", units: str = "", lang: str = ""):
+        return await respond("forecast", forecast_body(lat, lon))
+
+    @app.get("/__stats")
+    async def stats():
+        return dict(calls)
+
+    @app.post("/__stats/reset")
+    async def reset_stats():
+        calls.clear()
+        return {}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenWeather server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal:60,0.5", help="遅延の分布（const:MS / uniform:LO,HI / lognormal:MEDIAN,S）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="エラーを返す割合（0〜1）")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--fault", action="append", default=[], help="注入する障害（複数指定可）")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    faults = tuple(parse_fault(spec) for spec in args.fault)
+    app = create_app(args.latency, args.error_rate, args.error_status, args.seed, faults=faults)
+    # 切断の注入は ASGI の例外になるため、ログはエラーも出さない
+    uvicorn.run(app, host=args.host, port=args.port, log_level="critical" if faults else "warning")
+
+
+if __name__ == "__main__":
+    main()
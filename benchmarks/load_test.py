@@ -0,0 +1,281 @@
+"""
+/chat・/weather/query のエンドツーエンド負荷試験（偽 OpenWeather サーバー使用）
+
+偽 OpenWeather サーバー（fake_openweather.py）と API サーバーを子プロセスで起動し、
+tests/data/benth_cases.jsonl から作った複数ターンの会話を、複数の仮想ユーザーから同時に送る。
+実際の API キー・クォータは使わない。
+
+1つの会話（セッション）:
+  1. ケースの入力（例: 今日の東京の天気教えて）
+  2. 日数だけを変える追いの質問（例: 明日は？）… 前のターンの都市を引き継ぐ
+  3. 別のケースの入力（都市の切り替え）
+一定の割合（--query-ratio）で、会話の代わりに /weather/query を送る。
+
+出力: スループット（requests/sec）、ルートごとの p50/p95/p99 レイテンシとエラー数、
+1リクエストあたりの上流呼び出し数（偽サーバーの集計）。
+エラーはユーザーに見えるもの（5xx、/weather/query の 200 以外、/chat の取得失敗の返信）を数える。
+
+使い方:
+  python benchmarks/load_test.py
+  python benchmarks/load_test.py --users 50 --duration 30 --latency lognormal:80,0.6 --error-rate 0.01
+  python benchmarks/load_test.py --app-url http://127.0.0.1:8000 --fake-url http://127.0.0.1:8900
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+CASES = ROOT / "tests" / "data" / "benth_cases.jsonl"
+UPSTREAM_ENDPOINTS = ("geo", "weather", "forecast")
+
+_FOLLOW_UPS = ["今日は？", "明日は？", "明後日は？", "3日後は？"]
+
+
+def load_cases(path: Path = CASES) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_session(cases: list[dict], rng: random.Random) -> list[str]:
+    """1つの会話のターン（発話）の列"""
+    first, second = rng.choice(cases), rng.choice(cases)
+    return [first["input"], rng.choice(_FOLLOW_UPS), second["input"]]
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """最近傍順位法のパーセンタイル"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, elapsed: float, ok: bool) -> None:
+        self.latencies[route].append(elapsed)
+        if not ok:
+            self.errors[route] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(len(v) for v in self.latencies.values())
+
+
+# 天気の取得に失敗したときの /chat の返信に含まれる語（agent_loop._fetch_error_result・weather_api の例外）。
+# 偽サーバーはどの都市名も解決するため、「解決できませんでした」も上流の失敗による
+_FETCH_FAILED_MARKERS = ("取得に失敗しました", "取得できませんでした", "を解決できませんでした")
+
+
+def user_visible_error(route: str, response: httpx.Response) -> bool:
+    """ユーザーにエラーとして見える応答か（/chat は 200 でも取得失敗の返信ならエラー）"""
+    if response.status_code >= 500:
+        return True
+    if route == "/chat":
+        reply = response.json().get("reply", "")
+        return any(marker in reply for marker in _FETCH_FAILED_MARKERS)
+    return response.status_code != 200
+
+
+async def _timed(client: httpx.AsyncClient, recorder: Recorder, route: str, body: dict) -> None:
+    start = time.perf_counter()
+    ok = False
+    try:
+        response = await client.post(route, json=body)
+        ok = not user_visible_error(route, response)
+    except (httpx.HTTPError, ValueError):
+        pass
+    recorder.record(route, time.perf_counter() - start, ok)
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    cases: list[dict],
+    deadline: float,
+    query_ratio: float,
+    rng: random.Random,
+) -> None:
+    while time.monotonic() < deadline:
+        if rng.random() < query_ratio:
+            case = rng.choice(cases)
+            await _timed(client, recorder, "/weather/query", {"city": case["city"], "days": case["days"]})
+            continue
+        session_id = f"load-{uuid.uuid4().hex}"
+        for message in make_session(cases, rng):
+            if time.monotonic() >= deadline:
+                break
+            await _timed(client, recorder, "/chat", {"session_id": session_id, "message": message})
+
+
+async def upstream_stats(fake_url: str) -> dict[str, int]:
+    async with httpx.AsyncClient(base_url=fake_url) as client:
+        return (await client.get("/__stats")).json()
+
+
+async def run_load(app_url: str, fake_url: str, users: int, duration: float, query_ratio: float, seed: int) -> dict:
+    cases = load_cases()
+    recorder = Recorder()
+    before = await upstream_stats(fake_url)
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=app_url, timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(
+            virtual_user(client, recorder, cases, deadline, query_ratio, random.Random(seed + i))
+            for i in range(users)
+        ))
+        elapsed = time.perf_counter() - start
+    after = await upstream_stats(fake_url)
+
+    total = recorder.total
+    upstream = {k: after.get(k, 0) - before.get(k, 0) for k in UPSTREAM_ENDPOINTS}
+    routes = {}
+    for route, values in sorted(recorder.latencies.items()):
+        values.sort()
+        routes[route] = {
+            "requests": len(values),
+            "errors": recorder.errors[route],
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return {
+        "users": users,
+        "duration_s": elapsed,
+        "requests": total,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "routes": routes,
+        "upstream_calls": upstream,
+        "upstream_calls_per_request": sum(upstream.values()) / total if total else 0.0,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} が起動しませんでした")
+
+
+def spawn_servers(fake_args: list[str], workers: int = 1) -> tuple[str, str, list[subprocess.Popen]]:
+    """偽 OpenWeather サーバー（fake_args は fake_openweather.py の引数）と API サーバーを起動する"""
+    fake_port, app_port = _free_port(), _free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    fake_cmd = [
+        sys.executable, str(Path(__file__).resolve().parent / "fake_openweather.py"),
+        "--port", str(fake_port), *fake_args,
+    ]
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT / "src"),
+        "OPENWEATHER_BASE_URL": fake_url,
+        "OPENWEATHER_API_KEY": "load-test",
+    }
+    if workers > 1:
+        env.setdefault("AEROCAST_SESSION_BACKEND", "sqlite")
+    app_cmd = [
+        sys.executable, "-m", "uvicorn", "aerocast.app:app",
+        "--host", "127.0.0.1", "--port", str(app_port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    procs = [subprocess.Popen(fake_cmd), subprocess.Popen(app_cmd, env=env, cwd=ROOT)]
+    try:
+        _wait_ready(f"{fake_url}/__stats")
+        _wait_ready(f"{app_url}/health")
+    except Exception:
+        stop_servers(procs)
+        raise
+    return app_url, fake_url, procs
+
+
+def stop_servers(procs: list[subprocess.Popen]) -> None:
+    for p in procs:
+        p.terminate()
+    for p in procs:
+        try:
+            p.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+
+def print_report(result: dict) -> None:
+    print(f"users={result['users']} duration={result['duration_s']:.1f}s requests={result['requests']}")
+    print(f"throughput: {result['throughput_rps']:,.1f} requests/sec")
+    print(f"{'route':<16} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, r in result["routes"].items():
+        print(
+            f"{route:<16} {r['requests']:>9} {r['errors']:>7} "
+            f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}"
+        )
+    calls = ", ".join(f"{k}={v}" for k, v in result["upstream_calls"].items())
+    print(f"upstream calls: {calls} ({result['upstream_calls_per_request']:.2f} per request)")
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="End-to-end load test with a fake OpenWeather server")
+    parser.add_argument("--users", type=int, default=20, help="同時に会話する仮想ユーザー数")
+    parser.add_argument("--duration", type=float, default=10.0, help="負荷をかける時間（秒）")
+    parser.add_argument("--query-ratio", type=float, default=0.2, help="/weather/query を送る割合")
+    parser.add_argument("--latency", default="lognormal:60,0.5", help="偽サーバーの遅延の分布")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="偽サーバーがエラーを返す割合")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--workers", type=int, default=1, help="API サーバーのワーカープロセス数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app-url", help="起動済みの API サーバー（指定時は子プロセスを起動しない）")
+    parser.add_argument("--fake-url", help="起動済みの偽 OpenWeather サーバー（--app-url と併用）")
+    parser.add_argument("--output", help="結果を JSON で保存するパス")
+    args = parser.parse_args(argv)
+
+    procs: list[subprocess.Popen] = []
+    if args.app_url:
+        if not args.fake_url:
+            parser.error("--app-url を指定する場合は --fake-url も指定してください")
+        app_url, fake_url = args.app_url, args.fake_url
+    else:
+        fake_args = [
+            "--latency", args.latency, "--seed", str(args.seed),
+            "--error-rate", str(args.error_rate), "--error-status", str(args.error_status),
+        ]
+        app_url, fake_url, procs = spawn_servers(fake_args, args.workers)
+
+    try:
+        result = asyncio.run(run_load(app_url, fake_url, args.users, args.duration, args.query_ratio, args.seed))
+    finally:
+        stop_servers(procs)
+
+    print_report(result)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
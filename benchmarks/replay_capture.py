@@ -0,0 +1,239 @@
+"""
+キャプチャ（AEROCAST_CAPTURE_DIR）の決定的な再生
+
+記録したリクエストを時刻順に再生し、レイテンシとキャッシュの挙動を測る。
+- 時計は記録ごとにその記録の時刻に固定する（time.time と各モジュールの datetime.now）
+- 上流の呼び出しは、記録した上流のレスポンスを返すトランスポートで応答する（ネットワークなし）
+- /chat・/chat/stream は run_structured、/weather/query は fetch_weather + 判定で再生する
+- 同じセッション（ハッシュ）の記録は同じ session_id で再生するため、会話の文脈も再現される
+
+リリースごとに同じキャプチャを再生し、--output の JSON を --compare で比べる。
+
+使い方:
+  python benchmarks/replay_capture.py captures/
+  python benchmarks/replay_capture.py captures/capture-20260313-090000-123-0001.jsonl.gz --output v1.json
+  python benchmarks/replay_capture.py captures/ --compare v1.json
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional
+from unittest.mock import patch
+
+import requests
+from requests.adapters import BaseAdapter
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(src_path))
+os.environ.setdefault("OPENWEATHER_API_KEY", "replay")
+
+from aerocast import advice_engine, intent_parser, render_cache, retry, weather_api, weather_summary
+from aerocast.agent_loop import run_structured
+from aerocast.capture import iter_captures, text_hash, upstream_key
+from aerocast.metrics import cache_requests
+from aerocast.rules import decide_all
+
+CHAT_ROUTES = ("/chat", "/chat/stream")
+CACHES = ("intent", "render")
+# datetime.now を使うモジュール
+_CLOCK_MODULES = (weather_api, weather_summary, advice_engine, render_cache, intent_parser)
+
+
+class FrozenClock:
+    """記録の時刻に固定した時計"""
+
+    def __init__(self):
+        self.now = 0.0
+        clock = self
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.fromtimestamp(clock.now, tz)
+
+        self.datetime = FrozenDatetime
+
+    def time(self) -> float:
+        return self.now
+
+    def install(self, stack: ExitStack) -> None:
+        stack.enter_context(patch("time.time", self.time))
+        for module in _CLOCK_MODULES:
+            stack.enter_context(patch.object(module, "datetime", self.datetime))
+
+
+class ReplayAdapter(BaseAdapter):
+    """記録した上流のレスポンスを返す requests のトランスポート"""
+
+    def __init__(self):
+        super().__init__()
+        self._current: dict[str, deque] = {}
+        self._latest: dict[str, dict] = {}
+        self.served = 0
+        self.misses = 0
+
+    def load(self, record: dict[str, Any]) -> None:
+        """再生する記録の上流のレスポンスを、URL ごとに記録順で返せるようにする"""
+        self._current = defaultdict(deque)
+        for entry in record.get("upstream", []):
+            self._current[entry["url"]].append(entry)
+            self._latest[entry["url"]] = entry
+
+    def send(self, request, **kwargs):
+        key = upstream_key(request.url)
+        queue = self._current.get(key)
+        # 記録より多く呼ばれた場合は、同じ URL の最新の記録を返す
+        entry = queue.popleft() if queue else self._latest.get(key)
+        if entry is None:
+            self.misses += 1
+            raise requests.ConnectionError(f"記録にない上流の呼び出しです: {key}", request=request)
+        self.served += 1
+        if "error" in entry:
+            raise requests.ConnectionError(entry["error"], request=request)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response._content = entry["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.headers["Content-Type"] = "application/json; charset=utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(1, math.ceil(p / 100 * len(sorted_values))) - 1]
+
+
+def _cache_counts() -> dict[str, tuple[float, float]]:
+    return {
+        name: (cache_requests.labels(name, "hit").value(), cache_requests.labels(name, "miss").value())
+        for name in CACHES
+    }
+
+
+def replay_record(record: dict[str, Any]) -> Optional[str]:
+    """1件を再生し、/chat なら返信を返す"""
+    route = record.get("route")
+    if route in CHAT_ROUTES:
+        return run_structured(record["message"], session_id=record.get("session") or "default")["reply"]
+    if route == "/weather/query":
+        try:
+            decide_all(weather_api.fetch_weather(record["city"], record["days"]))
+        except Exception:
+            pass
+    return None
+
+
+def replay(paths: list[str], limit: Optional[int] = None, keep_backoff: bool = False) -> dict[str, Any]:
+    clock = FrozenClock()
+    adapter = ReplayAdapter()
+    latencies: dict[str, list[float]] = defaultdict(list)
+    captured: dict[str, list[float]] = defaultdict(list)
+    mismatches = 0
+    replayed = 0
+    before = _cache_counts()
+
+    with ExitStack() as stack:
+        clock.install(stack)
+        stack.enter_context(patch.object(weather_api, "_SESSION", requests.Session()))
+        weather_api._SESSION.mount("http://", adapter)
+        weather_api._SESSION.mount("https://", adapter)
+        if not keep_backoff:
+            # バックオフの待機は再生時間を伸ばすだけなので省く（回数は aerocast_retries_total に残る）
+            stack.enter_context(patch.object(retry, "time", SimpleNamespace(sleep=lambda _: None)))
+
+        for record in iter_captures(paths):
+            if limit is not None and replayed >= limit:
+                break
+            route = record.get("route")
+            clock.now = record["ts"]
+            adapter.load(record)
+            start = time.perf_counter()
+            reply = replay_record(record)
+            latencies[route].append(time.perf_counter() - start)
+            if record.get("duration_ms") is not None:
+                captured[route].append(record["duration_ms"] / 1000)
+            if reply is not None and record.get("reply_sha256") and text_hash(reply) != record["reply_sha256"]:
+                mismatches += 1
+            replayed += 1
+
+    after = _cache_counts()
+    caches = {}
+    for name in CACHES:
+        hits = after[name][0] - before[name][0]
+        misses = after[name][1] - before[name][1]
+        caches[name] = {"hits": hits, "misses": misses, "hit_ratio": hits / (hits + misses) if hits + misses else 0.0}
+
+    routes = {}
+    for route, values in sorted(latencies.items()):
+        values.sort()
+        recorded = sorted(captured[route])
+        routes[route] = {
+            "requests": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "captured_p50_ms": percentile(recorded, 50) * 1000,
+            "captured_p99_ms": percentile(recorded, 99) * 1000,
+        }
+    return {
+        "requests": replayed,
+        "routes": routes,
+        "caches": caches,
+        "upstream_served": adapter.served,
+        "upstream_misses": adapter.misses,
+        "reply_mismatches": mismatches,
+    }
+
+
+def print_report(result: dict[str, Any], baseline: Optional[dict[str, Any]] = None) -> None:
+    print(f"requests={result['requests']} upstream served={result['upstream_served']} "
+          f"misses={result['upstream_misses']} reply mismatches={result['reply_mismatches']}")
+    print(f"{'route':<16} {'requests':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'captured p50':>13}")
+    for route, r in result["routes"].items():
+        line = (f"{route:<16} {r['requests']:>9} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+                f"{r['p99_ms']:>9.2f} {r['captured_p50_ms']:>13.1f}")
+        base = (baseline or {}).get("routes", {}).get(route)
+        if base and base["p50_ms"]:
+            line += f"  (p50 {r['p50_ms'] / base['p50_ms'] - 1:+.1%}, p99 {r['p99_ms'] / base['p99_ms'] - 1:+.1%})"
+        print(line)
+    for name, c in result["caches"].items():
+        line = f"cache {name:<7} hit ratio {c['hit_ratio']:.1%} ({c['hits']:.0f}/{c['hits'] + c['misses']:.0f})"
+        base = (baseline or {}).get("caches", {}).get(name)
+        if base:
+            line += f"  (baseline {base['hit_ratio']:.1%})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic replay of captured traffic")
+    parser.add_argument("paths", nargs="+", help="キャプチャファイルまたはディレクトリ")
+    parser.add_argument("--limit", type=int, help="再生する件数の上限")
+    parser.add_argument("--keep-backoff", action="store_true", help="リトライのバックオフ待機も再現する")
+    parser.add_argument("--output", help="結果を JSON で保存するパス")
+    parser.add_argument("--compare", help="比較する前回の結果（--output の JSON）")
+    args = parser.parse_args()
+
+    result = replay(args.paths, args.limit, args.keep_backoff)
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    print_report(result, baseline)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ AeroCast API サーバー起動スクリプト
 環境変数:
   OPENWEATHER_API_KEY ... 天気API（必須）
   OPENAI_API_KEY      ... LLM（/chat で使用）
+  AEROCAST_WORKERS    ... ワーカープロセス数（デフォルト1。2以上ではリロード無効、
+                          セッションは SQLite バックエンドで共有）
 """
 import os
 import sys
@@ -24,6 +26,10 @@ if __name__ == "__main__":
     import uvicorn
 
     port = 8000
+    workers = int(os.getenv("AEROCAST_WORKERS", "1"))
+    if workers > 1:
+        # ワーカー間で会話の文脈を共有する
+        os.environ.setdefault("AEROCAST_SESSION_BACKEND", "sqlite")
     print(f"AeroCast API を起動しています...")
     print(f"  ブラウザで開く: http://localhost:{port}/")
     print(f"  API 仕様:       http://localhost:{port}/docs")
@@ -33,5 +39,6 @@ if __name__ == "__main__":
         "aerocast.app:app",
         host="0.0.0.0",
         port=port,
-        reload=True,
+        reload=workers == 1,
+        workers=workers,
     )
@@ -6,7 +6,7 @@ AeroCast Engine Package
 
 # メインのエージェント関数
 from .agent import run_agent
-from .agent_loop import run as run_agent_loop, run_structured, RunResult
+from .agent_loop import run as run_agent_loop, run_structured, run_structured_async, RunResult
 
 # データモデル
 from .models import (
@@ -29,6 +29,7 @@ __all__ = [
     # メイン関数
     "run_agent",
     "run_structured",
+    "run_structured_async",
     "RunResult",
     # データモデル
     "WeatherContext",
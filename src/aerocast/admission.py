@@ -0,0 +1,247 @@
+"""
+流入制御（アドミッションコントロール）と負荷制限の ASGI ミドルウェア
+
+役割:
+- ルートごとに同時実行数の上限を設け、超えた分は上限付きの待ち行列で待たせる
+- 待ち行列が一杯・待ち時間が上限を超えたら、すぐに 503 と Retry-After を返す（遅延を際限なく伸ばさない）
+- セッションごとに同時に受け付ける件数（実行中 + 待機中）を制限し、1つのクライアントがワーカーを占有しないようにする
+  （超えた分は 429 と Retry-After）
+- 実行中・待機中の件数と、断った件数を aerocast_admission_* メトリクスに出す
+
+上流が遅いときに、リクエストが Starlette のスレッドプールの後ろに溜まり続けるのを防ぐ。
+制限するのは AEROCAST_ADMISSION_LIMITS に書いたパスだけで、/health・/metrics・/admin などは制限しない。
+セッションは session_id（クエリ文字列、または JSON ボディ）で識別する。session_id のないリクエスト
+（/weather/query など）はセッションごとの上限の対象にしない。接続元のアドレスで数えると、
+プロキシ・CDN・共有のダッシュボードの背後にあるクライアントがまとめて上限にかかるため。
+"""
+import asyncio
+import json
+import os
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import parse_qs
+
+from .metrics import admission_shed, track_admission
+
+# パスごとの「同時実行数:待ち行列の長さ」（空文字で制限しない）
+DEFAULT_ADMISSION_LIMITS = os.getenv("AEROCAST_ADMISSION_LIMITS", "/chat=32:64,/chat/stream=16:32,/weather/query=32:64")
+# 1セッションが同時に受け付けられる件数（実行中 + 待機中、0 で制限しない）
+DEFAULT_ADMISSION_PER_SESSION = int(os.getenv("AEROCAST_ADMISSION_PER_SESSION", "2"))
+# 待ち行列で待つ上限（秒）
+DEFAULT_ADMISSION_QUEUE_TIMEOUT = float(os.getenv("AEROCAST_ADMISSION_QUEUE_TIMEOUT", "5"))
+# 断ったときの Retry-After（秒）
+DEFAULT_ADMISSION_RETRY_AFTER = int(os.getenv("AEROCAST_ADMISSION_RETRY_AFTER", "1"))
+
+# session_id を探すために読む JSON ボディの上限
+_MAX_SESSION_BODY = 64 * 1024
+
+
+@dataclass(frozen=True)
+class RouteLimit:
+    concurrency: int
+    queue: int
+    per_session: int = DEFAULT_ADMISSION_PER_SESSION
+    queue_timeout: float = DEFAULT_ADMISSION_QUEUE_TIMEOUT
+
+
+def parse_limits(spec: str, per_session: int = DEFAULT_ADMISSION_PER_SESSION) -> dict[str, RouteLimit]:
+    """"/chat=32:64,/weather/query=32:64" → パスごとの RouteLimit"""
+    limits = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        path, sep, values = item.partition("=")
+        concurrency, sep2, queue = values.partition(":")
+        try:
+            if not sep or not sep2:
+                raise ValueError
+            limit = RouteLimit(int(concurrency), int(queue), per_session)
+        except ValueError:
+            raise ValueError(f"流入制御の指定が不正です（パス=同時実行数:待ち行列）: {item!r}") from None
+        if limit.concurrency <= 0 or limit.queue < 0:
+            raise ValueError(f"同時実行数は1以上、待ち行列は0以上で指定してください: {item!r}")
+        limits[path.strip()] = limit
+    return limits
+
+
+class RouteGate:
+    """
+    1つのルートの同時実行数の上限と、上限付きの FIFO の待ち行列。
+    イベントループ上からだけ使う（ロックは不要）。
+    """
+
+    def __init__(self, limit: RouteLimit):
+        self.limit = limit
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._sessions: Counter[str] = Counter()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, session: Optional[str]) -> Optional[str]:
+        """受け付けたら None、断ったら理由（session_limit / queue_full / queue_timeout）"""
+        per_session = self.limit.per_session
+        if session is not None and per_session > 0 and self._sessions[session] >= per_session:
+            return "session_limit"
+        if self.active < self.limit.concurrency and not self._waiters:
+            self.active += 1
+            self._hold(session)
+            return None
+        if len(self._waiters) >= self.limit.queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._hold(session)
+        try:
+            await asyncio.wait_for(waiter, self.limit.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # 期限と同時に枠を譲られた
+                return None
+            self._drop(waiter, session)
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            # クライアントの切断など。譲られた枠は次に回す
+            if waiter.done() and not waiter.cancelled():
+                self.release(session)
+            else:
+                self._drop(waiter, session)
+            raise
+        return None
+
+    def release(self, session: Optional[str]) -> None:
+        """実行が終わった枠を、待っている先頭に譲る（いなければ空ける）"""
+        self._unhold(session)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _hold(self, session: Optional[str]) -> None:
+        if session is not None:
+            self._sessions[session] += 1
+
+    def _unhold(self, session: Optional[str]) -> None:
+        if session is not None:
+            self._sessions[session] -= 1
+            if self._sessions[session] <= 0:
+                del self._sessions[session]
+
+    def _drop(self, waiter: asyncio.Future, session: Optional[str]) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._unhold(session)
+
+
+class AdmissionMiddleware:
+    """ルートごとの流入制御を行う ASGI ミドルウェア"""
+
+    def __init__(
+        self,
+        app,
+        limits: Optional[dict[str, RouteLimit]] = None,
+        retry_after: int = DEFAULT_ADMISSION_RETRY_AFTER,
+    ):
+        self.app = app
+        self.retry_after = retry_after
+        if limits is None:
+            limits = parse_limits(DEFAULT_ADMISSION_LIMITS)
+        self.gates = {path: RouteGate(limit) for path, limit in limits.items()}
+        track_admission(self.gates)
+
+    async def __call__(self, scope, receive, send):
+        gate = self.gates.get(scope.get("path")) if scope["type"] == "http" else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        session = None
+        if gate.limit.per_session > 0:
+            session, receive = await _session_key(scope, receive)
+        reason = await gate.acquire(session)
+        if reason is not None:
+            admission_shed.labels(path, reason).inc()
+            # ルーティング前に断るので、メトリクス用に対象ルートを scope に残す
+            scope["aerocast.route"] = path
+            await self._reject(send, 429 if reason == "session_limit" else 503)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(session)
+
+    async def _reject(self, send, status: int) -> None:
+        body = json.dumps({"detail": "too many requests" if status == 429 else "server is busy"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def _session_key(scope, receive):
+    """
+    session_id（クエリ文字列、なければ JSON ボディ）と、読んだボディを返し直す receive。
+    見つからなければ None（セッションごとの上限の対象にしない）。
+    """
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("session_id")
+    if values:
+        return values[0], receive
+
+    if scope.get("method") == "POST":
+        messages, body = await _read_body(receive)
+        receive = _replay(messages, receive)
+        try:
+            session_id = json.loads(body).get("session_id") if body else None
+        except (ValueError, AttributeError):
+            session_id = None
+        if isinstance(session_id, str):
+            return session_id, receive
+
+    return None, receive
+
+
+async def _read_body(receive) -> tuple[list[dict], bytes]:
+    """ボディを読む（上限を超えたら読むのをやめ、session_id は探さない）"""
+    messages = []
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            return messages, b""
+        chunk = message.get("body", b"")
+        chunks.append(chunk)
+        size += len(chunk)
+        if not message.get("more_body"):
+            return messages, b"".join(chunks)
+        if size > _MAX_SESSION_BODY:
+            return messages, b""
+
+
+def _replay(messages: list[dict], receive):
+    """読んだメッセージを先に返し、その後は元の receive に戻す"""
+    pending = deque(messages)
+
+    async def replay():
+        if pending:
+            return pending.popleft()
+        return await receive()
+
+    return replay
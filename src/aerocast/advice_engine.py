@@ -8,9 +8,14 @@
 - 体感コメント
 - 季節コメント
 """
-from .models import WeatherResult, AdviceResult
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from .models import WeatherResult, AdviceResult, UmbrellaDecision, WindDecision, ComfortDecision
 from .rules import decide_umbrella, decide_wind, decide_comfort
 
+JST = timezone(timedelta(hours=9))
+
 
 def _clothing_advice(level: str) -> str:
     """快適度から服装提案"""
@@ -69,17 +74,24 @@ def _seasonal_comment(month: int, temp: float) -> str:
     return ""
 
 
-def build_advice(w: WeatherResult) -> AdviceResult:
+def build_advice(
+    w: WeatherResult,
+    umbrella: Optional[UmbrellaDecision] = None,
+    wind: Optional[WindDecision] = None,
+    comfort: Optional[ComfortDecision] = None,
+) -> AdviceResult:
     """
     WeatherResult から生活アドバイスを生成する。
+    判定済みの結果を渡した場合は判定をやり直さない。
     """
-    from datetime import datetime, timezone, timedelta
-    jst = timezone(timedelta(hours=9))
-    now = datetime.now(jst)
+    now = datetime.now(JST)
 
-    umbrella = decide_umbrella(w)
-    wind = decide_wind(w)
-    comfort = decide_comfort(w)
+    if umbrella is None:
+        umbrella = decide_umbrella(w)
+    if wind is None:
+        wind = decide_wind(w)
+    if comfort is None:
+        comfort = decide_comfort(w)
 
     return AdviceResult(
         clothing=_clothing_advice(comfort.level),
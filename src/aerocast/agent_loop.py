@@ -1,19 +1,19 @@
+import asyncio
 from dataclasses import asdict, dataclass
-from typing import Optional, Any
+from typing import AsyncIterator, Optional, Any
 
 from .state import AgentState
 from .actions import Action
 from .intent_parser import parse_weather_intent
 from .validators import validate_days
-from .weather_api import fetch_weather
-from .rules import decide_umbrella, decide_wind, decide_comfort
-from .formatter import format_to_markdown
-from .weather_summary import build_summary
-from .advice_engine import build_advice
+from .weather_api import fetch_weather, fetch_weather_async
 from .models import WeatherResult
-from .error import UserFacingError, CityNotFoundError, AmbiguousCityError
-from .session import get_session_context
+from .render_cache import render_reply
+from .formatter import split_markdown_sections
+from .error import UserFacingError
+from .session import ConversationContext, session_scope, session_scope_async
 from .preprocessor import normalize_user_input
+from .tracing import span, trace_request, current_trace, input_attrs
 
 
 @dataclass
@@ -44,84 +44,167 @@ def _run_inner(
   """
   エージェントを実行し、構造化結果を返す（内部用）。
   優先度3: 内部判定・API取得値・LLM整形文を分けて返す。
+  同一セッションのリクエストはセッションロックで直列化し、文脈更新が混ざらないようにする。
   """
-  context = get_session_context(session_id)
-  normalized_input = normalize_user_input(user_input)
-  s = AgentState(user_input=normalized_input)
+  with trace_request("agent", **input_attrs(user_input)):
+    with session_scope(session_id) as context:
+      return _run_steps(user_input, context, max_steps)
+
+
+async def _run_inner_async(
+  user_input: str, session_id: str = "default", max_steps: int = 10
+) -> RunResult:
+  """_run_inner の async 版（天気取得を await し、スレッドを占有しない）"""
+  with trace_request("agent", **input_attrs(user_input)):
+    async with session_scope_async(session_id) as context:
+      return await _run_steps_async(user_input, context, max_steps)
+
+
+def _run_steps(
+  user_input: str, context: ConversationContext, max_steps: int
+) -> RunResult:
+  """セッションロック保持下でアクションを順に実行する"""
+  s = _new_state(user_input)
 
   for _ in range(max_steps):
     a = next_action(s)
     s.steps.append(a.value)
 
-    if a == Action.PARSE_INTENT:
-      intent = parse_weather_intent(
-        s.user_input,
-        context_city=context.last_city,
-        context_days=context.last_days
-      )
-      if intent is None:
-        return RunResult(reply="天気に関する質問のみ対応しています。")
-      s.city = intent.city
-      s.days = intent.days
-      s.intent = "forecast"
-      context.update(city=s.city, days=s.days, intent=s.intent)
-      if not s.city:
-        s.need_clarification = True
-        s.clarification_question = "都市名を教えてください。"
-        return RunResult(reply=s.clarification_question or "都市名を教えてください。")
+    if a == Action.FETCH_WEATHER:
+      try:
+        s.weather = fetch_weather(s.city, s.days)
+      except Exception as e:
+        return _fetch_error_result(e)
       continue
 
-    if a == Action.VALIDATE:
-      if s.days is None:
-        return RunResult(reply="日数が指定されていません。")
-      if not validate_days(s.days):
-        return RunResult(
-          reply=f"日数は0〜5の範囲で指定してください。現在の値: {s.days}"
-        )
-      continue
+    result = _run_local_step(a, s, context)
+    if result is not None:
+      return result
+
+  return RunResult(reply=_GIVE_UP_REPLY)
+
+
+async def _run_steps_async(
+  user_input: str, context: ConversationContext, max_steps: int
+) -> RunResult:
+  """_run_steps の async 版。FETCH_WEATHER 以外はCPUのみなので同期版と共通"""
+  async for kind, payload in _iter_steps_async(user_input, context, max_steps):
+    if kind == "result":
+      return payload
+  return RunResult(reply=_GIVE_UP_REPLY)
+
+
+async def _iter_steps_async(
+  user_input: str, context: ConversationContext, max_steps: int
+) -> AsyncIterator[tuple[str, Any]]:
+  """
+  async 版のアクション実行本体。途中経過をイベントとして返す。
+    ("fetched", AgentState) ... FETCH_WEATHER 完了直後
+    ("result", RunResult)   ... 最終結果（最後に必ず1回）
+  """
+  s = _new_state(user_input)
+
+  for _ in range(max_steps):
+    a = next_action(s)
+    s.steps.append(a.value)
 
     if a == Action.FETCH_WEATHER:
       try:
-        weather = fetch_weather(s.city, s.days)
-        s.weather = weather
-      except AmbiguousCityError as e:
-        return RunResult(reply=str(e))
-      except CityNotFoundError as e:
-        return RunResult(reply=str(e))
-      except UserFacingError as e:
-        return RunResult(reply=str(e))
+        s.weather = await fetch_weather_async(s.city, s.days)
       except Exception as e:
-        return RunResult(reply=f"天気情報の取得に失敗しました: {e}")
+        yield "result", _fetch_error_result(e)
+        return
+      yield "fetched", s
       continue
 
-    if a == Action.FORMAT:
-      if s.weather is None:
-        return RunResult(reply="天気情報が取得できませんでした。")
-      weather_result: WeatherResult = s.weather
-      days_offset = s.days if s.days is not None else 0
-      summary = build_summary(weather_result, days_offset=days_offset)
-      advice = build_advice(weather_result)
-      reply = format_to_markdown(summary, advice)
-      umbrella = decide_umbrella(weather_result)
-      wind = decide_wind(weather_result)
-      comfort = decide_comfort(weather_result)
-      context.update(city=s.city, days=s.days, intent=s.intent)
-      return RunResult(
-        reply=reply,
-        location=s.city,
-        forecast=asdict(weather_result),
-        judgement={
-          "umbrella": asdict(umbrella),
-          "wind": asdict(wind),
-          "comfort": asdict(comfort),
-        },
-      )
-
-    if a == Action.ASK_CLARIFICATION:
-      reply = s.clarification_question or "都市名を教えてください。"
-      return RunResult(reply=reply)
-
-  return RunResult(reply="うまく処理できませんでした。都市名と日付を指定してください。")
+    result = _run_local_step(a, s, context)
+    if result is not None:
+      yield "result", result
+      return
+
+  yield "result", RunResult(reply=_GIVE_UP_REPLY)
+
+
+_GIVE_UP_REPLY = "うまく処理できませんでした。都市名と日付を指定してください。"
+
+
+def _new_state(user_input: str) -> AgentState:
+  with span("normalize"):
+    normalized_input = normalize_user_input(user_input)
+  s = AgentState(user_input=normalized_input, trace=current_trace())
+  if s.trace is not None:
+    s.trace.attrs["steps"] = s.steps
+  return s
+
+
+def _run_local_step(
+  a: Action, s: AgentState, context: ConversationContext
+) -> Optional[RunResult]:
+  """ネットワークを使わないステップを実行する（続行する場合は None）"""
+  if a == Action.PARSE_INTENT:
+    return _parse_intent_step(s, context)
+  if a == Action.VALIDATE:
+    return _validate_step(s)
+  if a == Action.FORMAT:
+    return _format_step(s, context)
+  if a == Action.ASK_CLARIFICATION:
+    reply = s.clarification_question or "都市名を教えてください。"
+    return RunResult(reply=reply)
+  return None
+
+
+def _parse_intent_step(s: AgentState, context: ConversationContext) -> Optional[RunResult]:
+  with span("parse"):
+    intent = parse_weather_intent(
+      s.user_input,
+      context_city=context.last_city,
+      context_days=context.last_days
+    )
+  if intent is None:
+    return RunResult(reply="天気に関する質問のみ対応しています。")
+  s.city = intent.city
+  s.days = intent.days
+  s.intent = "forecast"
+  context.update(city=s.city, days=s.days, intent=s.intent)
+  if not s.city:
+    s.need_clarification = True
+    s.clarification_question = "都市名を教えてください。"
+    return RunResult(reply=s.clarification_question or "都市名を教えてください。")
+  return None
+
+
+def _validate_step(s: AgentState) -> Optional[RunResult]:
+  with span("validate"):
+    valid = s.days is not None and validate_days(s.days)
+  if s.days is None:
+    return RunResult(reply="日数が指定されていません。")
+  if not valid:
+    return RunResult(
+      reply=f"日数は0〜5の範囲で指定してください。現在の値: {s.days}"
+    )
+  return None
+
+
+def _fetch_error_result(e: Exception) -> RunResult:
+  # AmbiguousCityError / CityNotFoundError も UserFacingError としてそのまま返す
+  if isinstance(e, UserFacingError):
+    return RunResult(reply=str(e))
+  return RunResult(reply=f"天気情報の取得に失敗しました: {e}")
+
+
+def _format_step(s: AgentState, context: ConversationContext) -> RunResult:
+  if s.weather is None:
+    return RunResult(reply="天気情報が取得できませんでした。")
+  weather_result: WeatherResult = s.weather
+  days_offset = s.days if s.days is not None else 0
+  rendered = render_reply(weather_result, days_offset=days_offset)
+  context.update(city=s.city, days=s.days, intent=s.intent)
+  return RunResult(
+    reply=rendered.markdown,
+    location=s.city,
+    forecast=asdict(weather_result),
+    judgement=rendered.judgement,
+  )
 
 
 def run(user_input: str, session_id: str = "default", max_steps: int = 10) -> str:
@@ -143,10 +226,81 @@ def run_structured(
   エージェントを実行し、API用の構造化レスポンスを返す。
   reply: LLM整形文、forecast: API取得値、judgement: 内部判定結果。
   """
-  r = _run_inner(user_input, session_id, max_steps)
+  return _to_response(_run_inner(user_input, session_id, max_steps))
+
+
+async def run_structured_async(
+  user_input: str, session_id: str = "default", max_steps: int = 10
+) -> dict[str, Any]:
+  """
+  run_structured の async 版（FastAPI の async ハンドラ用）。
+  """
+  return _to_response(await _run_inner_async(user_input, session_id, max_steps))
+
+
+async def run_stream_async(
+  user_input: str, session_id: str = "default", max_steps: int = 10
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+  """
+  エージェントを実行し、途中経過をイベントとして順に返す（SSE 用）。
+    ("forecast", {location, forecast, judgement}) ... 天気取得の直後
+    ("markdown", {text})                           ... 返信の Markdown をセクションごとに
+    ("done", {reply, location, forecast, judgement}) ... 最後に必ず1回
+
+  処理は別タスクでセッションのロックを持って進め、イベントはキュー経由ですぐに返す。
+  ロックは処理が終わって文脈を保存した時点で放すため、クライアントの受信が遅くても
+  同じセッションの次のリクエストを待たせない。
+  """
+  events: asyncio.Queue = asyncio.Queue()
+
+  async def produce():
+    try:
+      with trace_request("agent_stream", **input_attrs(user_input)):
+        async with session_scope_async(session_id) as context:
+          async for event in _stream_events(user_input, context, max_steps):
+            events.put_nowait(event)
+            if event[0] == "forecast":
+              # 整形に進む前に、受け取り側に forecast を送らせる
+              await asyncio.sleep(0)
+    finally:
+      events.put_nowait(None)
+
+  producer = asyncio.create_task(produce())
+  try:
+    while (event := await events.get()) is not None:
+      yield event
+    await producer
+  finally:
+    if not producer.done():
+      # クライアントが切断した
+      producer.cancel()
+
+
+async def _stream_events(
+  user_input: str, context: ConversationContext, max_steps: int
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+  async for kind, payload in _iter_steps_async(user_input, context, max_steps):
+    if kind == "fetched":
+      s: AgentState = payload
+      rendered = render_reply(s.weather, days_offset=s.days or 0)
+      yield "forecast", {
+        "location": s.city,
+        "forecast": asdict(s.weather),
+        "judgement": rendered.judgement,
+      }
+      continue
+
+    r: RunResult = payload
+    if r.forecast is not None:
+      for section in split_markdown_sections(r.reply):
+        yield "markdown", {"text": section}
+    yield "done", _to_response(r)
+
+
+def _to_response(r: RunResult) -> dict[str, Any]:
   return {
     "reply": r.reply,
     "location": r.location,
     "forecast": r.forecast,
     "judgement": r.judgement,
-  }
\ No newline at end of file
+  }
@@ -6,27 +6,70 @@ AeroCast FastAPI アプリ（優先度1: PythonコアのAPI化）
  または
   PYTHONPATH=src uvicorn aerocast.app:app --reload
 """
+import asyncio
+import hmac
+import json
+import os
+import time
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
 
-from fastapi import FastAPI, HTTPException
+import anyio.to_thread
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 from .schemas import ChatRequest, ChatResponse, WeatherQueryRequest, WeatherQueryResponse
-from .agent_loop import run_structured
-from .weather_api import fetch_weather
+from .agent_loop import run_structured_async, run_stream_async
+from .weather_api import fetch_weather_async, aclose_async_client
 from .rules import decide_umbrella, decide_wind, decide_comfort
 from .error import UserFacingError, CityNotFoundError, AmbiguousCityError
 from .models import WeatherResult
+from .session import get_session_manager
+from .metrics import (
+    REGISTRY,
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    record_cache,
+    sessions as sessions_gauge,
+    track_thread_pools,
+)
+from .tracing import trace_request, get_slow_traces, get_slow_threshold_ms, set_slow_threshold_ms
+from .capture import capture_request, close_capture, text_hash
+from .http_cache import cache_control, cacheable, etag_matches, weather_etag
+from .logger import shutdown_logging
+from .admission import AdmissionMiddleware
+from .profiler import (
+    DEFAULT_PROFILE_INTERVAL_MS,
+    DEFAULT_PROFILE_MAX_SECONDS,
+    collapsed_stacks,
+    install_signal_handler,
+    profile_status,
+    start_profiling,
+    stop_profiling,
+)
 from dataclasses import asdict
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    track_thread_pools(anyio.to_thread.current_default_thread_limiter(), asyncio.get_running_loop())
+    install_signal_handler()
+    cleanup = asyncio.create_task(get_session_manager().run_cleanup())
     yield
-    # 必要ならクリーンアップ（例: セッション期限切れの削除）
+    cleanup.cancel()
+    try:
+        await cleanup
+    except asyncio.CancelledError:
+        pass
+    stop_profiling()
+    # 未反映のセッション書き込みを反映してから終了する
+    get_session_manager().close()
+    await aclose_async_client()
+    close_capture()
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -36,6 +79,9 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# 流入制御はメトリクスの内側に置き、断ったリクエストもレイテンシに数える
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -59,6 +105,7 @@ def api_info():
             <li><a href="/docs">Swagger UI（API 仕様・試行）</a></li>
             <li><a href="/redoc">ReDoc（API 仕様）</a></li>
             <li><a href="/health">ヘルスチェック</a></li>
+            <li><a href="/metrics">メトリクス（Prometheus 形式）</a></li>
         </ul>
     </body>
     </html>
@@ -71,14 +118,28 @@ def health():
     return {"status": "ok"}
 
 
+# セッション数はスクレイプ時に数える
+sessions_gauge.set_function(lambda: {(): len(get_session_manager())})
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus 形式のメトリクス"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest) -> ChatResponse:
+async def chat(req: ChatRequest) -> ChatResponse:
     """
     チャットメッセージを処理。
-    セッションIDはフロントで保持し、バックは簡易辞書で管理（優先度4）。
+    セッションIDはフロントで保持し、バックは SessionManager で管理（優先度4）。
+    天気取得は非同期で行うため、スレッドプールを占有しない。
     """
     try:
-        result = run_structured(req.message, session_id=req.session_id)
+        with capture_request("/chat", req.session_id, message=req.message) as record:
+            result = await run_structured_async(req.message, session_id=req.session_id)
+            if record is not None:
+                record["reply_sha256"] = text_hash(result["reply"])
         return ChatResponse(
             reply=result["reply"],
             location=result.get("location"),
@@ -89,19 +150,59 @@ def chat(req: ChatRequest) -> ChatResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/weather/query", response_model=WeatherQueryResponse)
-def weather_query(req: WeatherQueryRequest) -> WeatherQueryResponse:
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _chat_event_stream(message: str, session_id: str) -> StreamingResponse:
+    async def events():
+        with capture_request("/chat/stream", session_id, message=message) as record:
+            try:
+                async for event, data in run_stream_async(message, session_id=session_id):
+                    if event == "done" and record is not None:
+                        record["reply_sha256"] = text_hash(data["reply"])
+                    yield _sse_event(event, data)
+            except Exception as e:
+                yield _sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # プロキシでバッファリングされると最初のイベントが遅れるため無効化する
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest) -> StreamingResponse:
     """
-    都市・日数で天気を直接取得（エージェントを経由しない）。
+    チャットメッセージを処理し、Server-Sent Events で途中経過を返す。
+    天気取得が終わった時点で forecast/judgement を送り、その後 Markdown をセクションごとに送る。
     """
+    return _chat_event_stream(req.message, req.session_id)
+
+
+@app.get("/chat/stream")
+async def chat_stream_get(
+    session_id: str = Query(..., description="フロントで保持するセッションID"),
+    message: str = Query(..., description="ユーザー発話"),
+) -> StreamingResponse:
+    """/chat/stream の GET 版（ブラウザの EventSource 用）"""
+    return _chat_event_stream(message, session_id)
+
+
+async def _query_weather(city: str, days: int) -> WeatherQueryResponse:
+    """都市・日数で天気を取得して判定する（/weather/query の GET・POST で共通）"""
     try:
-        weather: WeatherResult = fetch_weather(req.city, req.days)
+        with capture_request("/weather/query", city=city, days=days), \
+                trace_request("weather_query", city=city, days=days):
+            weather: WeatherResult = await fetch_weather_async(city, days)
         umbrella = decide_umbrella(weather)
         wind = decide_wind(weather)
         comfort = decide_comfort(weather)
         return WeatherQueryResponse(
             city=weather.city,
-            days=req.days,
+            days=days,
             forecast=asdict(weather),
             judgement={
                 "umbrella": asdict(umbrella),
@@ -119,6 +220,102 @@ def weather_query(req: WeatherQueryRequest) -> WeatherQueryResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/weather/query", response_model=WeatherQueryResponse)
+async def weather_query(req: WeatherQueryRequest) -> WeatherQueryResponse:
+    """都市・日数で天気を直接取得（エージェントを経由しない）"""
+    return await _query_weather(req.city, req.days)
+
+
+@app.get("/weather/query", response_model=WeatherQueryResponse)
+async def weather_query_get(
+    response: Response,
+    city: str = Query(..., description="都市名"),
+    days: int = Query(0, ge=0, le=5, description="0=今日、1=明日〜5日後"),
+    if_none_match: Optional[str] = Header(None),
+) -> WeatherQueryResponse:
+    """
+    /weather/query の GET 版（CDN・定期的に取得するダッシュボード用）。
+    結果は予報枠（3時間）の中では変わらないため、ETag が一致すれば取得せずに 304 を返す。
+    POST はキャッシュされないメソッドのため、ETag・304 は GET 版だけで扱う。
+    days=0（現在の天気）は枠の中でも変わるため、ETag を付けずに毎回取得する。
+    """
+    if not cacheable(days):
+        response.headers["Cache-Control"] = "no-cache"
+        return await _query_weather(city, days)
+    now = time.time()
+    cache_headers = {"ETag": weather_etag(city, days, now), "Cache-Control": cache_control(now)}
+    not_modified = etag_matches(if_none_match, cache_headers["ETag"])
+    record_cache("http", not_modified)
+    if not_modified:
+        return Response(status_code=304, headers=cache_headers)
+    result = await _query_weather(city, days)
+    response.headers.update(cache_headers)
+    return result
+
+
+# ============== 管理用 ==============
+
+def _require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    X-Admin-Token ヘッダーを AEROCAST_ADMIN_TOKEN と照合する。
+    トークンが設定されていなければ管理用エンドポイントは無効（404）。
+    """
+    token = os.getenv("AEROCAST_ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="forbidden")
+
+
+@app.get("/admin/traces", dependencies=[Depends(_require_admin)])
+def admin_traces(limit: int = Query(50, ge=1, le=1000)):
+    """閾値を超えた遅いリクエストのトレース（新しい順）"""
+    return {
+        "threshold_ms": get_slow_threshold_ms(),
+        "traces": get_slow_traces(limit),
+    }
+
+
+@app.put("/admin/traces/threshold", dependencies=[Depends(_require_admin)])
+def admin_set_trace_threshold(threshold_ms: float = Query(..., ge=0)):
+    """遅いリクエストとみなす閾値（ミリ秒）を変更する"""
+    set_slow_threshold_ms(threshold_ms)
+    return {"threshold_ms": get_slow_threshold_ms()}
+
+
+@app.get("/admin/profile", dependencies=[Depends(_require_admin)])
+def admin_profile():
+    """プロファイラーの状態"""
+    return profile_status()
+
+
+@app.post("/admin/profile/start", dependencies=[Depends(_require_admin)])
+def admin_profile_start(
+    interval_ms: float = Query(DEFAULT_PROFILE_INTERVAL_MS, gt=0, le=1000),
+    max_seconds: float = Query(DEFAULT_PROFILE_MAX_SECONDS, ge=0),
+):
+    """サンプリングプロファイラーを開始する（前回の結果は破棄する）"""
+    if not start_profiling(interval_ms, max_seconds):
+        raise HTTPException(status_code=409, detail="profiler is already running")
+    return profile_status()
+
+
+@app.post("/admin/profile/stop", dependencies=[Depends(_require_admin)])
+def admin_profile_stop():
+    """サンプリングプロファイラーを止める（結果は /admin/profile/stacks で取得できる）"""
+    stop_profiling()
+    return profile_status()
+
+
+@app.get("/admin/profile/stacks", dependencies=[Depends(_require_admin)])
+def admin_profile_stacks():
+    """collapsed 形式のスタック（flamegraph.pl・speedscope で読める）"""
+    return PlainTextResponse(
+        collapsed_stacks(),
+        headers={"Content-Disposition": f'attachment; filename="aerocast-{os.getpid()}.folded"'},
+    )
+
+
 # 静的ファイル（チャット画面・CSS・画像）は API ルートの後にマウント
 _static_dir = Path(__file__).resolve().parent / "static"
 app.mount("/images", StaticFiles(directory=str(_static_dir / "images")), name="images")
@@ -0,0 +1,280 @@
+"""
+本番トラフィックの記録（キャプチャ）
+
+役割:
+- AEROCAST_CAPTURE_DIR を設定したときだけ、リクエストごとに
+  セッションIDのハッシュ・発話・所要時間・受け取った上流のレスポンスを1行の JSON として記録する
+- 記録は gzip 圧縮の JSONL に書き、一定の大きさでファイルを切り替え、古いファイルから削除する
+- JSON 化・圧縮・書き込みはキュー経由で書き込み用のスレッドが行う（リクエストのスレッド・イベントループでは I/O をしない）
+- 記録したファイルは benchmarks/replay_capture.py で再生し、同じトラフィックでレイテンシ・キャッシュの挙動を比べる
+
+上流のレスポンスは ContextVar で受け渡すため、weather_api は記録中かどうかを意識せず
+record_upstream を呼ぶだけでよい（記録していなければ何もしない）。
+API キー（appid）は記録しない。
+
+1行の形式:
+
+    {"ts": 1773360000.1, "route": "/chat", "session": "9f86d081884c7d65", "message": "今日の東京の天気",
+     "duration_ms": 182.4, "status": "ok", "reply_sha256": "...",
+     "upstream": [{"endpoint": "geo", "url": "/geo/1.0/direct?q=...", "status": 200, "body": "[...]"}]}
+"""
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from .logger import logger
+
+# 1ファイルあたりの上限（圧縮前のバイト数）
+DEFAULT_CAPTURE_MAX_BYTES = int(os.getenv("AEROCAST_CAPTURE_MAX_BYTES", str(64 * 1024 * 1024)))
+# 保持するファイル数（ワーカーごと）
+DEFAULT_CAPTURE_MAX_FILES = int(os.getenv("AEROCAST_CAPTURE_MAX_FILES", "20"))
+# 書き込み待ちの記録を溜められる件数。書き込みが追いつかずに溢れた分は捨てる
+DEFAULT_CAPTURE_QUEUE_SIZE = int(os.getenv("AEROCAST_CAPTURE_QUEUE_SIZE", "10000"))
+
+_FILE_PREFIX = "capture-"
+_FILE_SUFFIX = ".jsonl.gz"
+
+
+def session_hash(session_id: str) -> str:
+    """セッションIDのハッシュ（記録にはセッションIDそのものを残さない）"""
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def upstream_key(url: str) -> str:
+    """上流の URL からホストと appid を除いたもの（記録と再生の突き合わせに使う）"""
+    parts = urlsplit(url)
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "appid"])
+    return f"{parts.path}?{query}" if query else parts.path
+
+
+# 書き込み用スレッドを止める番兵
+_STOP = object()
+
+
+class CaptureWriter:
+    """
+    gzip 圧縮の JSONL に追記し、一定の大きさでファイルを切り替える。
+    write() は記録をキューに入れるだけで、書き込み用のスレッドが JSON 化・圧縮・書き込みを行う。
+    キューが一杯のときは待たずに捨て、捨てた件数を dropped に数える。
+
+    ファイル名にはプロセス ID を含め、古いファイルの削除（max_files）は自分のプロセスのファイルだけを対象にする。
+    複数のワーカーが同じディレクトリに書いても、他のワーカーが書き込み中のファイルは消さない。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = DEFAULT_CAPTURE_MAX_BYTES,
+        max_files: int = DEFAULT_CAPTURE_MAX_FILES,
+        queue_size: int = DEFAULT_CAPTURE_QUEUE_SIZE,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.dropped = 0
+        self._file: Optional[gzip.GzipFile] = None
+        self._written = 0
+        self._seq = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, record: dict[str, Any]) -> None:
+        """記録をキューに入れる（書き込みは書き込み用のスレッドで行う）"""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """キューに入っている記録をすべて書き込むまで待つ"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="aerocast-capture", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            try:
+                if record is _STOP:
+                    return
+                self._write(record)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning("キャプチャを書き込めませんでした: %s", e, extra={"event": "capture_error"})
+            finally:
+                self._queue.task_done()
+
+    def _write(self, record: dict[str, Any]) -> None:
+        data = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        if self._file is None or self._written >= self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._written += len(data)
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._seq += 1
+        name = f"{_FILE_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._seq:04d}{_FILE_SUFFIX}"
+        self._file = gzip.open(self.directory / name, "wb")
+        self._written = 0
+        self._prune()
+
+    def _prune(self) -> None:
+        """このプロセスが書いたファイルのうち、古いものを削除する"""
+        pid = os.getpid()
+        own = [p for p in capture_files(self.directory) if _file_pid(p) == pid]
+        files = sorted(own, key=lambda p: (p.stat().st_mtime, p.name))
+        for path in files[:-self.max_files] if self.max_files > 0 else []:
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning("古いキャプチャを削除できませんでした: %s: %s", path, e, extra={"event": "capture_error"})
+
+    def close(self) -> None:
+        """キューに残った記録を書き込み、書き込み用のスレッドを止めてファイルを閉じる"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_current_record: ContextVar[Optional[dict[str, Any]]] = ContextVar("aerocast_capture", default=None)
+_writer: Optional[CaptureWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_capture_writer() -> Optional[CaptureWriter]:
+    """AEROCAST_CAPTURE_DIR が設定されていれば記録先（未設定なら None）"""
+    global _writer
+    if _writer is None:
+        directory = os.getenv("AEROCAST_CAPTURE_DIR")
+        if not directory:
+            return None
+        with _writer_lock:
+            if _writer is None:
+                _writer = CaptureWriter(directory)
+    return _writer
+
+
+def set_capture_writer(writer: Optional[CaptureWriter]) -> None:
+    """記録先を差し替える（テスト用）"""
+    global _writer
+    _writer = writer
+
+
+def close_capture() -> None:
+    """記録中のファイルを閉じる（アプリ終了時）"""
+    if _writer is not None:
+        _writer.close()
+
+
+@contextmanager
+def capture_request(route: str, session_id: Optional[str] = None, **fields: Any) -> Iterator[Optional[dict[str, Any]]]:
+    """
+    リクエストを記録する（記録が無効なら None を渡して何もしない）。
+    呼び出し側は渡された dict に reply_sha256 などを追加できる。
+    """
+    writer = get_capture_writer()
+    if writer is None:
+        yield None
+        return
+
+    record: dict[str, Any] = {
+        "ts": time.time(),
+        "route": route,
+        "session": session_hash(session_id) if session_id is not None else None,
+        **fields,
+        "upstream": [],
+    }
+    token = _current_record.set(record)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield record
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current_record.reset(token)
+        record["duration_ms"] = (time.perf_counter() - start) * 1000
+        record["status"] = status
+        writer.write(record)
+
+
+def record_upstream(endpoint: str, url: str, response: Any = None, error: Optional[BaseException] = None) -> None:
+    """記録中のリクエストに上流のレスポンス（または接続エラー）を追加する"""
+    record = _current_record.get()
+    if record is None:
+        return
+    entry: dict[str, Any] = {"endpoint": endpoint, "url": upstream_key(url)}
+    if response is not None:
+        entry["status"] = response.status_code
+        entry["body"] = response.text
+    else:
+        entry["error"] = type(error).__name__ if error is not None else "error"
+    record["upstream"].append(entry)
+
+
+def capture_files(path) -> list[Path]:
+    """ディレクトリ内のキャプチャファイル（名前順 = 書き始めた順）"""
+    return sorted(Path(path).glob(f"{_FILE_PREFIX}*{_FILE_SUFFIX}"))
+
+
+def _file_pid(path: Path) -> Optional[int]:
+    """キャプチャファイル名（capture-<日付>-<時刻>-<pid>-<連番>.jsonl.gz）のプロセス ID"""
+    parts = path.name[len(_FILE_PREFIX):-len(_FILE_SUFFIX)].split("-")
+    if len(parts) != 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def _iter_file(file: Path) -> Iterator[dict[str, Any]]:
+    opener = gzip.open if file.suffix == ".gz" else open
+    with opener(file, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        except EOFError:
+            # 書き込み中（閉じていない）ファイルは読めたところまで使う
+            logger.warning("キャプチャの末尾が途中で切れています: %s", file, extra={"event": "capture_error"})
+
+
+def iter_captures(paths: Iterable) -> Iterator[dict[str, Any]]:
+    """
+    キャプチャファイル（またはディレクトリ）から記録を時刻順に読む。
+    複数のワーカーが並行して書いたファイルも、時刻でマージして1本の列にする。
+    """
+    files: list[Path] = []
+    for path in paths:
+        path = Path(path)
+        files.extend(capture_files(path) if path.is_dir() else [path])
+    return heapq.merge(*(_iter_file(f) for f in files), key=lambda record: record["ts"])
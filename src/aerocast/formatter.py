@@ -6,14 +6,18 @@
 - bulletの整形
 - 余計な重複排除
 """
-import json
-from dataclasses import asdict
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 from openai import OpenAI
 from .models import WeatherContext, WeatherSummary, AdviceResult
 from .fallback_formatter import simple_format
 from .logger import logger
-from .validators import validate_llm_output
+from .validators import LLMOutputValidation, stream_validated
+from .metrics import upstream_requests, upstream_duration, record_cache, llm_prompt_tokens
+from .prompt_encoder import PROMPT_LEGEND, encode_context, estimate_tokens
+from .tracing import current_trace
+from .llm_cache import DEFAULT_LLM_TIMEOUT, context_key, llm_cache, llm_flight, llm_semaphore
 
 _client = None
 
@@ -73,6 +77,22 @@ def format_to_markdown(summary: WeatherSummary, advice: AdviceResult) -> str:
     return "\n".join(lines).strip()
 
 
+def split_markdown_sections(markdown: str) -> list[str]:
+    """
+    format_to_markdown の出力を見出し（## ）ごとのセクションに分ける（ストリーミング送信用）。
+    各セクションを順に連結すると元のテキストに戻る。
+    """
+    sections = []
+    start = 0
+    while True:
+        idx = markdown.find("\n\n## ", start)
+        if idx < 0:
+            sections.append(markdown[start:])
+            return sections
+        sections.append(markdown[start:idx + 2])
+        start = idx + 2
+
+
 def _get_client() -> OpenAI:
     """APIを叩く直前にクライアントを取得（import時にAPIキーを要求しない）"""
     global _client
@@ -80,44 +100,132 @@ def _get_client() -> OpenAI:
         _client = OpenAI()
     return _client
 
-def format_weather(context: WeatherContext) -> str:
+_SYSTEM_PROMPT = (
+    "天気情報を分かりやすく説明するアシスタントです。"
+    "与えられた情報のみを説明し、新しい判断や推測はしないでください。"
+    "基準時刻(at)を必ず含め、推定の雪確率(sp)は『推定』と明記してください。"
+    f"入力はJSONで、キーは {PROMPT_LEGEND}"
+)
+
+
+def format_weather(context: WeatherContext, timeout: float = DEFAULT_LLM_TIMEOUT) -> str:
     """
     WeatherContextに含まれる事実データと判断結果を
     自然な日本語で説明する。
     判断・推測は禁止。
+
+    LLM の出力はストリーミングで受け取りながらバリデーションし、
+    禁止された表現が現れた時点で生成を打ち切ってフォールバックを返す。
+    結果は予報枠の終わりまでキャッシュし、同じ内容の同時リクエストは1回の呼び出しにまとめる。
+    timeout 秒（待ち時間を含む）を超えた場合もフォールバックを返す。
     """
+    # フォールバックは先に組み立てておく（CPUのみで即時）。違反・障害時は待たずにこれを返す
+    fallback = simple_format(context)
+    deadline = time.monotonic() + timeout
+
+    key = context_key(context)
+    cached = llm_cache.get(key)
+    record_cache("llm", cached is not None)
+    if cached is not None:
+        return cached
+
+    future, leader = llm_flight.claim(key)
+    if not leader:
+        # 同じ内容を整形中の呼び出しがあれば、その結果を待つ
+        try:
+            output = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            output = None
+        return output if output is not None else fallback
+
+    output = None
+    try:
+        output = _call_llm(context, deadline)
+        llm_cache.put(key, output)
+    except Exception as e:
+        # LLM 障害時フォールバック（エラーは内部ログのみに記録、ユーザーには表示しない）
+        logger.debug(
+            "LLM API呼び出しに失敗しました: %s: %s", type(e).__name__, e,
+            exc_info=True, extra={"event": "llm_fallback"},
+        )
+    finally:
+        llm_flight.resolve(key, future, output)
+
+    # フォールバックフォーマッターを使用（ユーザーにはエラーを表示しない）
+    return output if output is not None else fallback
 
-    system_prompt = (
-        "あなたは天気情報を分かりやすく説明するアシスタントです。"
-        "与えられた情報のみを説明してください。新しい判断や推測は行わないでください。"
-        "回答には必ずデータの基準時刻(observed_at_jst)を含めてください。"
-        "snow_probabilityは推定値の可能性があるため、推定の場合は『推定』と明記してください。"
-    )
 
+def _call_llm(context: WeatherContext, deadline: float) -> str:
+    """
+    LLM を呼び出して検証済みのテキストを返す。
+    同時呼び出し数の上限待ちも deadline までに制限する。
+
+    Raises:
+        TimeoutError: deadline を過ぎた場合
+        LLMOutputValidation: 禁止された表現が含まれていた場合
+    """
     messages = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": _SYSTEM_PROMPT},
         {
             "role": "user",
-            "content": json.dumps(asdict(context), ensure_ascii=False),
+            "content": encode_context(context),
         },
     ]
+    _record_prompt_tokens(messages)
 
+    # 取得した枠は必ず下の finally で返す（取得と try の間で例外が起きないようにする）
+    if not llm_semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+        upstream_requests.labels("openai", "throttled").inc()
+        raise TimeoutError("LLM の同時呼び出し数の上限で待ち時間を超えました")
     try:
         client = _get_client()
-        res = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.3,
-        )
-        output = res.choices[0].message.content
-        # LLM出力をバリデーション（判断・推測・推奨を検出）
-        validate_llm_output(output)
+        start = time.perf_counter()
+        outcome = "error"
+        stream = None
+        try:
+            stream = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.3,
+                stream=True,
+                timeout=max(0.0, deadline - time.monotonic()),
+            )
+            # LLM出力をバリデーション（判断・推測・推奨を検出）
+            output = "".join(stream_validated(_iter_content(stream, deadline)))
+            outcome = "ok"
+        except LLMOutputValidation:
+            outcome = "rejected"
+            raise
+        except TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            if stream is not None and outcome != "ok":
+                # 生成を打ち切る（残りのトークンを受け取らない）
+                stream.close()
+            upstream_requests.labels("openai", outcome).inc()
+            upstream_duration.labels("openai").observe(time.perf_counter() - start)
         return output
-    except Exception as e:
-        # LLM 障害時フォールバック（エラーは内部ログのみに記録、ユーザーには表示しない）
-        logger.debug(
-            f"LLM API呼び出しに失敗しました: {type(e).__name__}: {e}",
-            exc_info=True
-        )
-        # フォールバックフォーマッターを使用（ユーザーにはエラーを表示しない）
-        return simple_format(context)
+    finally:
+        llm_semaphore.release()
+
+
+def _record_prompt_tokens(messages: list[dict[str, str]]) -> None:
+    """プロンプトの見積もりトークン数をメトリクスとトレースに記録する"""
+    tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    llm_prompt_tokens.observe(tokens)
+    trace = current_trace()
+    if trace is not None:
+        trace.attrs["prompt_tokens"] = tokens
+
+
+def _iter_content(stream, deadline: float):
+    """ストリーミングレスポンスから本文の差分だけを取り出す（deadline を過ぎたら打ち切る）"""
+    for chunk in stream:
+        if time.monotonic() > deadline:
+            raise TimeoutError("LLM の応答が時間内に完了しませんでした")
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
@@ -0,0 +1,64 @@
+"""
+GET /weather/query の HTTP キャッシュ（ETag・Cache-Control）
+
+OpenWeather の予報は3時間の予報枠（UTC 0,3,6,... 時始まり）ごとに更新されるため、
+/weather/query の結果は (都市, 日数, 予報枠) が同じなら変わらない。
+JST の日付の境目（UTC 15時）も予報枠の境目なので、「明日」などの日数の意味も枠の中では変わらない。
+
+- ETag は (都市, 日数, 予報枠の番号, 判定テーブルの版) から作る弱い ETag（W/"..."）
+- Cache-Control の max-age は次の予報枠の始まりまでの秒数
+- If-None-Match が一致すれば、天気を取得せずに 304 を返す
+
+ETag は本文のハッシュではなく、同じ枠の中で同じ予報を返すという意味での一致を表すため弱い ETag にする
+（枠の途中で上流の値が更新されると、再取得した本文のバイト列は一致しないことがある）。
+days=0（現在の天気）は予報枠と関係なく観測値が更新されるため、ETag を付けずに毎回取得する。
+"""
+import hashlib
+import time
+from typing import Optional
+
+from .llm_cache import SLOT_SECONDS, slot_end
+from .rule_tables import get_rules
+
+
+def slot_id(now: Optional[float] = None) -> int:
+    """now が属する予報枠の番号（エポックからの枠数）"""
+    if now is None:
+        now = time.time()
+    return int(now // SLOT_SECONDS)
+
+
+def cacheable(days: int) -> bool:
+    """予報枠の中で結果が変わらないか（予報のみ。現在の天気は観測ごとに変わる）"""
+    return days > 0
+
+
+def weather_etag(city: str, days: int, now: Optional[float] = None) -> str:
+    """
+    (都市, 日数, 予報枠) の弱い ETag。
+    判定テーブルが読み込み直されたら judgement が変わるため、テーブルの版も含める。
+    """
+    key = f"{city.strip()}\0{days}\0{slot_id(now)}\0{get_rules().version}"
+    return 'W/"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def cache_control(now: Optional[float] = None) -> str:
+    """次の予報枠の始まりまでキャッシュしてよいことを示す Cache-Control"""
+    if now is None:
+        now = time.time()
+    return f"public, max-age={max(int(slot_end(now) - now), 0)}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match（カンマ区切り・"*"・弱い ETag を含む）が etag と一致するか"""
+    if not if_none_match:
+        return False
+    # If-None-Match は弱い比較（RFC 9110 13.1.2）なので W/ の有無は問わない
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.removeprefix("W/") == opaque:
+            return True
+    return False
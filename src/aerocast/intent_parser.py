@@ -1,13 +1,27 @@
-import re
+import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Hashable, Optional
+
+from . import text_normalizer
+from .text_normalizer import TokenizedText, fold, tokenize
+from .metrics import record_cache
+
+# 日本時間
+JST = timezone(timedelta(hours=9))
+_JST_OFFSET_SECONDS = 9 * 60 * 60
+
+DEFAULT_INTENT_MEMO_SIZE = int(os.getenv("AEROCAST_INTENT_MEMO_SIZE", "8192"))
 
 
 # ===============================
 # Intent Model
 # ===============================
 
-@dataclass
+@dataclass(frozen=True)
 class WeatherIntent:
     city: str
     days: int  # 0〜5
@@ -17,36 +31,89 @@ class WeatherIntent:
 # Trigger / Noise Words
 # ===============================
 
-TRIGGER_WORDS = [
-    "天気",
-    "予報",
-    "雨",
-    "気温",
-    "暑い",
-    "寒い",
-]
-
-NOISE_WORDS = [
-    "の",
-    "を",
-    "について",
-    "教えて",
-    "教えてください",
-    "おしえて",
-    "おしえてください",
-    "ください",
-    "下さい",
-    "知りたい",
-    "は",
-    "って",
-]
-
-TIME_WORDS = [
-    "今日",
-    "明日",
-    "明後日",
-    "明々後日",
-]
+# 語の一覧は text_normalizer にまとめている（ここでは参照用に再公開）
+TRIGGER_WORDS = list(text_normalizer.TRIGGER_WORDS)
+NOISE_WORDS = list(text_normalizer.NOISE_WORDS)
+TIME_WORDS = list(text_normalizer.TIME_WORDS)
+
+
+# ===============================
+# Memo
+# ===============================
+
+_MISSING = object()
+
+
+def _next_jst_midnight(now: float) -> float:
+    """now（エポック秒）の翌日 0時（JST）"""
+    return ((now + _JST_OFFSET_SECONDS) // 86400 + 1) * 86400 - _JST_OFFSET_SECONDS
+
+
+class IntentMemo:
+    """
+    (入力, 文脈の都市, 文脈の日数) → 解析結果 の LRU キャッシュ
+    「週末」の日数が日付で変わるため、JST の日付が変わったら全件を破棄する。
+    破棄するたびに世代（generation）を進め、解析の途中で日付が変わった結果は put で捨てる。
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_INTENT_MEMO_SIZE):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, Optional[WeatherIntent]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._expires_at = 0.0
+        self._generation = 0
+
+    def generation(self) -> int:
+        """現在の世代（解析を始める前に取得し、put に渡す）"""
+        with self._lock:
+            self._expire()
+            return self._generation
+
+    def get(self, key: Hashable):
+        """見つからなければ _MISSING を返す（解析結果の None もキャッシュする）"""
+        with self._lock:
+            self._expire()
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Optional[WeatherIntent], generation: Optional[int] = None) -> None:
+        """generation が現在の世代と違えば（解析中に日付が変わった古い結果なので）保存しない"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._expire()
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._expires_at = 0.0
+            self._generation += 1
+
+    def _expire(self) -> None:
+        """JST の日付が変わっていれば全件を破棄する（ロックを取った状態で呼ぶ）"""
+        now = time.time()
+        if now >= self._expires_at:
+            self._entries.clear()
+            self._expires_at = _next_jst_midnight(now)
+            self._generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_memo = IntentMemo()
+
+
+def clear_intent_memo() -> None:
+    _memo.clear()
 
 
 # ===============================
@@ -60,22 +127,37 @@ def parse_weather_intent(
 ) -> Optional[WeatherIntent]:
     """
     天気意図を解析
+    同じ入力・文脈の結果はキャッシュから返す（JST の日付が変わるまで）。
     
     Args:
         text: ユーザー入力
         context_city: 前回の会話から引き継ぐ都市名
         context_days: 前回の会話から引き継ぐ日数
     """
-    text = text.strip()
+    key = (text, context_city, context_days)
+    intent = _memo.get(key)
+    record_cache("intent", intent is not _MISSING)
+    if intent is _MISSING:
+        generation = _memo.generation()
+        intent = _parse_weather_intent(text, context_city, context_days)
+        _memo.put(key, intent, generation)
+    return intent
+
+
+def _parse_weather_intent(
+    text: str,
+    context_city: Optional[str],
+    context_days: Optional[int],
+) -> Optional[WeatherIntent]:
+    tokenized = tokenize(fold(text))
 
     # --- 天気関連トリガー判定（緩和） ---
     # 文脈がある場合はトリガーワードがなくてもOK（「明日は？」など）
-    has_trigger = any(w in text for w in TRIGGER_WORDS)
-    if not has_trigger and context_city is None:
+    if not tokenized.has_trigger and context_city is None:
         return None
 
     # --- 日数判定 ---
-    days = _extract_days(text)
+    days = _extract_days(tokenized)
     if days is None:
         # 文脈から日数を引き継ぐ
         if context_days is not None:
@@ -84,7 +166,7 @@ def parse_weather_intent(
             days = 0  # デフォルトは今日
 
     # --- 都市名抽出 ---
-    city = _extract_city(text)
+    city = _extract_city(tokenized)
     if not city:
         # 文脈から都市名を引き継ぐ
         if context_city:
@@ -99,23 +181,16 @@ def parse_weather_intent(
 # Days Extraction
 # ===============================
 
-def _extract_days(text: str) -> Optional[int]:
+def _extract_days(tokenized: TokenizedText) -> Optional[int]:
     """日数を抽出（「週末」などの表現にも対応）"""
-    if "今日" in text:
-        return 0
-    if "明日" in text or "あした" in text:
-        return 1
-    if "明後日" in text or "あさって" in text:
-        return 2
-    if "明々後日" in text:
-        return 3
+    # 今日 → 明日 → 明後日 → 明々後日 の順に優先（複数あれば最も近い日）
+    if tokenized.time_days is not None:
+        return tokenized.time_days
     
     # 「週末」の処理（土曜日を基準に計算）
-    if "週末" in text or "しゅうまつ" in text:
-        # 簡易実装：今日から最も近い土曜日までの日数を返す
-        # より正確には、現在の曜日を考慮する必要がある
-        from datetime import datetime
-        today = datetime.now()
+    if tokenized.has_weekend:
+        # 簡易実装：今日（JST）から最も近い土曜日までの日数を返す
+        today = datetime.now(JST)
         weekday = today.weekday()  # 0=月曜日, 6=日曜日
         # 土曜日までの日数（5=土曜日）
         days_to_saturday = (5 - weekday) % 7
@@ -124,12 +199,8 @@ def _extract_days(text: str) -> Optional[int]:
         return min(days_to_saturday, 5)  # 最大5日後まで
 
     # 「◯日後」形式
-    m = re.search(r"(\d+)日後", text)
-    if m:
-        try:
-            return int(m.group(1))
-        except ValueError:
-            return None
+    if tokenized.days_after is not None:
+        return tokenized.days_after
 
     # 明示がない場合はNoneを返す（文脈から引き継ぐ）
     return None
@@ -139,28 +210,8 @@ def _extract_days(text: str) -> Optional[int]:
 # City Extraction
 # ===============================
 
-def _extract_city(text: str) -> Optional[str]:
-    city = text
-
-    # 時間表現削除（「◯日後」形式も含む）
-    for w in TIME_WORDS:
-        city = city.replace(w, "")
-    
-    # 「◯日後」形式を削除（例：「5日後」「3日後」）
-    city = re.sub(r"\d+日後", "", city)
-
-    # トリガーワード削除
-    for w in TRIGGER_WORDS:
-        city = city.replace(w, "")
-
-    # ノイズ削除
-    for w in NOISE_WORDS:
-        city = city.replace(w, "")
-
-    # 記号・余分な空白削除
-    city = re.sub(r"[?？!！。、]", "", city)
-    city = re.sub(r"\s+", "", city)
-
-    city = city.strip()
+def _extract_city(tokenized: TokenizedText) -> Optional[str]:
+    # 時間表現・トリガーワード・ノイズ・記号・空白をすべて除いた残りが都市名
+    city = tokenized.residue().strip()
     # 空文字列の場合はNoneを返す
     return city if city else None
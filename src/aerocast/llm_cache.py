@@ -0,0 +1,117 @@
+"""
+LLM 整形結果のキャッシュと同時実行制御
+
+役割:
+- WeatherContext のハッシュをキーに、LLM の整形結果を予報枠（3時間）の終わりまで保持する
+- 同じキーへの同時リクエストは1回の LLM 呼び出しにまとめる（シングルフライト）
+- LLM の同時呼び出し数をセマフォで制限する
+
+同じ都市・同じ予報枠への問い合わせが集中しても、LLM 呼び出しは1回で済む。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from .models import WeatherContext
+from .prompt_encoder import encode_context
+
+# OpenWeather の予報枠（UTC 0,3,6,... 時始まりの3時間）
+SLOT_SECONDS = 3 * 60 * 60
+
+DEFAULT_LLM_CACHE_SIZE = int(os.getenv("AEROCAST_LLM_CACHE_SIZE", "1024"))
+# LLM の同時呼び出し数の上限
+DEFAULT_LLM_CONCURRENCY = int(os.getenv("AEROCAST_LLM_CONCURRENCY", "4"))
+# LLM 呼び出し1回あたりの上限時間（秒）。待ち時間も含む
+DEFAULT_LLM_TIMEOUT = float(os.getenv("AEROCAST_LLM_TIMEOUT", "8"))
+
+
+def context_key(context: WeatherContext) -> str:
+    """WeatherContext の内容から決まるキャッシュキー（LLM に渡すメッセージのハッシュ）"""
+    return hashlib.sha256(encode_context(context).encode("utf-8")).hexdigest()
+
+
+def slot_end(now: Optional[float] = None) -> float:
+    """now が属する予報枠の終了時刻（エポック秒）"""
+    if now is None:
+        now = time.time()
+    return (now // SLOT_SECONDS + 1) * SLOT_SECONDS
+
+
+class SlotTTLCache:
+    """予報枠の終わりで失効する、件数上限付きの LRU キャッシュ"""
+
+    def __init__(self, maxsize: int = DEFAULT_LLM_CACHE_SIZE, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if self._clock() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = slot_end(self._clock())
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SingleFlight:
+    """同じキーの処理を1回にまとめる（後から来た呼び出しは先行の結果を待つ）"""
+
+    def __init__(self):
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> tuple[Future, bool]:
+        """
+        Returns:
+            (結果を受け取る Future, 自分が実行役かどうか)
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def resolve(self, key: str, future: Future, value: Optional[str]) -> None:
+        """実行役が結果（失敗時は None）を設定し、待っている呼び出しを起こす"""
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.set_result(value)
+
+
+llm_cache = SlotTTLCache()
+llm_flight = SingleFlight()
+llm_semaphore = threading.BoundedSemaphore(DEFAULT_LLM_CONCURRENCY)
+
+
+def clear_llm_cache() -> None:
+    llm_cache.clear()
@@ -1,14 +1,170 @@
+"""
+パッケージのロガー設定
+
+役割:
+- 既定では CRITICAL・出力なし（ユーザーにはエラーメッセージを表示しない）
+- AEROCAST_LOG_LEVEL を設定すると、構造化ログ（1行1件の JSON）を標準エラー出力に書く
+- 書き込みはキュー経由でリスナーのスレッドが行うため、リクエストのスレッドでは I/O もメッセージの整形もしない
+- イベントごとのサンプリング率（AEROCAST_LOG_SAMPLING）で、件数の多いイベントを間引く
+
+呼び出し側は f-string ではなく %-形式の引数で渡す（レベルで捨てるログの整形を省くため）。
+イベント名と付加情報は extra で渡す:
+
+    logger.debug("HTTP %s: %.2f秒後にリトライ", status, delay, extra={"event": "retry", "attempt": 2})
+
+1行の形式:
+
+    {"ts": 1773360000.123, "level": "DEBUG", "event": "retry", "message": "HTTP 503: 1.05秒後にリトライ",
+     "attempt": 2, "sample_rate": 0.1}
+"""
+import atexit
+import json
 import logging
+import os
+import queue
+import random
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Optional
 
-# ロガー設定：ユーザーにはエラーメッセージを表示しない
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.CRITICAL)  # CRITICALレベルに設定して、WARNING/ERRORを抑制
+# 出力するレベル（DEBUG / INFO / WARNING / ERROR / CRITICAL）。既定は CRITICAL で出力しない
+DEFAULT_LOG_LEVEL = os.getenv("AEROCAST_LOG_LEVEL", "CRITICAL")
+# json（1行1件の JSON）または text
+DEFAULT_LOG_FORMAT = os.getenv("AEROCAST_LOG_FORMAT", "json")
+# イベントごとのサンプリング率（例: "cache_hit=0.01,retry=0.1"）。指定のないイベントはすべて出力する
+DEFAULT_LOG_SAMPLING = os.getenv("AEROCAST_LOG_SAMPLING", "cache_hit=0.01,cache_miss=0.1")
+# キューに溜められる件数。書き込みが追いつかずに溢れた分は捨てる
+DEFAULT_LOG_QUEUE_SIZE = int(os.getenv("AEROCAST_LOG_QUEUE_SIZE", "10000"))
 
-# 既存のハンドラーをすべて削除
-logger.handlers.clear()
+# LogRecord の標準の属性（これ以外は extra として JSON に含める）
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
 
-# NullHandlerを使用して、デフォルトの標準エラー出力への出力を防ぐ
-handler = logging.NullHandler()
-logger.addHandler(handler)
+logger = logging.getLogger(__name__)
 logger.propagate = False  # ルートロガーへの伝播を防ぐ
+
+
+def parse_sampling(spec: str) -> dict[str, float]:
+    """"cache_hit=0.01,retry=0.1" → {"cache_hit": 0.01, "retry": 0.1}"""
+    rates = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        event, sep, rate = item.partition("=")
+        if not sep:
+            raise ValueError(f"サンプリング率の指定が不正です: {item!r}")
+        value = float(rate)
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"サンプリング率は 0〜1 で指定してください: {item!r}")
+        rates[event.strip()] = value
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """extra の event ごとのサンプリング率で間引く（残したログには sample_rate を付ける）"""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None:
+            return True
+        if rate < 1.0 and random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """1行1件の JSON（extra の値もそのまま含める）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", None),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    LogRecord をそのままキューに入れる（メッセージの整形はリスナーのスレッドで行う）。
+    キューが一杯のときは待たずに捨て、捨てた件数を dropped に数える。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    sampling: Optional[str] = None,
+    stream: Optional[IO[str]] = None,
+    queue_size: int = DEFAULT_LOG_QUEUE_SIZE,
+) -> None:
+    """
+    ロガーを設定し直す（省略した引数は環境変数の値）。
+    CRITICAL より詳しいレベルのときだけ、キューとリスナーのスレッドを用意する。
+    """
+    global _listener
+    shutdown_logging()
+    logger.handlers.clear()
+    logger.filters.clear()
+
+    level_no = logging.getLevelName((level or DEFAULT_LOG_LEVEL).upper())
+    if not isinstance(level_no, int):
+        raise ValueError(f"ログレベルが不正です: {level}")
+    logger.setLevel(level_no)
+    if level_no >= logging.CRITICAL:
+        # NullHandler を使用して、デフォルトの標準エラー出力への出力を防ぐ
+        logger.addHandler(logging.NullHandler())
+        return
+
+    logger.addFilter(SamplingFilter(parse_sampling(DEFAULT_LOG_SAMPLING if sampling is None else sampling)))
+    output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    if (fmt or DEFAULT_LOG_FORMAT) == "text":
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(event)s %(message)s", defaults={"event": "-"}
+        ))
+    else:
+        output.setFormatter(JSONFormatter())
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """キューに残ったログを書き出してリスナーを止める（アプリ終了時）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+configure_logging()
+atexit.register(shutdown_logging)
@@ -0,0 +1,455 @@
+"""
+Prometheus 形式のメトリクス
+
+役割:
+- カウンター・ヒストグラム・ゲージを提供し、/metrics でテキスト形式に出力する
+- HTTP ルートごとのレイテンシを計測する ASGI ミドルウェア
+
+ホットパスでロックを取らないよう、値はスレッドごとのセルに加算し、
+出力時（スクレイプ時）にだけ全スレッド分を合算する。
+"""
+import bisect
+import logging
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from .logger import logger
+
+
+# 秒単位のレイテンシ用バケット（1ms〜30s）
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class _ThreadCells:
+    """スレッドごとの加算用セル（書き込みは所有スレッドのみ、読み取りは合算）"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._cells: list[list[float]] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> list[float]:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0.0] * self._size
+            # 新しいスレッドが初めて書き込むときだけロックを取る
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+            return cell
+
+    def total(self) -> list[float]:
+        with self._lock:
+            cells = list(self._cells)
+        result = [0.0] * self._size
+        for cell in cells:
+            for i, v in enumerate(cell):
+                result[i] += v
+        return result
+
+
+class _CounterChild:
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._cells.cell()[0] += amount
+
+    def value(self) -> float:
+        return self._cells.total()[0]
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_cells")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self._buckets = buckets
+        # [バケットごとの件数..., +Inf の件数, 合計値]
+        self._cells = _ThreadCells(len(buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self._buckets, value)] += 1
+        cell[-1] += value
+
+    def snapshot(self) -> tuple[list[float], float, float]:
+        """(累積件数, 件数, 合計値)"""
+        total = self._cells.total()
+        cumulative = []
+        running = 0.0
+        for v in total[:-1]:
+            running += v
+            cumulative.append(running)
+        return cumulative, running, total[-1]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """ラベル値ごとの子メトリクス（初回のみロックを取る）"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: ラベルの数が一致しません")
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    def _items(self) -> list[tuple[tuple, object]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def _label_str(self, values: tuple, extra: Optional[tuple[str, str]] = None) -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra is not None:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def value(self, *values: str) -> float:
+        return self.labels(*values).value()
+
+    def _render_samples(self) -> list[str]:
+        return [
+            f"{self.name}{self._label_str(values)} {_fmt(child.value())}"
+            for values, child in self._items()
+        ]
+
+
+class Histogram(_Metric):
+    """バケット付きヒストグラム"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_samples(self) -> list[str]:
+        lines = []
+        for values, child in self._items():
+            cumulative, count, total = child.snapshot()
+            for bound, c in zip(self.buckets + (float("inf"),), cumulative):
+                le = "+Inf" if bound == float("inf") else _fmt(bound)
+                lines.append(f"{self.name}_bucket{self._label_str(values, ('le', le))} {_fmt(c)}")
+            lines.append(f"{self.name}_count{self._label_str(values)} {_fmt(count)}")
+            lines.append(f"{self.name}_sum{self._label_str(values)} {_fmt(total)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """スクレイプ時に関数で値を求めるゲージ"""
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Optional[Callable[[], dict[tuple, float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+
+    def set_function(self, callback: Callable[[], dict[tuple, float]]) -> None:
+        """{ラベル値のタプル: 値} を返す関数を設定する"""
+        self._callback = callback
+
+    def _render_samples(self) -> list[str]:
+        if self._callback is None:
+            return []
+        return [
+            f"{self.name}{self._label_str(values)} {_fmt(value)}"
+            for values, value in self._callback().items()
+        ]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Registry:
+    """メトリクスの登録先"""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ======================================
+# Instruments
+# ======================================
+
+http_request_duration = REGISTRY.register(Histogram(
+    "aerocast_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+))
+
+agent_step_duration = REGISTRY.register(Histogram(
+    "aerocast_agent_step_duration_seconds",
+    "Agent step latency (parse, geocode, fetch_current, markdown, ...)",
+    ["step"],
+))
+
+upstream_requests = REGISTRY.register(Counter(
+    "aerocast_upstream_requests_total",
+    "Upstream calls by endpoint and outcome",
+    ["endpoint", "outcome"],
+))
+
+upstream_duration = REGISTRY.register(Histogram(
+    "aerocast_upstream_duration_seconds",
+    "Upstream call latency by endpoint",
+    ["endpoint"],
+))
+
+retries = REGISTRY.register(Counter(
+    "aerocast_retries_total",
+    "Retries performed by retry.py by reason",
+    ["reason"],
+))
+
+backoff_seconds = REGISTRY.register(Counter(
+    "aerocast_backoff_seconds_total",
+    "Total time spent sleeping in retry backoff",
+))
+
+llm_prompt_tokens = REGISTRY.register(Histogram(
+    "aerocast_llm_prompt_tokens",
+    "Estimated prompt tokens per LLM request",
+    buckets=(25, 50, 100, 150, 200, 300, 400, 600, 800, 1200),
+))
+
+cache_requests = REGISTRY.register(Counter(
+    "aerocast_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+))
+
+
+def _cache_hit_ratios() -> dict[tuple, float]:
+    totals: dict[str, list[float]] = {}
+    for (cache, result), child in cache_requests._items():
+        hit_miss = totals.setdefault(cache, [0.0, 0.0])
+        hit_miss[0 if result == "hit" else 1] += child.value()
+    return {
+        (cache,): hits / (hits + misses)
+        for cache, (hits, misses) in totals.items()
+        if hits + misses > 0
+    }
+
+
+cache_hit_ratio = REGISTRY.register(Gauge(
+    "aerocast_cache_hit_ratio",
+    "Cache hit ratio by cache",
+    ["cache"],
+    callback=_cache_hit_ratios,
+))
+
+sessions = REGISTRY.register(Gauge(
+    "aerocast_sessions",
+    "Number of stored conversation sessions",
+))
+
+
+# スレッドプール（track_thread_pools で登録）
+_thread_pools: dict[str, object] = {}
+
+
+def _worker_thread_counts() -> dict[tuple, float]:
+    result: dict[tuple, float] = {("process", "threads"): threading.active_count()}
+    limiter = _thread_pools.get("anyio")
+    if limiter is not None:
+        # 同期ハンドラを実行する anyio のスレッドプール
+        result[("anyio", "busy")] = limiter.borrowed_tokens
+        result[("anyio", "limit")] = limiter.total_tokens
+    executor = getattr(_thread_pools.get("asyncio"), "_default_executor", None)
+    if executor is not None:
+        # asyncio.to_thread（SQLite のセッションの読み込み・保存など）の既定のスレッドプール。
+        # ThreadPoolExecutor の非公開の属性を読むため、Python のバージョンで変わっていたら出さない
+        try:
+            threads = len(getattr(executor, "_threads", ()))
+            idle = getattr(getattr(executor, "_idle_semaphore", None), "_value", 0)
+            work_queue = getattr(executor, "_work_queue", None)
+            result[("asyncio", "threads")] = threads
+            result[("asyncio", "busy")] = max(threads - idle, 0)
+            if work_queue is not None:
+                result[("asyncio", "queued")] = work_queue.qsize()
+        except (AttributeError, TypeError):
+            pass
+    return result
+
+
+worker_threads = REGISTRY.register(Gauge(
+    "aerocast_worker_threads",
+    "Worker threads by pool and state",
+    ["pool", "state"],
+    callback=_worker_thread_counts,
+))
+
+
+def track_thread_pools(limiter=None, loop=None) -> None:
+    """
+    スレッドの使用状況を aerocast_worker_threads に出すプールを登録する。
+
+    Args:
+        limiter: anyio の既定のスレッド数制限（同期ハンドラ用）
+        loop: 既定の executor（asyncio.to_thread 用）を持つイベントループ
+    """
+    if limiter is not None:
+        _thread_pools["anyio"] = limiter
+    if loop is not None:
+        _thread_pools["asyncio"] = loop
+
+
+# 流入制御のルートごとの待ち行列（track_admission で登録）
+_admission_gates: dict[str, object] = {}
+
+
+def _admission_counts() -> dict[tuple, float]:
+    result: dict[tuple, float] = {}
+    for route, gate in _admission_gates.items():
+        result[(route, "active")] = gate.active
+        result[(route, "queued")] = gate.queued
+        result[(route, "limit")] = gate.limit.concurrency
+    return result
+
+
+admission_requests = REGISTRY.register(Gauge(
+    "aerocast_admission_requests",
+    "Admission-controlled requests by route and state (active/queued/limit)",
+    ["route", "state"],
+    callback=_admission_counts,
+))
+
+admission_shed = REGISTRY.register(Counter(
+    "aerocast_admission_shed_total",
+    "Requests rejected by admission control by route and reason",
+    ["route", "reason"],
+))
+
+
+def track_admission(gates: dict[str, object]) -> None:
+    """流入制御のルートごとの待ち行列を aerocast_admission_requests に出す"""
+    _admission_gates.update(gates)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """キャッシュのヒット/ミスを記録する"""
+    result = "hit" if hit else "miss"
+    cache_requests.labels(cache, result).inc()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("cache %s %s", cache, result, extra={"event": f"cache_{result}", "cache": cache})
+
+
+def status_class(status_code) -> str:
+    """ステータスコードを 2xx/4xx/5xx などに丸める"""
+    if isinstance(status_code, int):
+        return f"{status_code // 100}xx"
+    return "unknown"
+
+
+class MetricsMiddleware:
+    """ルートごとのレイテンシを記録する ASGI ミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # ルーティング後は scope["route"] にマッチしたルートが入る（静的ファイルなどは無し）。
+            # 流入制御で断ったリクエストはルーティングされないので、対象ルートを別キーで受け取る
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope.get("aerocast.route") or "other"
+            http_request_duration.labels(
+                scope["method"], path, str(status[0])
+            ).observe(time.perf_counter() - start)
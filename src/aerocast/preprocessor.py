@@ -1,17 +1,22 @@
 import re
 
-# 文末の誤字・脱字を補正（正規表現, 置換後）
-PHRASE_MAP = [
-  (re.compile(r"教えてく$"), "教えてください"),
-  (re.compile(r"教えて$"), "教えてください"),
-  (re.compile(r"おしえてく$"), "おしえてください"),
-  (re.compile(r"おしえて$"), "おしえてください"),
-  (re.compile(r"おしえて下さい$"), "おしえてください"),
-  (re.compile(r"教えて下さい$"), "教えてください"),
-]
+from .text_normalizer import fold
+
+# 文末の誤字・脱字を補正（文末の表現 → 置換後）
+PHRASE_MAP = {
+  "教えてく": "教えてください",
+  "教えて": "教えてください",
+  "おしえてく": "おしえてください",
+  "おしえて": "おしえてください",
+  "おしえて下さい": "おしえてください",
+  "教えて下さい": "教えてください",
+}
+
+# 文末の表現をまとめた1つの正規表現（文末に一致するのは高々1つ）
+_PHRASE_RE = re.compile(
+  "(?:" + "|".join(re.escape(p) for p in sorted(PHRASE_MAP, key=len, reverse=True)) + ")$"
+)
 
 def normalize_user_input(text: str) -> str:
-  t = text.strip()
-  for pat, repl in PHRASE_MAP:
-    t = pat.sub(repl, t)
-  return t
\ No newline at end of file
+  t = fold(text)
+  return _PHRASE_RE.sub(lambda m: PHRASE_MAP[m.group()], t, count=1)
@@ -0,0 +1,228 @@
+"""
+実行中に切り替えられるサンプリングプロファイラー
+
+役割:
+- 既定では停止。/admin/profile/start または SIGUSR2 で開始し、再起動なしで本番のワーカーを計測する
+- 別スレッドから一定間隔で全スレッドのスタック（sys._current_frames）を取り、スタックごとの回数を数える
+- パッケージ内のフレーム（agent_loop._run_inner・weather_api など）を含むスタックだけを残す
+- 結果は flamegraph.pl・speedscope で読める collapsed 形式（"root;...;leaf 回数" の1行1スタック）で出力する
+
+計測対象のコードには手を入れないため、停止中のオーバーヘッドはない。
+開始後は AEROCAST_PROFILE_MAX_SECONDS で自動的に止まる（止め忘れ防止）。
+自動的に止まったときは結果を AEROCAST_PROFILE_DIR に書く（SIGUSR2 で開始した計測の結果を、
+次の SIGUSR2 で新しい計測が始まって失わないようにするため）。
+ワーカーごとに別のプロファイラーが動くため、複数ワーカーでは計測したいワーカーごとに取得する。
+"""
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Any, Optional
+
+from .logger import logger
+
+# サンプリング間隔（ミリ秒）
+DEFAULT_PROFILE_INTERVAL_MS = float(os.getenv("AEROCAST_PROFILE_INTERVAL_MS", "10"))
+# 開始してから自動的に止めるまでの秒数（0 で無制限）
+DEFAULT_PROFILE_MAX_SECONDS = float(os.getenv("AEROCAST_PROFILE_MAX_SECONDS", "60"))
+# SIGUSR2 で止めたとき・自動的に止まったときに collapsed 形式のファイルを書く場所
+DEFAULT_PROFILE_DIR = os.getenv("AEROCAST_PROFILE_DIR", tempfile.gettempdir())
+
+_PACKAGE_DIR = str(Path(__file__).resolve().parent)
+
+
+class SamplingProfiler:
+    """
+    全スレッドのスタックを一定間隔で取り、collapsed 形式のスタックごとに数える。
+    focus 以下のファイルのフレームを含まないスタック（待機中のスレッドなど）は数えない。
+    """
+
+    def __init__(self, focus: Optional[str] = _PACKAGE_DIR):
+        self.focus = focus
+        self.interval_ms = DEFAULT_PROFILE_INTERVAL_MS
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stacks: Counter[str] = Counter()
+        self._names: dict[CodeType, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(
+        self,
+        interval_ms: float = DEFAULT_PROFILE_INTERVAL_MS,
+        max_seconds: float = DEFAULT_PROFILE_MAX_SECONDS,
+    ) -> bool:
+        """計測を始める（前回の結果は破棄する）。すでに動いていれば False"""
+        if interval_ms <= 0:
+            raise ValueError("interval_ms は正の値で指定してください")
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks.clear()
+            self.samples = 0
+            self.interval_ms = interval_ms
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop = threading.Event()
+            deadline = time.monotonic() + max_seconds if max_seconds > 0 else None
+            self._thread = threading.Thread(
+                target=self._run, args=(self._stop, interval_ms / 1000, deadline),
+                name="aerocast-profiler", daemon=True,
+            )
+            self._thread.start()
+        logger.info("プロファイラーを開始しました（%.1fms 間隔）", interval_ms, extra={"event": "profile_start"})
+        return True
+
+    def stop(self) -> bool:
+        """計測を止める（結果は残す）。動いていなければ False"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return False
+            self._stop.set()
+        thread.join()
+        logger.info("プロファイラーを停止しました（%d サンプル）", self.samples, extra={"event": "profile_stop"})
+        return True
+
+    def _run(self, stop: threading.Event, interval: float, deadline: Optional[float]) -> None:
+        me = threading.get_ident()
+        expired = False
+        while not stop.wait(interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                expired = True
+                break
+            self.sample(skip=me)
+        self.stopped_at = time.time()
+        if expired:
+            logger.info("プロファイラーが自動的に停止しました（%d サンプル）", self.samples, extra={"event": "profile_stop"})
+            _save(self)
+
+    def sample(self, skip: Optional[int] = None) -> None:
+        """全スレッドのスタックを1回取る"""
+        stacks = [
+            self._collapse(frame)
+            for ident, frame in sys._current_frames().items()
+            if ident != skip
+        ]
+        with self._lock:
+            self.samples += 1
+            for stack in stacks:
+                if stack is not None:
+                    self._stacks[stack] += 1
+
+    def _name(self, code: CodeType) -> str:
+        name = self._names.get(code)
+        if name is None:
+            name = f"{Path(code.co_filename).stem}.{code.co_qualname}"
+            self._names[code] = name
+        return name
+
+    def _collapse(self, frame: Optional[FrameType]) -> Optional[str]:
+        names = []
+        focused = self.focus is None
+        while frame is not None:
+            code = frame.f_code
+            names.append(self._name(code))
+            if not focused and code.co_filename.startswith(self.focus):
+                focused = True
+            frame = frame.f_back
+        if not focused:
+            return None
+        names.reverse()
+        return ";".join(names)
+
+    def collapsed(self) -> str:
+        """collapsed 形式のスタック（回数の多い順）"""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def dump(self, directory: Optional[str] = None) -> Path:
+        """collapsed 形式のスタックをファイルに書き、そのパスを返す（省略時は AEROCAST_PROFILE_DIR）"""
+        path = Path(directory or DEFAULT_PROFILE_DIR) / f"aerocast-profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+        path.write_text(self.collapsed(), encoding="utf-8")
+        return path
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "interval_ms": self.interval_ms,
+                "samples": self.samples,
+                "stacks": len(self._stacks),
+                "started_at": self.started_at,
+                "stopped_at": self.stopped_at,
+            }
+
+
+_profiler = SamplingProfiler()
+
+
+def start_profiling(
+    interval_ms: float = DEFAULT_PROFILE_INTERVAL_MS,
+    max_seconds: float = DEFAULT_PROFILE_MAX_SECONDS,
+) -> bool:
+    return _profiler.start(interval_ms, max_seconds)
+
+
+def stop_profiling() -> bool:
+    return _profiler.stop()
+
+
+def profile_status() -> dict[str, Any]:
+    return _profiler.status()
+
+
+def collapsed_stacks() -> str:
+    return _profiler.collapsed()
+
+
+def dump_profile(directory: Optional[str] = None) -> Path:
+    """collapsed 形式のスタックをファイルに書き、そのパスを返す（省略時は AEROCAST_PROFILE_DIR）"""
+    return _profiler.dump(directory)
+
+
+def _save(profiler: SamplingProfiler) -> Optional[Path]:
+    """結果をファイルに書いてログに残す（書けなければ None）"""
+    try:
+        path = profiler.dump()
+    except OSError as e:
+        logger.warning("プロファイルを書き込めませんでした: %s", e, extra={"event": "profile_error"})
+        return None
+    logger.info("プロファイルを書き込みました: %s", path, extra={"event": "profile_dump", "path": str(path)})
+    return path
+
+
+def _toggle() -> None:
+    """停止中なら開始し、計測中なら止めて結果をファイルに書く"""
+    if start_profiling():
+        return
+    stop_profiling()
+    _save(_profiler)
+
+
+def _on_signal(signum, frame) -> None:
+    # シグナルハンドラーはメインスレッドの任意の位置で動くため、ロックを取る処理は別スレッドで行う
+    threading.Thread(target=_toggle, name="aerocast-profiler-toggle", daemon=True).start()
+
+
+def install_signal_handler() -> bool:
+    """SIGUSR2 で計測を切り替えられるようにする（メインスレッド以外・非対応の OS では何もしない）"""
+    if not hasattr(signal, "SIGUSR2"):
+        return False
+    try:
+        signal.signal(signal.SIGUSR2, _on_signal)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,81 @@
+"""
+LLM に渡すプロンプトのコンパクトなエンコード
+
+役割:
+- WeatherContext を短いキーの1行 JSON にする（null・固定値・判定の根拠コードは送らない）
+- プロンプトのトークン数を見積もる
+
+キーの意味は PROMPT_LEGEND としてシステムプロンプトに含める。
+凡例もリクエストごとに送るため、システムプロンプトとあわせた合計が
+asdict(WeatherContext) をそのまま送る場合より小さくなるよう、凡例は短く保つ。
+"""
+import json
+from typing import Any
+
+from .models import WeatherContext
+
+# 短いキー → WeatherResult / 判定のフィールド
+_WEATHER_KEYS = (
+    ("c", "city"),
+    ("w", "weather"),
+    ("t", "temp"),
+    ("fl", "feels_like"),
+    ("h", "humidity"),
+    ("rp", "rain_probability"),
+    ("ws", "wind_speed"),
+    ("at", "observed_at_jst"),
+    ("sp", "snow_probability"),
+    ("sv", "snow_volume_mm_3h"),
+    ("d", "date"),
+)
+
+PROMPT_LEGEND = (
+    "c=地域 w=天気 t=気温℃ fl=体感温度℃ h=湿度% rp=降水確率% ws=風速m/s at=基準時刻 "
+    "sp=雪確率%(推定含む) sv=積雪mm/3h d=予報日 fc=1:予報 u=1:傘が必要 wa=1:強風注意 cf=快適度"
+)
+
+
+def _compact_number(value: Any) -> Any:
+    """整数値の float は int にする（25.0 → 25）"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def compact_context(context: WeatherContext) -> dict[str, Any]:
+    """
+    LLM に渡す値だけを短いキーで取り出す。
+    source（固定値）・判定の根拠コード・判定に重複して入っている風速/体感温度は含めない。
+    """
+    w = context.weather
+    data: dict[str, Any] = {}
+    for short, name in _WEATHER_KEYS:
+        value = getattr(w, name)
+        if value is not None:
+            data[short] = _compact_number(value)
+    if w.type == "forecast":
+        data["fc"] = 1
+    data["u"] = int(context.umbrella.needed)
+    data["wa"] = int(context.wind.alert)
+    data["cf"] = context.comfort.level
+    return data
+
+
+def encode_context(context: WeatherContext) -> str:
+    """LLM に渡すユーザーメッセージ（空白なしの1行 JSON）"""
+    return json.dumps(compact_context(context), ensure_ascii=False, separators=(",", ":"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数の見積もり（tokenizer を使わない概算）。
+    ASCII はおよそ4文字で1トークン、日本語などの非 ASCII は1文字1トークンとして数える。
+    """
+    ascii_chars = 0
+    other_chars = 0
+    for ch in text:
+        if ch < "\x80":
+            ascii_chars += 1
+        else:
+            other_chars += 1
+    return other_chars + (ascii_chars + 3) // 4
@@ -0,0 +1,120 @@
+"""
+返信（Markdown と判定結果）のキャッシュ。
+
+build_summary → build_advice → format_to_markdown と判定は、
+WeatherResult・日数・日付（JST）が同じなら結果も同じになる。
+同じ都市・同じ予報枠へのリクエストは、組み立て済みの返信をそのまま返す。
+"""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Hashable, Optional
+
+from .models import WeatherResult
+from .rules import decide_all
+from .rule_tables import get_rules
+from .weather_summary import build_summary
+from .advice_engine import build_advice
+from .formatter import format_to_markdown
+from .metrics import record_cache
+from .tracing import span
+
+JST = timezone(timedelta(hours=9))
+
+DEFAULT_RENDER_CACHE_SIZE = int(os.getenv("AEROCAST_RENDER_CACHE_SIZE", "4096"))
+
+_WEATHER_FIELDS = tuple(f.name for f in fields(WeatherResult))
+
+
+@dataclass(frozen=True)
+class RenderedReply:
+    """組み立て済みの返信"""
+    markdown: str
+    judgement: dict[str, dict[str, Any]]
+
+
+class RenderCache:
+    """件数上限付きの LRU キャッシュ"""
+
+    def __init__(self, maxsize: int = DEFAULT_RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, RenderedReply] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[RenderedReply]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: RenderedReply) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache = RenderCache()
+
+
+def render_key(w: WeatherResult, days_offset: int, today: Optional[str] = None) -> tuple:
+    """
+    キャッシュキー（WeatherResult の全フィールド・日数・JST の日付・判定テーブルの版）
+    日付ラベル（「3月14日頃」）と季節コメント（月）が日付に依存するため日付を含める。
+    判定テーブルが読み込み直されたら古い返信を使わないよう版を含める。
+    """
+    if today is None:
+        today = datetime.now(JST).date().isoformat()
+    return tuple(getattr(w, name) for name in _WEATHER_FIELDS) + (days_offset, today, get_rules().version)
+
+
+def _render(w: WeatherResult, days_offset: int) -> RenderedReply:
+    umbrella, wind, comfort = decide_all(w)
+    with span("summary"):
+        summary = build_summary(w, days_offset=days_offset)
+    with span("advice"):
+        advice = build_advice(w, umbrella=umbrella, wind=wind, comfort=comfort)
+    with span("markdown"):
+        markdown = format_to_markdown(summary, advice)
+    return RenderedReply(
+        markdown=markdown,
+        judgement={
+            "umbrella": asdict(umbrella),
+            "wind": asdict(wind),
+            "comfort": asdict(comfort),
+        },
+    )
+
+
+def render_reply(w: WeatherResult, days_offset: int = 0) -> RenderedReply:
+    """
+    返信を組み立てる（キャッシュにあればそれを返す）。
+    judgement は呼び出し側で書き換えても共有されないようコピーして返す。
+    """
+    key = render_key(w, days_offset)
+    cached = _cache.get(key)
+    record_cache("render", cached is not None)
+    if cached is None:
+        cached = _render(w, days_offset)
+        _cache.put(key, cached)
+    return RenderedReply(
+        markdown=cached.markdown,
+        judgement={k: dict(v) for k, v in cached.judgement.items()},
+    )
+
+
+def clear_render_cache() -> None:
+    _cache.clear()
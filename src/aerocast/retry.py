@@ -2,19 +2,37 @@
 リトライ機能（バックオフ付き）
 429/5xxエラーに対して指数バックオフで再試行
 """
+import asyncio
 import time
 import random
-from typing import Callable, TypeVar, Optional
+from typing import Awaitable, Callable, TypeVar, Optional
 from functools import wraps
 
+import httpx
 from requests import RequestException
 from requests.exceptions import HTTPError
 
 from .logger import logger
+from .metrics import retries, backoff_seconds
 
 T = TypeVar('T')
 
 
+def _backoff_delay(attempt: int, base_delay: float, max_delay: float, jitter: bool) -> float:
+    """attempt 回目（0始まり）の待機時間"""
+    delay = min(base_delay * (2 ** attempt), max_delay)
+    if jitter:
+        # ジッターを追加（0〜20%のランダムな遅延）
+        delay = delay * (1 + random.uniform(0, 0.2))
+    return delay
+
+
+def _record_retry(reason: str, delay: float) -> None:
+    """リトライ回数とバックオフ時間をメトリクスに記録する"""
+    retries.labels(reason).inc()
+    backoff_seconds.inc(delay)
+
+
 def exponential_backoff(
     max_retries: int = 3,
     base_delay: float = 1.0,
@@ -45,19 +63,14 @@ def exponential_backoff(
                     
                     # リトライ可能なエラーかチェック
                     if status_code in retryable_status_codes and attempt < max_retries:
-                        delay = min(
-                            base_delay * (2 ** attempt),
-                            max_delay
-                        )
-                        
-                        if jitter:
-                            # ジッターを追加（0〜20%のランダムな遅延）
-                            delay = delay * (1 + random.uniform(0, 0.2))
+                        delay = _backoff_delay(attempt, base_delay, max_delay, jitter)
                         
                         logger.debug(
-                            f"HTTP {status_code}エラーが発生しました。"
-                            f"{delay:.2f}秒後にリトライします（試行 {attempt + 1}/{max_retries + 1}）"
+                            "HTTP %sエラーが発生しました。%.2f秒後にリトライします（試行 %d/%d）",
+                            status_code, delay, attempt + 1, max_retries + 1,
+                            extra={"event": "retry", "reason": f"http_{status_code}", "attempt": attempt + 1},
                         )
+                        _record_retry(f"http_{status_code}", delay)
                         time.sleep(delay)
                         last_exception = e
                         continue
@@ -68,18 +81,14 @@ def exponential_backoff(
                 except RequestException as e:
                     # ネットワークエラーなどもリトライ
                     if attempt < max_retries:
-                        delay = min(
-                            base_delay * (2 ** attempt),
-                            max_delay
-                        )
-                        
-                        if jitter:
-                            delay = delay * (1 + random.uniform(0, 0.2))
+                        delay = _backoff_delay(attempt, base_delay, max_delay, jitter)
                         
                         logger.debug(
-                            f"リクエストエラーが発生しました: {type(e).__name__}。"
-                            f"{delay:.2f}秒後にリトライします（試行 {attempt + 1}/{max_retries + 1}）"
+                            "リクエストエラーが発生しました: %s。%.2f秒後にリトライします（試行 %d/%d）",
+                            type(e).__name__, delay, attempt + 1, max_retries + 1,
+                            extra={"event": "retry", "reason": "network", "attempt": attempt + 1},
                         )
+                        _record_retry("network", delay)
                         time.sleep(delay)
                         last_exception = e
                         continue
@@ -118,13 +127,14 @@ def retry_with_backoff(
             status_code = e.response.status_code if hasattr(e, 'response') and e.response else None
             
             if status_code in retryable_status_codes and attempt < max_retries:
-                delay = min(base_delay * (2 ** attempt), max_delay)
-                if jitter:
-                    delay = delay * (1 + random.uniform(0, 0.2))
+                delay = _backoff_delay(attempt, base_delay, max_delay, jitter)
                 
                 logger.debug(
-                    f"HTTP {status_code}エラー。{delay:.2f}秒後にリトライ（{attempt + 1}/{max_retries + 1}）"
+                    "HTTP %sエラー。%.2f秒後にリトライ（%d/%d）",
+                    status_code, delay, attempt + 1, max_retries + 1,
+                    extra={"event": "retry", "reason": f"http_{status_code}", "attempt": attempt + 1},
                 )
+                _record_retry(f"http_{status_code}", delay)
                 time.sleep(delay)
                 last_exception = e
                 continue
@@ -133,14 +143,14 @@ def retry_with_backoff(
                 
         except RequestException as e:
             if attempt < max_retries:
-                delay = min(base_delay * (2 ** attempt), max_delay)
-                if jitter:
-                    delay = delay * (1 + random.uniform(0, 0.2))
+                delay = _backoff_delay(attempt, base_delay, max_delay, jitter)
                 
                 logger.debug(
-                    f"リクエストエラー: {type(e).__name__}。"
-                    f"{delay:.2f}秒後にリトライ（{attempt + 1}/{max_retries + 1}）"
+                    "リクエストエラー: %s。%.2f秒後にリトライ（%d/%d）",
+                    type(e).__name__, delay, attempt + 1, max_retries + 1,
+                    extra={"event": "retry", "reason": "network", "attempt": attempt + 1},
                 )
+                _record_retry("network", delay)
                 time.sleep(delay)
                 last_exception = e
                 continue
@@ -150,3 +160,58 @@ def retry_with_backoff(
     if last_exception:
         raise last_exception
     raise RuntimeError("予期しないエラーが発生しました")
+
+
+def async_exponential_backoff(
+    max_retries: int = 3,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    jitter: bool = True,
+    retryable_status_codes: set[int] = {429, 500, 502, 503, 504}
+) -> Callable:
+    """
+    exponential_backoff の async 版（httpx 用）
+    待機は asyncio.sleep で行うため、リトライ中もイベントループを止めない。
+    """
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @wraps(func)
+        async def wrapper(*args, **kwargs) -> T:
+            last_exception = None
+
+            for attempt in range(max_retries + 1):
+                try:
+                    return await func(*args, **kwargs)
+                except httpx.HTTPStatusError as e:
+                    status_code = e.response.status_code
+                    if status_code in retryable_status_codes and attempt < max_retries:
+                        delay = _backoff_delay(attempt, base_delay, max_delay, jitter)
+                        logger.debug(
+                            "HTTP %sエラーが発生しました。%.2f秒後にリトライします（試行 %d/%d）",
+                            status_code, delay, attempt + 1, max_retries + 1,
+                            extra={"event": "retry", "reason": f"http_{status_code}", "attempt": attempt + 1},
+                        )
+                        _record_retry(f"http_{status_code}", delay)
+                        await asyncio.sleep(delay)
+                        last_exception = e
+                        continue
+                    raise
+                except httpx.RequestError as e:
+                    if attempt < max_retries:
+                        delay = _backoff_delay(attempt, base_delay, max_delay, jitter)
+                        logger.debug(
+                            "リクエストエラーが発生しました: %s。%.2f秒後にリトライします（試行 %d/%d）",
+                            type(e).__name__, delay, attempt + 1, max_retries + 1,
+                            extra={"event": "retry", "reason": "network", "attempt": attempt + 1},
+                        )
+                        _record_retry("network", delay)
+                        await asyncio.sleep(delay)
+                        last_exception = e
+                        continue
+                    raise
+
+            if last_exception:
+                raise last_exception
+            raise RuntimeError("予期しないエラーが発生しました")
+
+        return wrapper
+    return decorator
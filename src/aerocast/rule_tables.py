@@ -0,0 +1,233 @@
+"""
+判断ルールの閾値テーブル
+
+役割:
+- 傘・風・快適度の閾値（帯 → コード）を設定ファイル（JSON）から読み込む
+- テーブルを二分探索の評価器にコンパイルし、スカラー評価と一括評価（NumPy）の両方に使う
+- ファイルが更新されたら再起動なしで読み込み直す
+
+設定ファイル（AEROCAST_RULES_PATH）の形式:
+
+    {
+      "umbrella": {"bounds": [40], "codes": ["RAIN_PROB_LT_40", "RAIN_PROB_GE_40"], "flags": [false, true]},
+      "wind":     {"bounds": [10], "codes": ["WIND_LT_10", "WIND_GE_10"], "flags": [false, true]},
+      "comfort":  {"bounds": [10, 20, 30], "codes": ["COLD", "COOL", "WARM", "HOT"]}
+    }
+
+値が bounds[i] 以上なら i+1 番目の帯になる（bounds は昇順）。
+flags は帯ごとの needed / alert。設定ファイルのないテーブルは既定値（rules.py の定数）を使う。
+codes は判定結果（models.py の UmbrellaDecision.rain_code・WindDecision.reason_code・
+ComfortDecision.level）に定義された値だけを使える。
+
+読み込み直しは新しい CompiledRules を作って参照を差し替えるだけなので、
+処理中のリクエストは止まらず、取得済みの古いテーブルで最後まで評価される。
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional, get_args
+
+from .logger import logger
+from .models import ComfortDecision, UmbrellaDecision, WindDecision
+
+# 設定ファイルの更新を確認する間隔（秒）
+DEFAULT_CHECK_INTERVAL = float(os.getenv("AEROCAST_RULES_CHECK_INTERVAL", "1.0"))
+
+TABLE_NAMES = ("umbrella", "wind", "comfort")
+
+# テーブルごとに使えるコード（判定結果の Literal 型の値）
+ALLOWED_CODES: dict[str, frozenset[str]] = {
+    "umbrella": frozenset(get_args(UmbrellaDecision.__annotations__["rain_code"])),
+    "wind": frozenset(get_args(WindDecision.__annotations__["reason_code"])),
+    "comfort": frozenset(get_args(ComfortDecision.__annotations__["level"])),
+}
+
+
+@dataclass(frozen=True)
+class RuleTable:
+    """1つの判定の閾値テーブル（帯 → コード）"""
+    bounds: tuple[float, ...]
+    codes: tuple[str, ...]
+    flags: Optional[tuple[bool, ...]] = None
+
+    def __post_init__(self):
+        if len(self.codes) != len(self.bounds) + 1:
+            raise ValueError("codes の数は bounds の数 + 1 にしてください")
+        if any(a >= b for a, b in zip(self.bounds, self.bounds[1:])):
+            raise ValueError("bounds は昇順（重複なし）にしてください")
+        if self.flags is not None and len(self.flags) != len(self.codes):
+            raise ValueError("flags の数は codes の数と同じにしてください")
+
+    def index(self, value: float) -> int:
+        """値が属する帯のインデックス（NaN は最も低い帯）"""
+        if value != value:
+            return 0
+        return bisect.bisect_right(self.bounds, value)
+
+    def code(self, value: float) -> str:
+        return self.codes[self.index(value)]
+
+    def flag(self, value: float) -> bool:
+        return bool(self.flags[self.index(value)]) if self.flags else False
+
+    def indices(self, values):
+        """配列をまとめて評価し、帯のインデックス（int8）の配列を返す"""
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        result = np.searchsorted(self.bounds, values, side="right").astype(np.int8)
+        result[np.isnan(values)] = 0
+        return result
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any], allowed_codes: Optional[frozenset[str]] = None) -> "RuleTable":
+        """
+        設定の dict からテーブルを作る。
+
+        Raises:
+            ValueError: allowed_codes にないコードを含む場合
+        """
+        flags = data.get("flags")
+        codes = tuple(str(c) for c in data["codes"])
+        if allowed_codes is not None:
+            unknown = [c for c in codes if c not in allowed_codes]
+            if unknown:
+                raise ValueError(f"使えないコードです: {unknown}（使えるのは {sorted(allowed_codes)}）")
+        return cls(
+            bounds=tuple(float(b) for b in data["bounds"]),
+            codes=codes,
+            flags=tuple(bool(f) for f in flags) if flags is not None else None,
+        )
+
+
+@dataclass(frozen=True)
+class CompiledRules:
+    """読み込み済みのテーブル一式（version は読み込むたびに増える）"""
+    umbrella: RuleTable
+    wind: RuleTable
+    comfort: RuleTable
+    version: int = 0
+
+
+def default_tables() -> dict[str, RuleTable]:
+    """rules.py の定数から作る既定のテーブル"""
+    from .rules import RAIN_UMBRELLA_THRESHOLD, WIND_ALERT_THRESHOLD, COMFORT_BOUNDS
+
+    return {
+        "umbrella": RuleTable(
+            bounds=(float(RAIN_UMBRELLA_THRESHOLD),),
+            codes=("RAIN_PROB_LT_40", "RAIN_PROB_GE_40"),
+            flags=(False, True),
+        ),
+        "wind": RuleTable(
+            bounds=(float(WIND_ALERT_THRESHOLD),),
+            codes=("WIND_LT_10", "WIND_GE_10"),
+            flags=(False, True),
+        ),
+        "comfort": RuleTable(
+            bounds=tuple(float(b) for b in COMFORT_BOUNDS),
+            codes=("COLD", "COOL", "WARM", "HOT"),
+        ),
+    }
+
+
+def compile_rules(data: Optional[dict[str, Any]] = None, version: int = 0) -> CompiledRules:
+    """
+    設定（JSON を読み込んだ dict）からテーブル一式を作る。
+
+    Raises:
+        ValueError: テーブルの形式が正しくない場合
+    """
+    tables = default_tables()
+    for name, table in (data or {}).items():
+        if name not in TABLE_NAMES:
+            raise ValueError(f"不明なテーブルです: {name}")
+        try:
+            tables[name] = RuleTable.from_dict(table, ALLOWED_CODES[name])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"テーブル {name} の形式が正しくありません: {e}") from e
+    return CompiledRules(version=version, **tables)
+
+
+class RuleStore:
+    """
+    テーブル一式を保持し、設定ファイルの更新を検知して読み込み直す。
+    get() は通常ロックを取らず、確認間隔ごとに1スレッドだけがファイルの更新時刻を確認する。
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._rules = compile_rules()
+        self._mtime: Optional[int] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        if path:
+            self._check(force=True)
+
+    def get(self) -> CompiledRules:
+        if self.path and time.monotonic() >= self._next_check:
+            self._check()
+        return self._rules
+
+    def reload(self) -> CompiledRules:
+        """更新時刻にかかわらず読み込み直す"""
+        self._check(force=True)
+        return self._rules
+
+    def _check(self, force: bool = False) -> None:
+        if not self._lock.acquire(blocking=force):
+            # 他のスレッドが確認中なら現在のテーブルを使う
+            return
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                logger.warning("ルール設定ファイルを参照できません: %s: %s", self.path, e, extra={"event": "rules_error"})
+                return
+            if not force and mtime == self._mtime:
+                return
+            self._mtime = mtime
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                rules = compile_rules(data, version=self._rules.version + 1)
+            except (OSError, ValueError) as e:
+                # 書き込み途中や誤った設定では、直前のテーブルを使い続ける
+                logger.warning("ルール設定ファイルを読み込めませんでした: %s: %s", self.path, e, extra={"event": "rules_error"})
+                return
+            self._rules = rules
+            logger.info(
+                "ルール設定を読み込みました: %s (version=%d)", self.path, rules.version,
+                extra={"event": "rules_reload", "version": rules.version},
+            )
+        finally:
+            self._lock.release()
+
+
+_store: Optional[RuleStore] = None
+_store_lock = threading.Lock()
+
+
+def get_rule_store() -> RuleStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RuleStore(os.getenv("AEROCAST_RULES_PATH") or None)
+    return _store
+
+
+def get_rules() -> CompiledRules:
+    """現在のテーブル一式"""
+    return get_rule_store().get()
+
+
+def set_rule_store(store: RuleStore) -> None:
+    """テーブルの保持先を差し替える（テスト用）"""
+    global _store
+    _store = store
@@ -1,9 +1,12 @@
+from typing import Optional
+
 from .models import (
     WeatherResult,
     UmbrellaDecision,
     WindDecision,
     ComfortDecision,
 )
+from .rule_tables import CompiledRules, get_rules
 
 # ===============================
 # Constants (Decision Threshholds)
@@ -11,28 +14,26 @@ from .models import (
 
 RAIN_UMBRELLA_THRESHOLD = 40 # %
 WIND_ALERT_THRESHOLD = 10 # m/s
+COMFORT_BOUNDS = (10, 20, 30) # ℃ (COLD / COOL / WARM / HOT の境界)
+
+# 実際の判定は rule_tables のテーブル（既定値は上記の定数、AEROCAST_RULES_PATH で変更可）で行う
 
 # ===============================
 # Umbrella Decision
 # ===============================
 
-def decide_umbrella(weather: WeatherResult) -> UmbrellaDecision:
+def decide_umbrella(weather: WeatherResult, rules: Optional[CompiledRules] = None) -> UmbrellaDecision:
     """
 
     傘が必要か降水確率のみで判断する
     推測や補正は行わない
     """
-    rp = weather.rain_probability
-
-    if rp >= RAIN_UMBRELLA_THRESHOLD:
-        return UmbrellaDecision(
-            needed=True,
-            rain_code="RAIN_PROB_GE_40",
-        )
-    
+    table = (rules or get_rules()).umbrella
+    i = table.index(weather.rain_probability)
+
     return UmbrellaDecision(
-        needed=False,
-        rain_code="RAIN_PROB_LT_40",
+        needed=bool(table.flags[i]) if table.flags else False,
+        rain_code=table.codes[i],
     )
 
 
@@ -40,23 +41,18 @@ def decide_umbrella(weather: WeatherResult) -> UmbrellaDecision:
 # Wind Decision
 # ===============================
 
-def decide_wind(weather: WeatherResult) -> WindDecision:
+def decide_wind(weather: WeatherResult, rules: Optional[CompiledRules] = None) -> WindDecision:
     """
     風速のみで注意が必要かを判断する
     """
     ws = weather.wind_speed
-    
-    if ws >= WIND_ALERT_THRESHOLD:
-        return WindDecision(
-            alert=True,
-            wind_speed=ws,
-            reason_code="WIND_GE_10",
-        )
-    
+    table = (rules or get_rules()).wind
+    i = table.index(ws)
+
     return WindDecision(
-        alert=False,
+        alert=bool(table.flags[i]) if table.flags else False,
         wind_speed=ws,
-        reason_code="WIND_LT_10",
+        reason_code=table.codes[i],
     )
 
 
@@ -64,24 +60,30 @@ def decide_wind(weather: WeatherResult) -> WindDecision:
 # Comfort Decision
 # ===============================
 
-def decide_comfort(weather: WeatherResult) -> ComfortDecision:
+def decide_comfort(weather: WeatherResult, rules: Optional[CompiledRules] = None) -> ComfortDecision:
     """
 
     体感温度から快適温を分類
     """
     ft = weather.feels_like
-    
-    if ft >= 30:
-        level = "HOT"
-    elif ft >= 20:
-        level = "WARM"
-    elif ft >= 10:
-        level = "COOL"
-    else:
-        level = "COLD"
+    level = (rules or get_rules()).comfort.code(ft)
 
     return ComfortDecision(
         level=level,
         feels_like=ft,
         reason_code="FEELS_LIKE_TEMP",
-    )
\ No newline at end of file
+    )
+
+
+# ===============================
+# All Decisions
+# ===============================
+
+def decide_all(
+    weather: WeatherResult,
+) -> tuple[UmbrellaDecision, WindDecision, ComfortDecision]:
+    """
+    傘・風・快適度の判定をまとめて行う（3つとも同じテーブルで判定する）
+    """
+    rules = get_rules()
+    return decide_umbrella(weather, rules), decide_wind(weather, rules), decide_comfort(weather, rules)
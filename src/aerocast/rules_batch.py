@@ -0,0 +1,95 @@
+"""
+判断ルールの一括評価（NumPy）
+
+週間表示・全国スキャン・バックテストなど、多数の予報枠をまとめて判定するための API。
+rules.py の decide_umbrella / decide_wind / decide_comfort と同じ結果を、
+列ごとの配列（降水確率・風速・体感温度）から判定コードの配列として返す。
+
+閾値は rule_tables のテーブルを使い、判定コードはテーブルの codes のインデックス（int8）で表す。
+    labels(result.rules.umbrella.codes, result.rain_code) などで文字列に戻せる。
+"""
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from .models import WeatherResult
+from .rule_tables import CompiledRules, default_tables, get_rules
+
+# 既定のテーブルのコード（インデックス → コード、rules.py の判定結果と同じ文字列）
+_DEFAULT_TABLES = default_tables()
+RAIN_CODES = _DEFAULT_TABLES["umbrella"].codes
+WIND_CODES = _DEFAULT_TABLES["wind"].codes
+COMFORT_LEVELS = _DEFAULT_TABLES["comfort"].codes
+
+
+@dataclass(frozen=True)
+class BatchDecisions:
+    """一括判定の結果（各配列の i 番目が i 番目の予報枠に対応）"""
+    umbrella_needed: np.ndarray  # bool
+    rain_code: np.ndarray        # int8, rules.umbrella.codes のインデックス
+    wind_alert: np.ndarray       # bool
+    wind_code: np.ndarray        # int8, rules.wind.codes のインデックス
+    comfort_level: np.ndarray    # int8, rules.comfort.codes のインデックス
+    rules: CompiledRules         # 判定に使ったテーブル
+
+    def __len__(self) -> int:
+        return len(self.rain_code)
+
+
+def _flags(table, codes: np.ndarray) -> np.ndarray:
+    if not table.flags:
+        return np.zeros(len(codes), dtype=bool)
+    return np.asarray(table.flags, dtype=bool)[codes]
+
+
+def decide_umbrella_batch(pop, rules: Optional[CompiledRules] = None) -> np.ndarray:
+    """降水確率の配列から rain_code（umbrella テーブルのインデックス）の配列を返す"""
+    return (rules or get_rules()).umbrella.indices(pop)
+
+
+def decide_wind_batch(wind, rules: Optional[CompiledRules] = None) -> np.ndarray:
+    """風速の配列から wind_code（wind テーブルのインデックス）の配列を返す"""
+    return (rules or get_rules()).wind.indices(wind)
+
+
+def decide_comfort_batch(feels_like, rules: Optional[CompiledRules] = None) -> np.ndarray:
+    """体感温度の配列から快適度（comfort テーブルのインデックス）の配列を返す"""
+    return (rules or get_rules()).comfort.indices(feels_like)
+
+
+def decide_batch(pop, wind, feels_like, rules: Optional[CompiledRules] = None) -> BatchDecisions:
+    """傘・風・快適度の判定をまとめて行う（途中でテーブルが読み込み直されても同じテーブルで判定する）"""
+    rules = rules or get_rules()
+    rain_code = decide_umbrella_batch(pop, rules)
+    wind_code = decide_wind_batch(wind, rules)
+    comfort_level = decide_comfort_batch(feels_like, rules)
+    if not (len(rain_code) == len(wind_code) == len(comfort_level)):
+        raise ValueError("pop / wind / feels_like の長さが一致しません")
+    return BatchDecisions(
+        umbrella_needed=_flags(rules.umbrella, rain_code),
+        rain_code=rain_code,
+        wind_alert=_flags(rules.wind, wind_code),
+        wind_code=wind_code,
+        comfort_level=comfort_level,
+        rules=rules,
+    )
+
+
+def columns_from_results(results: Iterable[WeatherResult]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """WeatherResult の列から (降水確率, 風速, 体感温度) の配列を作る"""
+    results = list(results)
+    pop = np.fromiter((w.rain_probability for w in results), dtype=np.float64, count=len(results))
+    wind = np.fromiter((w.wind_speed for w in results), dtype=np.float64, count=len(results))
+    feels_like = np.fromiter((w.feels_like for w in results), dtype=np.float64, count=len(results))
+    return pop, wind, feels_like
+
+
+def decide_results_batch(results: Iterable[WeatherResult]) -> BatchDecisions:
+    """WeatherResult の列をまとめて判定する"""
+    return decide_batch(*columns_from_results(results))
+
+
+def labels(names: Sequence[str], codes: np.ndarray) -> list[str]:
+    """コードのインデックス配列を文字列のリストに戻す"""
+    return np.asarray(names, dtype=object)[codes].tolist()
@@ -1,80 +1,658 @@
 """
 会話セッション管理
 文脈を保持して、省略された入力を補完する
+
+FastAPI のスレッドプールから並行に呼ばれるため、セッション表はロックストライピング
+（ハッシュで分割したシャードごとにロックを持つ）で保護する。
+同一セッションの処理は `session_scope` でセッション単位のロックを保持し、
+連続したメッセージの文脈更新が交互に混ざらないようにする。
+
+文脈の保存先は `SessionBackend` で差し替えられる。
+- memory: プロセス内の辞書（デフォルト）
+- sqlite: WAL モードの SQLite ファイル。uvicorn の複数ワーカー間で文脈を共有する
+
+同一セッションの順序保証はプロセス内（ワーカーごと）のロックだけで行う。
+同じセッションのリクエストが別々のワーカーに届いた場合は、読み込み → 更新 → 保存が並行に走り、
+後から保存した方の文脈が残る（last-writer-wins）。1つのセッションのリクエストを同じワーカーに
+振り分けない構成では、連続したメッセージの文脈が混ざりうる。
+リクエスト全体（天気の取得を含む）の間 SQLite の書き込みロックを持つと全ワーカーが直列になるため、
+プロセス間の排他は行わない。
 """
-from dataclasses import dataclass, field
-from typing import Optional
+import asyncio
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator, Optional
 from datetime import datetime, timedelta
 
+from .logger import logger
+
+
+# シャード数（2のべき乗にしてビット演算でシャードを選ぶ）
+DEFAULT_NUM_SHARDS = 64
+
+# SQLite バックエンドの書き込みをまとめて反映する間隔（秒）
+DEFAULT_FLUSH_INTERVAL = 0.005
+
+# SQLite の書き込みロックを待つ上限（秒）
+DEFAULT_BUSY_TIMEOUT = 5.0
+
+# 期限切れのセッションを削除する間隔（秒、0 で行わない）
+DEFAULT_SESSION_CLEANUP_INTERVAL = float(os.getenv("AEROCAST_SESSION_CLEANUP_INTERVAL", "60"))
+
+
+# セッションの有効期限（デフォルト30分）。全セッションで共有する
+DEFAULT_SESSION_TIMEOUT = timedelta(minutes=30)
+_DEFAULT_TIMEOUT_S = int(DEFAULT_SESSION_TIMEOUT.total_seconds())
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """都市名・意図は種類が少ないのでインターンして全セッションで共有する"""
+    return sys.intern(value) if value else value
+
 
-@dataclass
 class ConversationContext:
-    """会話の文脈情報"""
-    last_city: Optional[str] = None
-    last_days: Optional[int] = None
-    last_intent: Optional[str] = None
-    last_updated: Optional[datetime] = None
-    
-    # セッションの有効期限（デフォルト30分）
-    session_timeout: timedelta = field(default_factory=lambda: timedelta(minutes=30))
-    
+    """
+    会話の文脈情報
+
+    数百万セッションを保持できるよう、__slots__ で __dict__ を持たせず、
+    最終更新はエポック秒の int、有効期限はデフォルト値を共有する（個別指定時のみ秒数を持つ）。
+    """
+    __slots__ = ("last_city", "last_days", "last_intent", "_updated_at", "_timeout_s")
+
+    def __init__(
+        self,
+        last_city: Optional[str] = None,
+        last_days: Optional[int] = None,
+        last_intent: Optional[str] = None,
+        last_updated: Optional[datetime] = None,
+        session_timeout: Optional[timedelta] = None,
+    ):
+        self.last_city = _intern(last_city)
+        self.last_days = last_days
+        self.last_intent = _intern(last_intent)
+        self.last_updated = last_updated
+        self.session_timeout = session_timeout
+
+    @property
+    def updated_at(self) -> Optional[int]:
+        """最終更新（エポック秒）"""
+        return self._updated_at
+
+    @property
+    def last_updated(self) -> Optional[datetime]:
+        if self._updated_at is None:
+            return None
+        return datetime.fromtimestamp(self._updated_at)
+
+    @last_updated.setter
+    def last_updated(self, value: Optional[datetime]) -> None:
+        self._updated_at = int(value.timestamp()) if value is not None else None
+
+    @property
+    def session_timeout(self) -> timedelta:
+        if self._timeout_s is None:
+            return DEFAULT_SESSION_TIMEOUT
+        return timedelta(seconds=self._timeout_s)
+
+    @session_timeout.setter
+    def session_timeout(self, value: Optional[timedelta]) -> None:
+        if value is None or value == DEFAULT_SESSION_TIMEOUT:
+            self._timeout_s = None
+        else:
+            self._timeout_s = int(value.total_seconds())
+
+    @property
+    def timeout_seconds(self) -> int:
+        return _DEFAULT_TIMEOUT_S if self._timeout_s is None else self._timeout_s
+
     def is_expired(self) -> bool:
         """セッションが期限切れかどうか"""
-        if self.last_updated is None:
+        if self._updated_at is None:
             return False
-        return datetime.now() - self.last_updated > self.session_timeout
-    
+        return time.time() - self._updated_at > self.timeout_seconds
+
     def update(self, city: Optional[str] = None, days: Optional[int] = None, intent: Optional[str] = None):
         """文脈を更新"""
         if city is not None:
-            self.last_city = city
+            self.last_city = _intern(city)
         if days is not None:
             self.last_days = days
         if intent is not None:
-            self.last_intent = intent
-        self.last_updated = datetime.now()
-    
+            self.last_intent = _intern(intent)
+        self._updated_at = int(time.time())
+
     def clear(self):
         """文脈をクリア"""
         self.last_city = None
         self.last_days = None
         self.last_intent = None
-        self.last_updated = None
+        self._updated_at = None
 
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ConversationContext):
+            return NotImplemented
+        return (
+            self.last_city == other.last_city
+            and self.last_days == other.last_days
+            and self.last_intent == other.last_intent
+            and self._updated_at == other._updated_at
+            and self.timeout_seconds == other.timeout_seconds
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"ConversationContext(last_city={self.last_city!r}, last_days={self.last_days!r}, "
+            f"last_intent={self.last_intent!r}, last_updated={self.last_updated!r}, "
+            f"session_timeout={self.session_timeout!r})"
+        )
+
+
+# ======================================
+# Backends
+# ======================================
+
+class SessionBackend(ABC):
+    """セッション文脈の保存先"""
+
+    # load/save がファイル・ネットワークの I/O を伴うか（True なら async 版はスレッドで呼ぶ）
+    blocking_io = True
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[ConversationContext]:
+        """文脈を読み込む（なければ None）"""
+
+    @abstractmethod
+    def save(self, session_id: str, context: ConversationContext) -> None:
+        """文脈を保存する"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """文脈を削除する"""
+
+    @abstractmethod
+    def cleanup_expired(self, in_use: Callable[[str], bool]) -> None:
+        """期限切れの文脈を削除する（in_use が True のセッションは残してよい）"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """保存されているセッション数"""
+
+    def close(self) -> None:
+        """未反映の書き込みを反映してリソースを解放する"""
+
+
+class _ContextShard:
+    """文脈表の1シャード（シャード内の辞書操作はこのロックで保護）"""
+    __slots__ = ("lock", "contexts")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.contexts: dict[str, ConversationContext] = {}
+
+
+class InMemorySessionBackend(SessionBackend):
+    """プロセス内の辞書に保存するバックエンド（ロックストライピング）"""
+
+    blocking_io = False
+
+    def __init__(self, num_shards: int = DEFAULT_NUM_SHARDS):
+        _check_num_shards(num_shards)
+        self._mask = num_shards - 1
+        self._shards = [_ContextShard() for _ in range(num_shards)]
+
+    def _shard_for(self, session_id: str) -> _ContextShard:
+        return self._shards[hash(session_id) & self._mask]
+
+    def load(self, session_id: str) -> Optional[ConversationContext]:
+        # 単一の dict 参照は GIL 下でアトミックなのでロック不要
+        return self._shard_for(session_id).contexts.get(session_id)
+
+    def save(self, session_id: str, context: ConversationContext) -> None:
+        shard = self._shard_for(session_id)
+        with shard.lock:
+            shard.contexts[session_id] = context
+
+    def delete(self, session_id: str) -> None:
+        shard = self._shard_for(session_id)
+        with shard.lock:
+            shard.contexts.pop(session_id, None)
+
+    def cleanup_expired(self, in_use: Callable[[str], bool]) -> None:
+        for shard in self._shards:
+            with shard.lock:
+                expired_keys = [
+                    key for key, context in shard.contexts.items()
+                    if context.is_expired() and not in_use(key)
+                ]
+                for key in expired_keys:
+                    del shard.contexts[key]
+
+    def count(self) -> int:
+        return sum(len(shard.contexts) for shard in self._shards)
+
+
+# 削除予約を表す番兵
+_TOMBSTONE = None
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    WAL モードの SQLite に保存するバックエンド（複数ワーカープロセスで共有）
+
+    書き込みはプロセス内でセッションごとに最新値へまとめ、バックグラウンドスレッドが
+    flush_interval ごとに1トランザクションで反映する（リクエストスレッドは fsync を待たない）。
+    読み込みは未反映の書き込みを優先するため、同一プロセス内では常に最新の文脈が見える。
+    他のワーカーからは最大 flush_interval だけ遅れて見える。
+    ワーカー間で同じセッションを同時に更新した場合の順序は保証しない（モジュールの説明を参照）。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+    ):
+        self._path = path
+        self._flush_interval = flush_interval
+        self._busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._pending: dict[str, Optional[tuple]] = {}
+        # 反映中のバッチ（コミット完了までは読み込みでも参照する）
+        self._inflight: dict[str, Optional[tuple]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " last_city TEXT,"
+            " last_days INTEGER,"
+            " last_intent TEXT,"
+            " last_updated REAL,"
+            " timeout_s REAL NOT NULL"
+            ")"
+        )
+        conn.commit()
+
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="aerocast-session-flush", daemon=True
+        )
+        self._flusher.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        """スレッドごとの接続（sqlite3 の接続はスレッド間で共有しない）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_row(context: ConversationContext) -> tuple:
+        return (
+            context.last_city,
+            context.last_days,
+            context.last_intent,
+            context.updated_at,
+            context.timeout_seconds,
+        )
+
+    @staticmethod
+    def _from_row(row: tuple) -> ConversationContext:
+        city, days, intent, updated, timeout_s = row
+        context = ConversationContext(
+            last_city=city,
+            last_days=days,
+            last_intent=intent,
+            session_timeout=timedelta(seconds=timeout_s),
+        )
+        context._updated_at = int(updated) if updated is not None else None
+        return context
+
+    def load(self, session_id: str) -> Optional[ConversationContext]:
+        # flush と競合しても取りこぼさないよう、未反映 → 反映中 の順に参照する
+        for pending in (self._pending, self._inflight):
+            if session_id in pending:
+                row = pending.get(session_id, _TOMBSTONE)
+                return self._from_row(row) if row is not _TOMBSTONE else None
+        row = self._conn().execute(
+            "SELECT last_city, last_days, last_intent, last_updated, timeout_s"
+            " FROM sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        return self._from_row(row) if row else None
+
+    def save(self, session_id: str, context: ConversationContext) -> None:
+        row = self._to_row(context)
+        with self._pending_lock:
+            self._pending[session_id] = row
+        self._wakeup.set()
+
+    def delete(self, session_id: str) -> None:
+        with self._pending_lock:
+            self._pending[session_id] = _TOMBSTONE
+        self._wakeup.set()
+
+    def flush(self) -> None:
+        """未反映の書き込みを1トランザクションでまとめて反映する"""
+        with self._flush_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return
+                batch = self._pending
+                self._inflight = batch
+                self._pending = {}
+            upserts = [(sid,) + row for sid, row in batch.items() if row is not _TOMBSTONE]
+            deletes = [(sid,) for sid, row in batch.items() if row is _TOMBSTONE]
+            conn = self._conn()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                if upserts:
+                    conn.executemany(
+                        "INSERT INTO sessions"
+                        " (session_id, last_city, last_days, last_intent, last_updated, timeout_s)"
+                        " VALUES (?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT(session_id) DO UPDATE SET"
+                        " last_city = excluded.last_city,"
+                        " last_days = excluded.last_days,"
+                        " last_intent = excluded.last_intent,"
+                        " last_updated = excluded.last_updated,"
+                        " timeout_s = excluded.timeout_s",
+                        upserts,
+                    )
+                if deletes:
+                    conn.executemany("DELETE FROM sessions WHERE session_id = ?", deletes)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                # BEGIN IMMEDIATE が "database is locked" で失敗した場合はトランザクションが始まっていない
+                if conn.in_transaction:
+                    try:
+                        conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass
+                # 反映できなかった分は、より新しい書き込みがなければ戻して次回に再試行する
+                with self._pending_lock:
+                    for sid, row in batch.items():
+                        self._pending.setdefault(sid, row)
+                self._wakeup.set()
+                logger.error("セッションの保存に失敗しました", exc_info=True, extra={"event": "session_flush_error"})
+            finally:
+                self._inflight = {}
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # 少し待って、その間に来た書き込みを同じバッチにまとめる
+            time.sleep(self._flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # 想定外の失敗でもスレッドを止めない（止まると以降の保存がすべて反映されない）
+                logger.warning("セッションの反映で予期しないエラーが発生しました", exc_info=True, extra={"event": "session_flush_error"})
+
+    def cleanup_expired(self, in_use: Callable[[str], bool]) -> None:
+        # 処理中のセッションは終了時に保存し直されるため、ここでは区別しない
+        self.flush()
+        self._conn().execute(
+            "DELETE FROM sessions"
+            " WHERE last_updated IS NOT NULL AND last_updated + timeout_s < ?",
+            (time.time(),),
+        )
+
+    def count(self) -> int:
+        self.flush()
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+        self.flush()
+
+
+def create_session_backend() -> SessionBackend:
+    """
+    環境変数からバックエンドを生成する
+
+    AEROCAST_SESSION_BACKEND ... memory（デフォルト）/ sqlite
+    AEROCAST_SESSION_DB      ... sqlite のファイルパス
+    """
+    kind = os.getenv("AEROCAST_SESSION_BACKEND", "memory").lower()
+    if kind == "memory":
+        return InMemorySessionBackend()
+    if kind == "sqlite":
+        path = os.getenv("AEROCAST_SESSION_DB", "aerocast_sessions.db")
+        return SQLiteSessionBackend(path)
+    raise ValueError(f"不明なセッションバックエンドです: {kind}")
+
+
+# ======================================
+# Session Manager
+# ======================================
+
+def _check_num_shards(num_shards: int) -> None:
+    if num_shards <= 0 or num_shards & (num_shards - 1):
+        raise ValueError("num_shards は2のべき乗で指定してください")
+
+
+class _SessionLock:
+    """
+    セッション単位の順序保証用ロック（使用中の間だけ表に残す）
+
+    スレッドからは lock を直接待ち、async からは acquire_async でイベントループ上の Future を待つ。
+    async の待機にスレッドを使うと、待機が executor を埋めたときにロックを持つ側の
+    読み込み・保存（asyncio.to_thread）が動けなくなり、プロセスが止まるため。
+    """
+    __slots__ = ("lock", "users", "_guard", "_waiters")
 
-class SessionManager:
-    """セッションマネージャー（シンプルなインメモリ実装）"""
-    
     def __init__(self):
-        self._sessions: dict[str, ConversationContext] = {}
-    
+        self.lock = threading.Lock()
+        self.users = 0
+        # lock の取得失敗から待機の登録までと、解放から起こすまでを排他する
+        self._guard = threading.Lock()
+        self._waiters: Optional[deque] = None
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._guard:
+                if self.lock.acquire(blocking=False):
+                    return
+                waiter = loop.create_future()
+                if self._waiters is None:
+                    self._waiters = deque()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            except BaseException:
+                with self._guard:
+                    try:
+                        self._waiters.remove((loop, waiter))
+                        woken = False
+                    except ValueError:
+                        woken = True
+                if woken:
+                    # 起こされた後に取り消された。次の待機者に譲る
+                    self._wake_next()
+                raise
+            # 起こされたら取得し直す（スレッド側の待機者が先に取っていれば再び待つ）
+
+    def release(self) -> None:
+        self.lock.release()
+        self._wake_next()
+
+    def _wake_next(self) -> None:
+        with self._guard:
+            if not self._waiters:
+                return
+            loop, waiter = self._waiters.popleft()
+        loop.call_soon_threadsafe(_wake, waiter)
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class _LockShard:
+    """ロック表の1シャード"""
+    __slots__ = ("lock", "locks")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks: dict[str, _SessionLock] = {}
+
+
+class SessionManager:
+    """
+    セッションマネージャー
+
+    保存は backend に任せ、同一セッションの処理順序はプロセス内のセッションロックで保証する。
+    """
+
+    def __init__(
+        self,
+        backend: Optional[SessionBackend] = None,
+        num_shards: int = DEFAULT_NUM_SHARDS,
+    ):
+        _check_num_shards(num_shards)
+        self._backend = backend if backend is not None else InMemorySessionBackend(num_shards)
+        self._mask = num_shards - 1
+        self._lock_shards = [_LockShard() for _ in range(num_shards)]
+
+    @property
+    def backend(self) -> SessionBackend:
+        return self._backend
+
+    def _checkout_lock(self, session_id: str) -> _SessionLock:
+        shard = self._lock_shards[hash(session_id) & self._mask]
+        with shard.lock:
+            slock = shard.locks.get(session_id)
+            if slock is None:
+                slock = _SessionLock()
+                shard.locks[session_id] = slock
+            slock.users += 1
+            return slock
+
+    def _return_lock(self, session_id: str, slock: _SessionLock) -> None:
+        shard = self._lock_shards[hash(session_id) & self._mask]
+        with shard.lock:
+            slock.users -= 1
+            if slock.users == 0:
+                del shard.locks[session_id]
+
+    def _in_use(self, session_id: str) -> bool:
+        return session_id in self._lock_shards[hash(session_id) & self._mask].locks
+
+    def _load(self, session_id: str) -> ConversationContext:
+        context = self._backend.load(session_id)
+        if context is None:
+            return ConversationContext()
+        if context.is_expired():
+            context.clear()
+        return context
+
     def get_context(self, session_id: str) -> ConversationContext:
-        """セッションの文脈を取得（なければ新規作成）"""
-        if session_id not in self._sessions:
-            self._sessions[session_id] = ConversationContext()
-        else:
-            context = self._sessions[session_id]
-            if context.is_expired():
-                context.clear()
-        return self._sessions[session_id]
-    
+        """
+        セッションの文脈を取得（なければ新規作成）
+        memory 以外のバックエンドではスナップショットになるため、更新には session() を使う。
+        """
+        context = self._load(session_id)
+        self._backend.save(session_id, context)
+        return context
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[ConversationContext]:
+        """
+        セッション単位のロックを保持したまま文脈を渡し、終了時に保存する。
+        同一セッションへの並行リクエストはここで直列化される（別セッションは並行に動く）。
+        """
+        slock = self._checkout_lock(session_id)
+        slock.lock.acquire()
+        try:
+            context = self._load(session_id)
+            try:
+                yield context
+            finally:
+                self._backend.save(session_id, context)
+        finally:
+            self._release(session_id, slock)
+
+    @asynccontextmanager
+    async def session_async(self, session_id: str) -> AsyncIterator[ConversationContext]:
+        """
+        session() の async 版。
+        同一セッションが処理中のときは、スレッドを使わずにイベントループ上で解放を待つ。
+        I/O を伴うバックエンド（sqlite）では、文脈の読み込み・保存をスレッドで行う。
+        """
+        slock = self._checkout_lock(session_id)
+        try:
+            await slock.acquire_async()
+        except BaseException:
+            self._return_lock(session_id, slock)
+            raise
+        blocking = self._backend.blocking_io
+        try:
+            context = await asyncio.to_thread(self._load, session_id) if blocking else self._load(session_id)
+            try:
+                yield context
+            finally:
+                if blocking:
+                    await asyncio.to_thread(self._backend.save, session_id, context)
+                else:
+                    self._backend.save(session_id, context)
+        finally:
+            self._release(session_id, slock)
+
+    def _release(self, session_id: str, slock: _SessionLock) -> None:
+        slock.release()
+        self._return_lock(session_id, slock)
+
     def clear_session(self, session_id: str):
         """セッションをクリア"""
-        if session_id in self._sessions:
-            del self._sessions[session_id]
-    
+        self._backend.delete(session_id)
+
     def cleanup_expired(self):
-        """期限切れのセッションをクリーンアップ"""
-        expired_keys = [
-            key for key, context in self._sessions.items()
-            if context.is_expired()
-        ]
-        for key in expired_keys:
-            del self._sessions[key]
+        """期限切れのセッションをクリーンアップ（処理中のセッションは対象外）"""
+        self._backend.cleanup_expired(self._in_use)
+
+    async def run_cleanup(self, interval: float = DEFAULT_SESSION_CLEANUP_INTERVAL) -> None:
+        """
+        interval 秒ごとに期限切れのセッションを削除する（キャンセルされるまで続ける）。
+        全シャードを走査し、sqlite では DELETE も行うため、スレッドで実行する。
+        """
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.cleanup_expired)
+            except Exception:
+                logger.warning("期限切れのセッションを削除できませんでした", exc_info=True, extra={"event": "session_cleanup_error"})
+
+    def close(self):
+        """バックエンドの未反映分を反映する"""
+        self._backend.close()
 
+    def __len__(self) -> int:
+        return self._backend.count()
 
-# グローバルセッションマネージャー（シンプルな実装）
-_global_session_manager = SessionManager()
+
+# グローバルセッションマネージャー
+_global_session_manager = SessionManager(create_session_backend())
+atexit.register(_global_session_manager.close)
 
 
 def get_session_context(session_id: str = "default") -> ConversationContext:
@@ -82,6 +660,21 @@ def get_session_context(session_id: str = "default") -> ConversationContext:
     return _global_session_manager.get_context(session_id)
 
 
+def session_scope(session_id: str = "default"):
+    """グローバルセッションマネージャーでセッション単位のロックを取って文脈を使う"""
+    return _global_session_manager.session(session_id)
+
+
+def session_scope_async(session_id: str = "default"):
+    """session_scope の async 版"""
+    return _global_session_manager.session_async(session_id)
+
+
 def clear_session(session_id: str = "default"):
     """セッションをクリア"""
     _global_session_manager.clear_session(session_id)
+
+
+def get_session_manager() -> SessionManager:
+    """グローバルセッションマネージャーを返す"""
+    return _global_session_manager
@@ -0,0 +1,140 @@
+"""
+雪確率推定の一括評価（NumPy）と予報枠ごとの雪タイムライン
+
+役割:
+- estimate_snow_probability と同じ結果を、降水確率・気温の配列からまとめて求める
+- forecast API のレスポンス（最大40枠 = 5日分）から、枠ごとの雪確率と積雪量（累積）を1回で求める
+
+気温帯ごとの係数は 降水確率(0〜100) × 気温帯 の結果を事前計算した表で引くため、
+浮動小数点の丸めも含めてスカラー版と同じ値になる。
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from .snow_estimator import estimate_snow_probability
+from .weather_api import fetch_forecast_data
+
+# 気温帯（≤0℃ / 0〜2℃ / 2〜4℃ / ≥4℃）の境界。0℃ のみ「以下」で区切る
+_BAND_BOUNDS = np.array([2.0, 4.0])
+
+# [降水確率, 気温帯] → 雪確率（スカラー版の結果をそのまま表にする）
+_BAND_TEMPS = (0.0, 1.0, 3.0, 4.0)  # 各気温帯の代表値
+SNOW_PROBABILITY_TABLE = np.array(
+    [[estimate_snow_probability(pop, t) for t in _BAND_TEMPS] for pop in range(101)],
+    dtype=np.int16,
+)
+
+# 雪を表す weather id（OpenWeather の Group 6xx）
+_SNOW_ID_MIN, _SNOW_ID_MAX = 600, 622
+
+
+def _temperature_bands(temp_c: np.ndarray) -> np.ndarray:
+    """気温帯のインデックス（0: ≤0℃, 1: 0〜2℃, 2: 2〜4℃, 3: ≥4℃）"""
+    bands = np.searchsorted(_BAND_BOUNDS, temp_c, side="right") + (temp_c > 0.0)
+    # NaN はスカラー版ではどの比較も偽になり 0% になる
+    bands[np.isnan(temp_c)] = 3
+    return bands
+
+
+def estimate_snow_probability_batch(pop, temp_c) -> np.ndarray:
+    """
+    estimate_snow_probability の一括版
+
+    Args:
+        pop: 降水確率 (%) の配列（0〜100 の整数）
+        temp_c: 気温 (℃) の配列
+
+    Returns:
+        推定された雪確率 (%) の配列
+    """
+    pop = np.asarray(pop)
+    temp_c = np.asarray(temp_c, dtype=np.float64)
+    if pop.shape != temp_c.shape:
+        raise ValueError("pop と temp_c の長さが一致しません")
+    if pop.size and (pop.min() < 0 or pop.max() > 100):
+        raise ValueError("pop は 0〜100 の範囲で指定してください")
+    return SNOW_PROBABILITY_TABLE[pop.astype(np.intp), _temperature_bands(temp_c)]
+
+
+@dataclass(frozen=True)
+class SnowTimeline:
+    """予報枠ごとの雪の見込み（各配列の i 番目が i 番目の枠に対応）"""
+    dt: np.ndarray                    # 枠の時刻（UNIX 秒）
+    temp: np.ndarray                  # 気温 (℃)
+    rain_probability: np.ndarray      # 降水確率 (%)
+    snow_probability: np.ndarray      # 雪確率 (%)（API 由来 or 推定）
+    estimated: np.ndarray             # 雪確率が推定値かどうか
+    snow_volume_mm_3h: np.ndarray     # 3時間の積雪量 (mm)（なければ 0）
+    accumulated_mm: np.ndarray        # 先頭の枠からの積雪量の累積 (mm)
+
+    def __len__(self) -> int:
+        return len(self.dt)
+
+    def to_dict(self) -> dict[str, list]:
+        return {
+            "dt": self.dt.tolist(),
+            "temp": self.temp.tolist(),
+            "rain_probability": self.rain_probability.tolist(),
+            "snow_probability": self.snow_probability.tolist(),
+            "estimated": self.estimated.tolist(),
+            "snow_volume_mm_3h": self.snow_volume_mm_3h.tolist(),
+            "accumulated_mm": self.accumulated_mm.tolist(),
+        }
+
+
+def _weather_id(item: dict) -> Optional[int]:
+    try:
+        if item.get("weather"):
+            return int(item["weather"][0]["id"])
+    except (KeyError, IndexError, ValueError, TypeError):
+        pass
+    return None
+
+
+def build_snow_timeline(data: dict) -> SnowTimeline:
+    """
+    forecast API のレスポンスから雪タイムラインを作る。
+
+    枠ごとの判定は weather_api の nowcast と同じ:
+    - weather id が 6xx（雪）または積雪量 > 0 の枠は、雪確率 = 降水確率
+    - それ以外は降水確率と気温から推定（estimate_snow_probability）
+    """
+    items = data.get("list") or []
+    n = len(items)
+
+    # レスポンスを列ごとの配列にする（この1回だけ各枠を走査する）
+    dt = np.empty(n, dtype=np.int64)
+    temp = np.empty(n, dtype=np.float64)
+    pop = np.empty(n, dtype=np.int16)
+    volume = np.zeros(n, dtype=np.float64)
+    snow_id = np.zeros(n, dtype=bool)
+    for i, item in enumerate(items):
+        dt[i] = item["dt"]
+        temp[i] = item["main"]["temp"]
+        pop[i] = int(item.get("pop", 0) * 100)
+        snow3h = (item.get("snow") or {}).get("3h")
+        if snow3h is not None:
+            volume[i] = float(snow3h)
+        wid = _weather_id(item)
+        snow_id[i] = wid is not None and _SNOW_ID_MIN <= wid <= _SNOW_ID_MAX
+
+    from_api = snow_id | (volume > 0)
+    estimated_probability = estimate_snow_probability_batch(pop, temp)
+    snow_probability = np.where(from_api, pop, estimated_probability).astype(np.int16)
+
+    return SnowTimeline(
+        dt=dt,
+        temp=temp,
+        rain_probability=pop,
+        snow_probability=snow_probability,
+        estimated=~from_api,
+        snow_volume_mm_3h=volume,
+        accumulated_mm=np.cumsum(volume),
+    )
+
+
+def fetch_snow_timeline(lat: float, lon: float) -> SnowTimeline:
+    """forecast API（40枠）を取得して雪タイムラインを作る"""
+    return build_snow_timeline(fetch_forecast_data(lat, lon))
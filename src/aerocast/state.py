@@ -2,6 +2,7 @@ from dataclasses import dataclass, field
 from typing import List, Optional
 
 from .models import WeatherResult
+from .tracing import Trace
 
 @dataclass
 class AgentState:
@@ -15,4 +16,6 @@ class AgentState:
   clarification_question: Optional[str] = None
 
   errors: List[str] = field(default_factory=list)
-  steps: List[str] = field(default_factory=list)
\ No newline at end of file
+  steps: List[str] = field(default_factory=list)
+  # ステップごとの所要時間（tracing.span で記録）
+  trace: Optional[Trace] = None
\ No newline at end of file
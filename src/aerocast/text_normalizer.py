@@ -0,0 +1,145 @@
+"""
+ユーザー入力の正規化と字句解析（1パス）
+
+役割:
+- NFKC で全角英数字・記号・半角カナを揃える
+- トリガーワード・時間表現・ノイズワード・記号・空白を、1つにまとめた正規表現で1回だけ走査して区間（span）にする
+
+意図解析（intent_parser）は、この区間からトリガーの有無・日数・都市名を求める。
+語ごとに部分文字列検索や str.replace を繰り返す代わりに、入力を1回走査するだけで済む。
+"""
+import re
+import unicodedata
+from typing import Optional
+
+
+# ===============================
+# Lexicon
+# ===============================
+
+TRIGGER_WORDS = (
+    "天気",
+    "予報",
+    "雨",
+    "気温",
+    "暑い",
+    "寒い",
+)
+
+NOISE_WORDS = (
+    "の",
+    "を",
+    "について",
+    "教えて",
+    "教えてください",
+    "おしえて",
+    "おしえてください",
+    "ください",
+    "下さい",
+    "知りたい",
+    "は",
+    "って",
+)
+
+# 日数を表す語
+TIME_WORDS = {
+    "今日": 0,
+    "明日": 1,
+    "あした": 1,
+    "明後日": 2,
+    "あさって": 2,
+    "明々後日": 3,
+}
+
+WEEKEND_WORDS = (
+    "週末",
+    "しゅうまつ",
+)
+
+# 区間の種類
+TRIGGER = "trigger"
+TIME = "time"
+WEEKEND = "weekend"
+DAYS_AFTER = "days_after"
+NOISE = "noise"
+SEPARATOR = "separator"
+
+_WORD_KINDS: dict[str, str] = {}
+for _w in TRIGGER_WORDS:
+    _WORD_KINDS[_w] = TRIGGER
+for _w in NOISE_WORDS:
+    _WORD_KINDS[_w] = NOISE
+for _w in TIME_WORDS:
+    _WORD_KINDS[_w] = TIME
+for _w in WEEKEND_WORDS:
+    _WORD_KINDS[_w] = WEEKEND
+
+_SEPARATORS = frozenset("?？!！。、")
+
+# 「◯日後」・記号・空白・語（長い語を優先）を1つの正規表現にまとめる。
+# 先頭文字の先読みで、どの語も始まらない位置はすぐに読み飛ばす
+_WORDS = sorted(_WORD_KINDS, key=len, reverse=True)
+_TOKEN_RE = re.compile(
+    r"((?=[\d\s" + re.escape("".join(_SEPARATORS) + "".join({w[0] for w in _WORDS})) + r"])"
+    r"(?:\d+日後|[?？!！。、]|\s+|" + "|".join(re.escape(w) for w in _WORDS) + "))"
+)
+
+
+class TokenizedText:
+    """
+    字句解析の結果
+
+    日数・トリガーの有無・都市名の候補は走査の直後に求めておき、
+    区間の一覧（tokens）は参照されたときにだけ組み立てる。
+    """
+    __slots__ = ("text", "has_trigger", "time_days", "has_weekend", "days_after", "_parts", "_kinds")
+
+    def __init__(self, text: str, parts: list[str], kinds: list[Optional[str]]):
+        self.text = text
+        self._parts = parts
+        self._kinds = kinds
+        self.has_trigger = TRIGGER in kinds
+        self.has_weekend = WEEKEND in kinds
+        # 時間表現の日数（複数あれば最も近い日）
+        self.time_days: Optional[int] = None
+        if TIME in kinds:
+            self.time_days = min(TIME_WORDS[t] for t, k in zip(parts[1::2], kinds) if k == TIME)
+        # 最初の「◯日後」
+        self.days_after: Optional[int] = None
+        if DAYS_AFTER in kinds:
+            self.days_after = int(parts[2 * kinds.index(DAYS_AFTER) + 1][:-2])
+
+    @property
+    def tokens(self) -> list[tuple[str, int, str]]:
+        """区間の一覧（種類, 開始位置, 文字列）"""
+        parts = self._parts
+        result = []
+        pos = len(parts[0])
+        for i, kind in enumerate(self._kinds):
+            tok = parts[2 * i + 1]
+            result.append((kind, pos, tok))
+            pos += len(tok) + len(parts[2 * i + 2])
+        return result
+
+    def residue(self) -> str:
+        """どの区間にも含まれない部分（都市名の候補）"""
+        return "".join(self._parts[::2])
+
+
+def fold(text: str) -> str:
+    """NFKC で文字種を揃え、前後の空白を除く"""
+    return unicodedata.normalize("NFKC", text).strip()
+
+
+def _kind(token: str) -> str:
+    kind = _WORD_KINDS.get(token)
+    if kind is not None:
+        return kind
+    return DAYS_AFTER if token.endswith("日後") else SEPARATOR
+
+
+def tokenize(text: str) -> TokenizedText:
+    """text（fold 済み）を1回走査して区間に分ける"""
+    # split は [区間外, 区間, 区間外, 区間, ..., 区間外] を返す
+    parts = _TOKEN_RE.split(text)
+    return TokenizedText(text, parts, list(map(_kind, parts[1::2])))
@@ -0,0 +1,176 @@
+"""
+リクエスト単位の処理時間計測（トレース）
+
+役割:
+- 1リクエストの各ステップ（parse / validate / geocode / fetch_current / fetch_nowcast /
+  summary / advice / markdown など）の所要時間をスパンとして記録する
+- 閾値を超えた遅いリクエストのトレースをリングバッファに保持し、管理用エンドポイントから参照できるようにする
+
+現在のトレースは ContextVar で受け渡すため、スレッドでも asyncio のタスクでも
+呼び出し側が引数で持ち回る必要はない。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator, Optional
+
+from .logger import logger
+from .metrics import agent_step_duration
+
+# 遅いリクエストとみなす閾値（ミリ秒）
+DEFAULT_SLOW_THRESHOLD_MS = float(os.getenv("AEROCAST_SLOW_TRACE_MS", "1000"))
+# 保持する遅いトレースの件数
+DEFAULT_SLOW_TRACE_CAPACITY = int(os.getenv("AEROCAST_SLOW_TRACE_CAPACITY", "200"))
+
+
+@dataclass
+class Span:
+    """1ステップ分の計測結果"""
+    name: str
+    start_ms: float  # トレース開始からの経過時間
+    duration_ms: float
+    error: Optional[str] = None
+
+
+@dataclass
+class Trace:
+    """1リクエスト分のトレース"""
+    name: str
+    started_at: float  # エポック秒
+    attrs: dict[str, Any] = field(default_factory=dict)
+    spans: list[Span] = field(default_factory=list)
+    total_ms: Optional[float] = None
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+
+    def durations(self) -> dict[str, float]:
+        """ステップ名ごとの合計時間（ミリ秒）"""
+        result: dict[str, float] = {}
+        for sp in self.spans:
+            result[sp.name] = result.get(sp.name, 0.0) + sp.duration_ms
+        return result
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_ms": self.total_ms,
+            "attrs": dict(self.attrs),
+            "spans": [asdict(sp) for sp in self.spans],
+        }
+
+
+class SlowTraceBuffer:
+    """遅いリクエストのトレースを新しい順に保持するリングバッファ"""
+
+    def __init__(self, capacity: int = DEFAULT_SLOW_TRACE_CAPACITY, threshold_ms: float = DEFAULT_SLOW_THRESHOLD_MS):
+        self._traces: deque[Trace] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.threshold_ms = threshold_ms
+
+    def offer(self, trace: Trace) -> bool:
+        """閾値を超えていれば保持する"""
+        if trace.total_ms is None or trace.total_ms < self.threshold_ms:
+            return False
+        with self._lock:
+            self._traces.append(trace)
+        return True
+
+    def snapshot(self, limit: Optional[int] = None) -> list[dict[str, Any]]:
+        with self._lock:
+            traces = list(self._traces)
+        traces.reverse()
+        if limit is not None:
+            traces = traces[:limit]
+        return [t.to_dict() for t in traces]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("aerocast_trace", default=None)
+_slow_traces = SlowTraceBuffer()
+
+
+def current_trace() -> Optional[Trace]:
+    """実行中のリクエストのトレース（なければ None）"""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    ステップの所要時間をメトリクスに記録し、トレース中であればトレースにも追加する
+    """
+    trace = _current_trace.get()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        agent_step_duration.labels(name).observe(end - start)
+        if trace is not None:
+            trace.spans.append(Span(
+                name=name,
+                start_ms=(start - trace._t0) * 1000,
+                duration_ms=(end - start) * 1000,
+                error=error,
+            ))
+
+
+def input_attrs(text: str) -> dict[str, Any]:
+    """
+    トレースに残す入力の情報（ハッシュと文字数）。
+    遅いトレースは /admin/traces で参照できるため、ユーザーの発話そのものは残さない。
+    """
+    return {
+        "input_sha256": hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+        "input_chars": len(text),
+    }
+
+
+@contextmanager
+def trace_request(name: str, **attrs: Any) -> Iterator[Trace]:
+    """
+    リクエスト全体を計測する。
+    終了時に閾値を超えていれば遅いトレースとして保持する。
+    """
+    trace = Trace(name=name, started_at=time.time(), attrs=attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.total_ms = (time.perf_counter() - trace._t0) * 1000
+        if _slow_traces.offer(trace):
+            logger.warning(
+                "遅いリクエストを検出しました: %s %.1fms", name, trace.total_ms,
+                extra={"event": "slow_trace", "trace": name, "durations_ms": trace.durations()},
+            )
+
+
+def get_slow_traces(limit: Optional[int] = None) -> list[dict[str, Any]]:
+    """保持している遅いトレース（新しい順）"""
+    return _slow_traces.snapshot(limit)
+
+
+def get_slow_threshold_ms() -> float:
+    return _slow_traces.threshold_ms
+
+
+def set_slow_threshold_ms(threshold_ms: float) -> None:
+    """遅いリクエストとみなす閾値を変更する"""
+    _slow_traces.threshold_ms = threshold_ms
+
+
+def clear_slow_traces() -> None:
+    _slow_traces.clear()
@@ -18,6 +18,103 @@ def validate_days(days: int) -> bool:
     return isinstance(days, int) and 0 <= days <= 5
 
 
+# 禁止ワード・フレーズ（判断・推測・推奨を表す表現）
+FORBIDDEN_PATTERNS = (
+    "お勧め",
+    "おすすめ",
+    "推奨",
+    "勧め",
+    "すべき",
+    "した方が",
+    "したほうが",
+    "すべきです",
+    "した方がいい",
+    "したほうがいい",
+    "した方が良い",
+    "したほうが良い",
+    "した方がよい",
+    "したほうがよい",
+    "することをお勧め",
+    "することをおすすめ",
+    "することを推奨",
+    "判断",
+    "推測",
+    "思います",
+    "思われます",
+    "かもしれません",
+    "でしょう",
+    "だと思います",
+    "だと思われます",
+)
+
+
+class PhraseMatcher:
+    """
+    複数の禁止フレーズを1回の走査で検出するオートマトン（Aho-Corasick）。
+    状態を持ち越せるため、ストリーミングでチャンクごとに渡しても検出漏れがない。
+    """
+
+    def __init__(self, patterns):
+        # 状態ごとの遷移・失敗遷移・一致したフレーズ・ルートからの深さ
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._match: list = [None]
+        self._depth: list[int] = [0]
+
+        for pattern in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._match.append(None)
+                    self._depth.append(self._depth[state] + 1)
+                    self._goto[state][ch] = nxt
+                state = nxt
+            if self._match[state] is None:
+                self._match[state] = pattern
+
+        # 幅優先で失敗遷移を張り、接尾辞で一致するフレーズも引き継ぐ
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f][ch] if state and ch in self._goto[f] else 0
+                if self._match[nxt] is None:
+                    self._match[nxt] = self._match[self._fail[nxt]]
+
+    def step(self, state: int, ch: str) -> int:
+        goto = self._goto
+        while state and ch not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(ch, 0)
+
+    def scan(self, text: str, state: int = 0):
+        """
+        text を走査する。
+
+        Returns:
+            (最後の状態, 見つかった禁止フレーズ or None, 一致した位置の直後のインデックス)
+        """
+        for i, ch in enumerate(text):
+            state = self.step(state, ch)
+            if self._match[state] is not None:
+                return state, self._match[state], i + 1
+        return state, None, len(text)
+
+    def pending(self, state: int) -> int:
+        """状態が表す、禁止フレーズの途中かもしれない末尾の文字数"""
+        return self._depth[state]
+
+
+_matcher = PhraseMatcher(FORBIDDEN_PATTERNS)
+
+
 def validate_llm_output(text: str) -> None:
     """
     LLM出力をバリデーションする。
@@ -29,38 +126,58 @@ def validate_llm_output(text: str) -> None:
     Raises:
         LLMOutputValidation: 禁止された表現が含まれている場合
     """
-    # 禁止ワード・フレーズ（判断・推測・推奨を表す表現）
-    forbidden_patterns = [
-        "お勧め",
-        "おすすめ",
-        "推奨",
-        "勧め",
-        "すべき",
-        "した方が",
-        "したほうが",
-        "すべきです",
-        "した方がいい",
-        "したほうがいい",
-        "した方が良い",
-        "したほうが良い",
-        "した方がよい",
-        "したほうがよい",
-        "することをお勧め",
-        "することをおすすめ",
-        "することを推奨",
-        "判断",
-        "推測",
-        "思います",
-        "思われます",
-        "かもしれません",
-        "でしょう",
-        "だと思います",
-        "だと思われます",
-    ]
-    
-    text_lower = text.lower()
-    for pattern in forbidden_patterns:
-        if pattern in text_lower:
+    _, found, _ = _matcher.scan(text.lower())
+    if found is not None:
+        raise LLMOutputValidation(
+            f"LLM出力に禁止された表現が含まれています: '{found}'"
+        )
+
+
+class StreamValidator:
+    """
+    ストリーミング出力をチャンクごとにバリデーションする。
+
+    feed() は禁止フレーズが確定しない部分（安全な接頭辞）だけを返し、
+    フレーズの途中かもしれない末尾は次のチャンクまで保留する。
+    """
+
+    def __init__(self, matcher: PhraseMatcher = _matcher):
+        self._matcher = matcher
+        self._state = 0
+        self._held = ""
+
+    def feed(self, chunk: str) -> str:
+        """
+        Raises:
+            LLMOutputValidation: 禁止された表現が現れた時点で送出
+        """
+        self._state, found, _ = self._matcher.scan(chunk.lower(), self._state)
+        if found is not None:
             raise LLMOutputValidation(
-                f"LLM出力に禁止された表現が含まれています: '{pattern}'"
+                f"LLM出力に禁止された表現が含まれています: '{found}'"
             )
+        text = self._held + chunk
+        keep = self._matcher.pending(self._state)
+        cut = len(text) - keep
+        self._held = text[cut:]
+        return text[:cut]
+
+    def finish(self) -> str:
+        """保留していた末尾を返す（ストリーム終了時）"""
+        text, self._held = self._held, ""
+        return text
+
+
+def stream_validated(chunks):
+    """
+    チャンクの列をバリデーションしながら、安全な接頭辞だけを順に返す。
+    禁止された表現が現れた時点で LLMOutputValidation を送出する。
+    """
+    validator = StreamValidator()
+    for chunk in chunks:
+        safe = validator.feed(chunk)
+        if safe:
+            yield safe
+    rest = validator.finish()
+    if rest:
+        yield rest
@@ -1,4 +1,7 @@
+import asyncio
 import os
+import time as time_module
+import httpx
 import requests
 from datetime import datetime, timedelta, time, timezone
 from typing import Optional, List, Tuple
@@ -8,7 +11,10 @@ from .models import WeatherResult
 from .error import CityNotFoundError, WeatherAPIError, AmbiguousCityError
 from .logger import logger
 from .snow_estimator import estimate_snow_probability
-from .retry import exponential_backoff
+from .retry import exponential_backoff, async_exponential_backoff
+from .tracing import span
+from .metrics import upstream_requests, upstream_duration, status_class
+from .capture import record_upstream
 
 def _get_openweather_key() -> str:
     """
@@ -27,6 +33,83 @@ JST = timezone(timedelta(hours=9))
 _SESSION = requests.Session()
 _TIMEOUT = 10
 
+# httpx の非同期クライアント（async ハンドラ用。初回利用時に生成して再利用）
+_ASYNC_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None or _ASYNC_CLIENT.is_closed:
+        _ASYNC_CLIENT = httpx.AsyncClient(timeout=_TIMEOUT)
+    return _ASYNC_CLIENT
+
+
+async def aclose_async_client() -> None:
+    """非同期クライアントを閉じる（アプリ終了時）"""
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is not None:
+        await _ASYNC_CLIENT.aclose()
+        _ASYNC_CLIENT = None
+
+# ======================================
+# HTTP
+# ======================================
+
+def _get(endpoint: str, url: str) -> requests.Response:
+    """GET して上流呼び出しの件数・レイテンシを記録する（endpoint: geo / weather / forecast）"""
+    start = time_module.perf_counter()
+    outcome = "error"
+    try:
+        response = _SESSION.get(url, timeout=_TIMEOUT)
+        outcome = status_class(getattr(response, "status_code", None))
+        record_upstream(endpoint, url, response)
+        return response
+    except requests.RequestException as e:
+        record_upstream(endpoint, url, error=e)
+        raise
+    finally:
+        _record_upstream(endpoint, outcome, start)
+
+
+def _record_upstream(endpoint: str, outcome: str, start: float) -> None:
+    upstream_requests.labels(endpoint, outcome).inc()
+    upstream_duration.labels(endpoint).observe(time_module.perf_counter() - start)
+
+# ======================================
+# URL Builders
+# ======================================
+
+DEFAULT_BASE_URL = "https://api.openweathermap.org"
+
+
+def _base_url() -> str:
+    """API のベース URL（OPENWEATHER_BASE_URL で負荷試験用の偽サーバーなどに向けられる）"""
+    return (os.getenv("OPENWEATHER_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+
+
+def _geo_url(city_variant: str, limit: int, key: str) -> str:
+    encoded_city = quote(city_variant)
+    return (
+        f"{_base_url()}/geo/1.0/direct"
+        f"?q={encoded_city},JP&limit={limit}&appid={key}"
+    )
+
+
+def _current_url(lat: float, lon: float, key: str) -> str:
+    return (
+        f"{_base_url()}/data/2.5/weather"
+        f"?lat={lat}&lon={lon}"
+        f"&appid={key}&units=metric&lang=ja"
+    )
+
+
+def _forecast_url(lat: float, lon: float, key: str) -> str:
+    return (
+        f"{_base_url()}/data/2.5/forecast"
+        f"?lat={lat}&lon={lon}&cnt=40"
+        f"&appid={key}&units=metric&lang=ja"
+    )
+
 # ======================================
 # Response Validation
 # ======================================
@@ -50,12 +133,8 @@ def _validate_weather_response(data: dict) -> None:
 def _fetch_geo_data(city_variant: str, limit: int = 5) -> List[dict]:
     """地理情報を取得（リトライ機能付き）"""
     key = _get_openweather_key()
-    encoded_city = quote(city_variant)
-    url = (
-        "https://api.openweathermap.org/geo/1.0/direct"
-        f"?q={encoded_city},JP&limit={limit}&appid={key}"
-    )
-    response = _SESSION.get(url, timeout=_TIMEOUT)
+    url = _geo_url(city_variant, limit, key)
+    response = _get("geo", url)
     response.raise_for_status()
     return response.json()
 
@@ -110,52 +189,60 @@ def resolve_city_with_candidates(city: str, limit: int = 5) -> Tuple[Optional[tu
         座標が見つかった場合は (lat, lon) と空のリスト
         候補がある場合は None と候補リスト
     """
-    prefecture_suffixes = ["県", "府", "都", "道"]
-    city_variants = [city]
-
-    for suffix in prefecture_suffixes:
-        if city.endswith(suffix):
-            city_variants.append(city[:-1])
-            break
-
     all_candidates = []
     
-    for city_variant in city_variants:
+    for city_variant in _city_variants(city):
         try:
             data = _fetch_geo_data(city_variant, limit)
-            
-            if data:
-                # 候補を整形して収集（重複排除）
-                candidates = []
-                for item in data:
-                    cand = _format_geo_candidate(item)
-                    if cand and cand not in candidates:
-                        candidates.append(cand)
-
-                # 複数候補が返った場合：先頭がユーザー入力と一致するなら先頭を採用（東京・大阪などで正しく解釈）
-                # 一致しない場合のみ「曖昧」として候補を返す
-                if limit > 1 and len(candidates) > 1:
-                    if _first_result_matches_query(city_variant, data[0]):
-                        lat, lon = data[0]["lat"], data[0]["lon"]
-                        return (lat, lon), []
-                    return None, candidates
-
-                # 単一候補（またはlimit==1）は先頭を採用
-                lat, lon = data[0]["lat"], data[0]["lon"]
-                return (lat, lon), []
-            else:
-                # データがない場合は次のバリアントを試す
-                continue
-                
         except requests.RequestException as e:
-            logger.error(f"地名解決APIへの接続に失敗しました: {e}", exc_info=True)
+            logger.error("地名解決APIへの接続に失敗しました: %s", e, exc_info=True, extra={"event": "upstream_error", "endpoint": "geo"})
             # 次のバリアントを試す
             continue
 
+        if data:
+            return _pick_geo_result(city_variant, data, limit)
+        # データがない場合は次のバリアントを試す
+
     # 見つからなかった場合
     return None, all_candidates
 
 
+def _city_variants(city: str) -> List[str]:
+    """地名解決で試す表記（「〜県」などは接尾辞なしも試す）"""
+    prefecture_suffixes = ["県", "府", "都", "道"]
+    city_variants = [city]
+
+    for suffix in prefecture_suffixes:
+        if city.endswith(suffix):
+            city_variants.append(city[:-1])
+            break
+    return city_variants
+
+
+def _pick_geo_result(
+    city_variant: str, data: List[dict], limit: int
+) -> Tuple[Optional[tuple[float, float]], List[str]]:
+    """geo/1.0/direct の結果から座標または候補を選ぶ"""
+    # 候補を整形して収集（重複排除）
+    candidates = []
+    for item in data:
+        cand = _format_geo_candidate(item)
+        if cand and cand not in candidates:
+            candidates.append(cand)
+
+    # 複数候補が返った場合：先頭がユーザー入力と一致するなら先頭を採用（東京・大阪などで正しく解釈）
+    # 一致しない場合のみ「曖昧」として候補を返す
+    if limit > 1 and len(candidates) > 1:
+        if _first_result_matches_query(city_variant, data[0]):
+            lat, lon = data[0]["lat"], data[0]["lon"]
+            return (lat, lon), []
+        return None, candidates
+
+    # 単一候補（またはlimit==1）は先頭を採用
+    lat, lon = data[0]["lat"], data[0]["lon"]
+    return (lat, lon), []
+
+
 def resolve_city(city: str) -> tuple[float, float]:
     """都市名を解決（後方互換性のため）"""
     coords, _ = resolve_city_with_candidates(city, limit=1)
@@ -170,20 +257,21 @@ def resolve_city(city: str) -> tuple[float, float]:
 @exponential_backoff(max_retries=3, base_delay=1.0)
 def fetch_current_weather(city: str, lat: float, lon: float) -> WeatherResult:
     key = _get_openweather_key()
-    url = (
-        "https://api.openweathermap.org/data/2.5/weather"
-        f"?lat={lat}&lon={lon}"
-        f"&appid={key}&units=metric&lang=ja"
-    )
+    url = _current_url(lat, lon, key)
 
     try:
-        response = _SESSION.get(url, timeout=_TIMEOUT)
+        response = _get("weather", url)
         response.raise_for_status()
         data = response.json()
     except requests.RequestException as e:
-        logger.error(f"現在の天気情報の取得に失敗しました: {e}", exc_info=True)
+        logger.error("現在の天気情報の取得に失敗しました: %s", e, exc_info=True, extra={"event": "upstream_error", "endpoint": "weather"})
         raise WeatherAPIError("現在の天気情報の取得に失敗しました")
 
+    return _parse_current_weather(city, data)
+
+
+def _parse_current_weather(city: str, data: dict) -> WeatherResult:
+    """weather API のレスポンスを WeatherResult にする"""
     _validate_weather_response(data)
 
     return WeatherResult(
@@ -211,22 +299,27 @@ def fetch_forecast_weather(
 ) -> WeatherResult:
     if not (0 <= days <= 5):
         raise WeatherAPIError("無料APIでは0〜5日後まで取得可能です")
+    data = fetch_forecast_data(lat, lon)
+    return _parse_forecast_weather(city, data, days)
+
+
+def fetch_forecast_data(lat: float, lon: float) -> dict:
+    """forecast API（3時間ごと40枠）のレスポンスをそのまま返す"""
     key = _get_openweather_key()
 
-    url = (
-        "https://api.openweathermap.org/data/2.5/forecast"
-        f"?lat={lat}&lon={lon}&cnt=40"
-        f"&appid={key}&units=metric&lang=ja"
-    )
+    url = _forecast_url(lat, lon, key)
 
     try:
-        response = _SESSION.get(url, timeout=_TIMEOUT)
+        response = _get("forecast", url)
         response.raise_for_status()
-        data = response.json()
+        return response.json()
     except requests.RequestException as e:
-        logger.error(f"予報データの取得に失敗しました: {e}", exc_info=True)
+        logger.error("予報データの取得に失敗しました: %s", e, exc_info=True, extra={"event": "upstream_error", "endpoint": "forecast"})
         raise WeatherAPIError("予報データの取得に失敗しました")
 
+
+def _parse_forecast_weather(city: str, data: dict, days: int) -> WeatherResult:
+    """forecast API のレスポンスから指定日の正午に最も近い枠を選んで WeatherResult にする"""
     if "list" not in data:
         raise WeatherAPIError("予報データ形式が不正です")
 
@@ -287,7 +380,8 @@ def fetch_weather(city: str, days: int) -> WeatherResult:
     
     都市名が曖昧な場合は候補を返すために例外を投げる可能性がある
     """
-    coords, candidates = resolve_city_with_candidates(city, limit=5)
+    with span("geocode"):
+        coords, candidates = resolve_city_with_candidates(city, limit=5)
 
     # 候補が1件でもあれば勝手に確定せず、ユーザーに聞き返す（候補提示を確実に発火）
     if candidates:
@@ -299,41 +393,49 @@ def fetch_weather(city: str, days: int) -> WeatherResult:
     lat, lon = coords
 
     if days == 0:
-        current = fetch_current_weather(city, lat, lon)
+        with span("fetch_current"):
+            current = fetch_current_weather(city, lat, lon)
+        with span("fetch_nowcast"):
+            pop, item = fetch_nowcast_probability(lat, lon)
+        return _merge_nowcast(current, pop, item)
+    
+    with span("fetch_forecast"):
+        forecast = fetch_forecast_weather(city, lat, lon, days)
+    return forecast
 
-        pop, item = fetch_nowcast_probability(lat, lon)
-        current.rain_probability = pop
 
-        #snow情報があれば拾う
-        _enrich_snow_from_forecast_item(current, item)
+def _merge_nowcast(current: WeatherResult, pop: int, item: Optional[dict]) -> WeatherResult:
+    """現在の天気に直近予報枠の降水確率・雪情報を反映する"""
+    current.rain_probability = pop
 
-        # snow_probabilityが未設定の場合は推定モデルを使用
-        if current.snow_probability is None:
-            current.snow_probability = estimate_snow_probability(current.rain_probability, current.temp)
+    #snow情報があれば拾う
+    _enrich_snow_from_forecast_item(current, item)
 
-        return current
-    
-    forecast = fetch_forecast_weather(city, lat, lon, days)
-    return forecast
+    # snow_probabilityが未設定の場合は推定モデルを使用
+    if current.snow_probability is None:
+        current.snow_probability = estimate_snow_probability(current.rain_probability, current.temp)
+
+    return current
 
 
 @exponential_backoff(max_retries=2, base_delay=0.5)
 def fetch_nowcast_probability(lat: float, lon: float) -> tuple[int, Optional[dict]]:
     """forecastの直近枠から降水確率（pop）と、その枠データを返す"""
     key = _get_openweather_key()
-    url = (
-        "https://api.openweathermap.org/data/2.5/forecast"
-        f"?lat={lat}&lon={lon}&cnt=40"
-        f"&appid={key}&units=metric&lang=ja"
-    )
+    url = _forecast_url(lat, lon, key)
     try:
-        response = _SESSION.get(url, timeout=_TIMEOUT)
+        response = _get("forecast", url)
         response.raise_for_status()
         data = response.json()
     except requests.RequestException as e:
-        logger.warning(f"予報データ（nowcast）の取得に失敗しました: {e}", exc_info=True)
+        logger.warning("予報データ（nowcast）の取得に失敗しました: %s", e, exc_info=True, extra={"event": "upstream_error", "endpoint": "forecast"})
         return 0, None
     
+    return _parse_nowcast(data)
+
+
+def _parse_nowcast(data: dict) -> tuple[int, Optional[dict]]:
+    """forecast API のレスポンスから現在時刻以降で最も近い枠を選ぶ"""
     if "list" not in data or not data["list"]:
         return 0, None
 
@@ -388,3 +490,128 @@ def _enrich_snow_from_forecast_item(w: WeatherResult, item: Optional[dict]) -> N
     #snow量があるなら雪確率は高い
     if w.snow_volume_mm_3h is not None and w.snow_volume_mm_3h > 0:
         w.snow_probability = pop
+
+
+# ======================================
+# Async (httpx)
+# ======================================
+# async ハンドラ用。URL 組み立て・レスポンス解釈は同期版と共通。
+
+async def _get_json_async(endpoint: str, url: str) -> dict:
+    start = time_module.perf_counter()
+    outcome = "error"
+    try:
+        response = await _get_async_client().get(url)
+        outcome = status_class(response.status_code)
+        record_upstream(endpoint, url, response)
+    except httpx.HTTPError as e:
+        record_upstream(endpoint, url, error=e)
+        raise
+    finally:
+        _record_upstream(endpoint, outcome, start)
+    response.raise_for_status()
+    try:
+        return response.json()
+    except ValueError as e:
+        # プロキシのエラーページなど JSON でない本文。同期版（requests.JSONDecodeError は
+        # RequestException）と同じく、リトライと呼び出し側のエラー処理の対象にする
+        raise httpx.DecodingError(f"JSON でないレスポンスです: {e}", request=response.request) from e
+
+
+@async_exponential_backoff(max_retries=3, base_delay=1.0)
+async def _fetch_geo_data_async(city_variant: str, limit: int = 5) -> List[dict]:
+    """地理情報を取得（リトライ機能付き）"""
+    key = _get_openweather_key()
+    return await _get_json_async("geo", _geo_url(city_variant, limit, key))
+
+
+async def resolve_city_with_candidates_async(
+    city: str, limit: int = 5
+) -> Tuple[Optional[tuple[float, float]], List[str]]:
+    """resolve_city_with_candidates の async 版"""
+    for city_variant in _city_variants(city):
+        try:
+            data = await _fetch_geo_data_async(city_variant, limit)
+        except httpx.HTTPError as e:
+            logger.error("地名解決APIへの接続に失敗しました: %s", e, exc_info=True, extra={"event": "upstream_error", "endpoint": "geo"})
+            continue
+
+        if data:
+            return _pick_geo_result(city_variant, data, limit)
+
+    return None, []
+
+
+@async_exponential_backoff(max_retries=3, base_delay=1.0)
+async def fetch_current_weather_async(city: str, lat: float, lon: float) -> WeatherResult:
+    """fetch_current_weather の async 版"""
+    key = _get_openweather_key()
+    try:
+        data = await _get_json_async("weather", _current_url(lat, lon, key))
+    except httpx.HTTPError as e:
+        logger.error("現在の天気情報の取得に失敗しました: %s", e, exc_info=True, extra={"event": "upstream_error", "endpoint": "weather"})
+        raise WeatherAPIError("現在の天気情報の取得に失敗しました")
+    return _parse_current_weather(city, data)
+
+
+@async_exponential_backoff(max_retries=3, base_delay=1.0)
+async def fetch_forecast_weather_async(
+    city: str,
+    lat: float,
+    lon: float,
+    days: int,
+) -> WeatherResult:
+    """fetch_forecast_weather の async 版"""
+    if not (0 <= days <= 5):
+        raise WeatherAPIError("無料APIでは0〜5日後まで取得可能です")
+    key = _get_openweather_key()
+    try:
+        data = await _get_json_async("forecast", _forecast_url(lat, lon, key))
+    except httpx.HTTPError as e:
+        logger.error("予報データの取得に失敗しました: %s", e, exc_info=True, extra={"event": "upstream_error", "endpoint": "forecast"})
+        raise WeatherAPIError("予報データの取得に失敗しました")
+    return _parse_forecast_weather(city, data, days)
+
+
+@async_exponential_backoff(max_retries=2, base_delay=0.5)
+async def fetch_nowcast_probability_async(lat: float, lon: float) -> tuple[int, Optional[dict]]:
+    """fetch_nowcast_probability の async 版"""
+    key = _get_openweather_key()
+    try:
+        data = await _get_json_async("forecast", _forecast_url(lat, lon, key))
+    except httpx.HTTPError as e:
+        logger.warning("予報データ（nowcast）の取得に失敗しました: %s", e, exc_info=True, extra={"event": "upstream_error", "endpoint": "forecast"})
+        return 0, None
+    return _parse_nowcast(data)
+
+
+async def fetch_weather_async(city: str, days: int) -> WeatherResult:
+    """
+    fetch_weather の async 版
+    当日は現在の天気と直近予報枠を並行に取得する。
+    """
+    with span("geocode"):
+        coords, candidates = await resolve_city_with_candidates_async(city, limit=5)
+
+    if candidates:
+        raise AmbiguousCityError(city, candidates)
+
+    if coords is None:
+        raise CityNotFoundError(f"地名「{city}」を解決できませんでした")
+
+    lat, lon = coords
+
+    if days == 0:
+        async def current_task() -> WeatherResult:
+            with span("fetch_current"):
+                return await fetch_current_weather_async(city, lat, lon)
+
+        async def nowcast_task() -> tuple[int, Optional[dict]]:
+            with span("fetch_nowcast"):
+                return await fetch_nowcast_probability_async(lat, lon)
+
+        current, (pop, item) = await asyncio.gather(current_task(), nowcast_task())
+        return _merge_nowcast(current, pop, item)
+
+    with span("fetch_forecast"):
+        return await fetch_forecast_weather_async(city, lat, lon, days)
@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from aerocast.admission import AdmissionMiddleware, RouteLimit, parse_limits
+from aerocast.metrics import REGISTRY, MetricsMiddleware, admission_shed, http_request_duration
+
+
+class SlowApp:
+    """release が呼ばれるまで応答しない ASGI アプリ（受け取ったボディを返す）"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.started = 0
+
+    async def __call__(self, scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        self.started += 1
+        await self.gate.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def _until(condition) -> None:
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("condition was not met")
+
+
+def test_queue_full_is_shed_with_retry_after():
+    async def main():
+        inner = SlowApp()
+        app = AdmissionMiddleware(inner, {"/chat": RouteLimit(concurrency=1, queue=1, per_session=0)}, retry_after=3)
+        gate = app.gates["/chat"]
+        shed_before = admission_shed.labels("/chat", "queue_full").value()
+        async with _client(app) as client:
+            first = asyncio.create_task(client.post("/chat", json={"session_id": "a"}))
+            second = asyncio.create_task(client.post("/chat", json={"session_id": "b"}))
+            await _until(lambda: gate.active == 1 and gate.queued == 1)
+
+            third = await client.post("/chat", json={"session_id": "c"})
+            inner.gate.set()
+            responses = await asyncio.gather(first, second)
+
+        assert third.status_code == 503
+        assert third.headers["retry-after"] == "3"
+        assert [r.status_code for r in responses] == [200, 200]
+        # ボディは読み直して渡される
+        assert json.loads(responses[1].content) == {"session_id": "b"}
+        assert gate.active == 0 and gate.queued == 0
+        assert admission_shed.labels("/chat", "queue_full").value() == shed_before + 1
+
+    asyncio.run(main())
+
+
+def test_per_session_share_is_limited():
+    async def main():
+        inner = SlowApp()
+        app = AdmissionMiddleware(inner, {"/chat": RouteLimit(concurrency=4, queue=4, per_session=1)})
+        async with _client(app) as client:
+            first = asyncio.create_task(client.post("/chat", json={"session_id": "a"}))
+            await _until(lambda: inner.started == 1)
+
+            same = await client.post("/chat", json={"session_id": "a"})
+            other = asyncio.create_task(client.post("/chat?session_id=b"))
+            await _until(lambda: inner.started == 2)
+            inner.gate.set()
+            await asyncio.gather(first, other)
+
+        assert same.status_code == 429
+        assert "retry-after" in same.headers
+
+    asyncio.run(main())
+
+
+def test_requests_without_session_id_share_only_the_route_limit():
+    async def main():
+        inner = SlowApp()
+        app = AdmissionMiddleware(inner, {"/weather/query": RouteLimit(concurrency=4, queue=4, per_session=2)})
+        async with _client(app) as client:
+            # 同じ接続元から session_id のないリクエストを6件（セッションごとの上限 2 を超える）
+            tasks = [
+                asyncio.create_task(client.post("/weather/query", json={"city": "東京", "days": 0}))
+                for _ in range(6)
+            ]
+            await _until(lambda: inner.started == 4 and app.gates["/weather/query"].queued == 2)
+            inner.gate.set()
+            return await asyncio.gather(*tasks)
+
+    assert [r.status_code for r in asyncio.run(main())] == [200] * 6
+
+
+def test_queue_timeout_is_shed():
+    async def main():
+        inner = SlowApp()
+        limit = RouteLimit(concurrency=1, queue=4, per_session=0, queue_timeout=0.02)
+        app = AdmissionMiddleware(inner, {"/chat": limit})
+        async with _client(app) as client:
+            first = asyncio.create_task(client.post("/chat", json={}))
+            await _until(lambda: inner.started == 1)
+            late = await client.post("/chat", json={})
+            inner.gate.set()
+            await first
+
+        assert late.status_code == 503
+        assert app.gates["/chat"].queued == 0
+
+    asyncio.run(main())
+
+
+def test_shed_requests_are_timed_under_their_route():
+    async def main():
+        inner = SlowApp()
+        limit = RouteLimit(concurrency=1, queue=0, per_session=0)
+        app = MetricsMiddleware(AdmissionMiddleware(inner, {"/chat": limit}))
+        shed = http_request_duration.labels("POST", "/chat", "503")
+        before = shed.snapshot()[1]
+        async with _client(app) as client:
+            first = asyncio.create_task(client.post("/chat", json={}))
+            await _until(lambda: inner.started == 1)
+            rejected = await client.post("/chat", json={})
+            inner.gate.set()
+            await first
+
+        assert rejected.status_code == 503
+        assert shed.snapshot()[1] == before + 1
+
+    asyncio.run(main())
+
+
+def test_other_paths_are_not_limited():
+    async def main():
+        inner = SlowApp()
+        inner.gate.set()
+        app = AdmissionMiddleware(inner, {"/chat": RouteLimit(concurrency=1, queue=0)})
+        async with _client(app) as client:
+            return await client.get("/health")
+
+    assert asyncio.run(main()).status_code == 200
+
+
+def test_queue_depth_is_exported():
+    async def main():
+        inner = SlowApp()
+        app = AdmissionMiddleware(inner, {"/weather/query": RouteLimit(concurrency=1, queue=2, per_session=0)})
+        async with _client(app) as client:
+            tasks = [asyncio.create_task(client.post("/weather/query", json={})) for _ in range(2)]
+            await _until(lambda: app.gates["/weather/query"].queued == 1)
+            text = REGISTRY.render()
+            inner.gate.set()
+            await asyncio.gather(*tasks)
+        return text
+
+    text = asyncio.run(main())
+    assert 'aerocast_admission_requests{route="/weather/query",state="active"} 1' in text
+    assert 'aerocast_admission_requests{route="/weather/query",state="queued"} 1' in text
+
+
+def test_parse_limits():
+    limits = parse_limits("/chat=32:64, /weather/query=8:0", per_session=3)
+    assert limits == {"/chat": RouteLimit(32, 64, 3), "/weather/query": RouteLimit(8, 0, 3)}
+    assert parse_limits("") == {}
+    with pytest.raises(ValueError):
+        parse_limits("/chat=32")
+    with pytest.raises(ValueError):
+        parse_limits("/chat=0:10")
@@ -1,6 +1,8 @@
+import asyncio
 from unittest.mock import patch
 
-from aerocast.agent_loop import run_structured
+from aerocast.agent_loop import _format_step, run_stream_async, run_structured, run_structured_async
+from aerocast.formatter import split_markdown_sections
 from aerocast.intent_parser import WeatherIntent
 
 
@@ -17,3 +19,94 @@ def test_run_structured_returns_validation_message_for_invalid_days(
     assert "0" in result["reply"]
     assert "5" in result["reply"]
     mock_fetch_weather.assert_not_called()
+
+
+@patch("aerocast.agent_loop.fetch_weather_async")
+@patch("aerocast.agent_loop.parse_weather_intent")
+def test_run_structured_async_formats_fetched_weather(
+    mock_parse_weather_intent,
+    mock_fetch_weather_async,
+    sample_weather_result,
+):
+    mock_parse_weather_intent.return_value = WeatherIntent(city="東京", days=0)
+    mock_fetch_weather_async.return_value = sample_weather_result
+
+    result = asyncio.run(run_structured_async("ignored", session_id="test-async"))
+
+    assert result["location"] == "東京"
+    assert result["forecast"]["city"] == "東京"
+    assert set(result["judgement"]) == {"umbrella", "wind", "comfort"}
+    mock_fetch_weather_async.assert_awaited_once_with("東京", 0)
+
+
+@patch("aerocast.agent_loop.fetch_weather_async")
+@patch("aerocast.agent_loop.parse_weather_intent")
+def test_run_stream_async_sends_forecast_before_markdown(
+    mock_parse_weather_intent,
+    mock_fetch_weather_async,
+    sample_weather_result,
+):
+    mock_parse_weather_intent.return_value = WeatherIntent(city="東京", days=0)
+    mock_fetch_weather_async.return_value = sample_weather_result
+
+    order = []
+
+    def format_step(*args):
+        order.append("format")
+        return _format_step(*args)
+
+    async def collect():
+        events = []
+        async for event in run_stream_async("ignored", session_id="test-stream"):
+            order.append(event[0])
+            events.append(event)
+        return events
+
+    with patch("aerocast.agent_loop._format_step", side_effect=format_step):
+        events = asyncio.run(collect())
+    kinds = [kind for kind, _ in events]
+
+    # forecast は整形（FORMAT）を待たずに受け取れる
+    assert order[:2] == ["forecast", "format"]
+    assert kinds[0] == "forecast"
+    assert kinds[-1] == "done"
+    assert kinds.count("markdown") >= 2
+    assert events[0][1]["judgement"] == events[-1][1]["judgement"]
+    markdown = "".join(data["text"] for kind, data in events if kind == "markdown")
+    assert markdown == events[-1][1]["reply"]
+
+
+@patch("aerocast.agent_loop.fetch_weather_async")
+@patch("aerocast.agent_loop.parse_weather_intent")
+def test_run_stream_async_releases_session_before_sending_events(
+    mock_parse_weather_intent,
+    mock_fetch_weather_async,
+    sample_weather_result,
+):
+    """受信が止まったストリームがあっても、同じセッションの次のリクエストが待たされないこと"""
+    mock_parse_weather_intent.return_value = WeatherIntent(city="東京", days=0)
+    mock_fetch_weather_async.return_value = sample_weather_result
+
+    async def main():
+        stream = run_stream_async("ignored", session_id="test-stream-lock")
+        first = await stream.__anext__()
+        try:
+            # 残りのイベントを受け取らないまま、同じセッションで次のリクエストを処理する
+            result = await asyncio.wait_for(
+                run_structured_async("ignored", session_id="test-stream-lock"), timeout=2
+            )
+        finally:
+            await stream.aclose()
+        return first, result
+
+    first, result = asyncio.run(main())
+
+    assert first[0] == "forecast"
+    assert result["location"] == "東京"
+
+
+def test_split_markdown_sections_round_trips():
+    markdown = "## A\n\n- a\n\n## B\n\n- b\n\n## C\n\n- c"
+    sections = split_markdown_sections(markdown)
+    assert [s.split("\n", 1)[0] for s in sections] == ["## A", "## B", "## C"]
+    assert "".join(sections) == markdown
@@ -0,0 +1,153 @@
+import gzip
+import os
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from aerocast import capture, weather_api
+from aerocast.capture import (
+    CaptureWriter,
+    capture_files,
+    capture_request,
+    iter_captures,
+    session_hash,
+    set_capture_writer,
+    upstream_key,
+)
+
+
+@pytest.fixture
+def writer(tmp_path):
+    w = CaptureWriter(str(tmp_path))
+    set_capture_writer(w)
+    yield w
+    w.close()
+    set_capture_writer(None)
+
+
+def test_capture_is_disabled_without_directory(monkeypatch):
+    monkeypatch.delenv("AEROCAST_CAPTURE_DIR", raising=False)
+    set_capture_writer(None)
+    with capture_request("/chat", "s1", message="東京の天気") as record:
+        assert record is None
+    # 記録していなければ上流の記録は何もしない
+    capture.record_upstream("geo", "http://x/geo/1.0/direct?q=a", Mock(status_code=200, text="[]"))
+
+
+def test_upstream_key_drops_host_and_appid():
+    url = "https://api.openweathermap.org/data/2.5/weather?lat=35.6&lon=139.7&appid=secret&units=metric"
+    assert upstream_key(url) == "/data/2.5/weather?lat=35.6&lon=139.7&units=metric"
+    assert upstream_key("http://127.0.0.1:8900/data/2.5/weather?lat=35.6&lon=139.7&appid=x&units=metric") == \
+        upstream_key(url)
+
+
+def test_request_is_recorded_with_upstream_responses(writer, tmp_path):
+    response = Mock(status_code=200, text='[{"lat": 35.6, "lon": 139.7}]')
+    with patch.object(weather_api._SESSION, "get", return_value=response):
+        with capture_request("/chat", "session-1", message="今日の東京の天気") as record:
+            weather_api._get("geo", "https://api.openweathermap.org/geo/1.0/direct?q=x&appid=secret")
+            record["reply_sha256"] = "abc"
+    writer.close()
+
+    [saved] = list(iter_captures([tmp_path]))
+    assert saved["route"] == "/chat"
+    assert saved["session"] == session_hash("session-1")
+    assert "session-1" not in str(saved)
+    assert saved["message"] == "今日の東京の天気"
+    assert saved["status"] == "ok"
+    assert saved["duration_ms"] >= 0
+    assert saved["reply_sha256"] == "abc"
+    assert saved["upstream"] == [{
+        "endpoint": "geo",
+        "url": "/geo/1.0/direct?q=x",
+        "status": 200,
+        "body": '[{"lat": 35.6, "lon": 139.7}]',
+    }]
+    assert "secret" not in str(saved)
+
+
+def test_upstream_connection_error_is_recorded(writer, tmp_path):
+    with patch.object(weather_api._SESSION, "get", side_effect=requests.ConnectionError("reset")):
+        with pytest.raises(ValueError):
+            with capture_request("/weather/query", city="東京", days=0):
+                with pytest.raises(requests.ConnectionError):
+                    weather_api._get("forecast", "http://x/data/2.5/forecast?lat=1&lon=2")
+                raise ValueError("boom")
+    writer.close()
+
+    [saved] = list(iter_captures([tmp_path]))
+    assert saved["status"] == "error"
+    assert saved["city"] == "東京"
+    assert saved["upstream"] == [{"endpoint": "forecast", "url": "/data/2.5/forecast?lat=1&lon=2", "error": "ConnectionError"}]
+
+
+def test_writer_rotates_and_prunes(tmp_path):
+    w = CaptureWriter(str(tmp_path), max_bytes=200, max_files=2)
+    for i in range(10):
+        w.write({"ts": i, "i": i, "pad": "x" * 150})
+    w.close()
+
+    # 1ファイル2件ずつ、新しい2ファイルが残る
+    assert len(capture_files(tmp_path)) == 2
+    assert [r["i"] for r in iter_captures([tmp_path])] == [6, 7, 8, 9]
+
+
+def test_prune_keeps_files_of_other_workers(tmp_path):
+    other = tmp_path / f"capture-20260101-000000-{os.getpid() + 1}-0001.jsonl.gz"
+    with gzip.open(other, "wb") as f:
+        f.write(b'{"ts": 0, "i": -1}\n')
+    os.utime(other, (0, 0))
+
+    w = CaptureWriter(str(tmp_path), max_bytes=200, max_files=1)
+    for i in range(4):
+        w.write({"ts": i + 1, "i": i, "pad": "x" * 150})
+    w.close()
+
+    # 自分のファイルは最新の1つだけ残し、他のワーカーのファイルは消さない
+    assert other in capture_files(tmp_path)
+    assert len(capture_files(tmp_path)) == 2
+    assert [r["i"] for r in iter_captures([tmp_path])] == [-1, 2, 3]
+
+
+def test_records_are_written_by_background_thread(tmp_path):
+    w = CaptureWriter(str(tmp_path))
+    writers = []
+    original = w._write
+
+    def recording_write(record):
+        writers.append(threading.get_ident())
+        original(record)
+
+    with patch.object(w, "_write", recording_write):
+        w.write({"ts": 1, "i": 1})
+        w.flush()
+    w.close()
+
+    assert writers and threading.get_ident() not in writers
+    assert [r["i"] for r in iter_captures([tmp_path])] == [1]
+
+
+def test_full_queue_drops_records(tmp_path):
+    w = CaptureWriter(str(tmp_path), queue_size=1)
+    blocked = threading.Event()
+    release = threading.Event()
+    original = w._write
+
+    def slow_write(record):
+        blocked.set()
+        release.wait()
+        original(record)
+
+    with patch.object(w, "_write", slow_write):
+        w.write({"ts": 1, "i": 1})
+        blocked.wait()
+        w.write({"ts": 2, "i": 2})
+        w.write({"ts": 3, "i": 3})
+        release.set()
+        w.flush()
+    w.close()
+
+    assert w.dropped == 1
+    assert [r["i"] for r in iter_captures([tmp_path])] == [1, 2]
@@ -0,0 +1,107 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aerocast import app as app_module
+from aerocast.http_cache import cache_control, cacheable, etag_matches, slot_id, weather_etag
+
+# 2026-03-13 03:00 UTC（予報枠の始まり）
+SLOT_START = 1773370800.0
+
+
+def test_etag_changes_only_with_city_days_and_slot():
+    etag = weather_etag("東京", 1, SLOT_START)
+
+    # 本文のハッシュではないため弱い ETag
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert weather_etag("東京", 1, SLOT_START + 3 * 3600 - 1) == etag
+    assert weather_etag(" 東京 ", 1, SLOT_START) == etag
+    assert weather_etag("東京", 1, SLOT_START + 3 * 3600) != etag
+    assert weather_etag("東京", 2, SLOT_START) != etag
+    assert weather_etag("大阪", 1, SLOT_START) != etag
+
+
+def test_max_age_ends_at_next_slot():
+    assert slot_id(SLOT_START) + 1 == slot_id(SLOT_START + 3 * 3600)
+    assert cache_control(SLOT_START) == "public, max-age=10800"
+    assert cache_control(SLOT_START + 10000.5) == "public, max-age=799"
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ('"abc"', True),
+    ('"x", "abc"', True),
+    ('W/"abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+    assert etag_matches(header, 'W/"abc"') is expected
+
+
+def test_only_forecasts_are_cacheable():
+    assert not cacheable(0)
+    assert all(cacheable(days) for days in range(1, 6))
+
+
+@pytest.fixture
+def client():
+    with TestClient(app_module.app) as c:
+        yield c
+
+
+def test_weather_query_get_sets_cache_headers_and_answers_304(client, sample_weather_result):
+    fetch = AsyncMock(return_value=sample_weather_result)
+    with patch.object(app_module, "fetch_weather_async", fetch):
+        first = client.get("/weather/query", params={"city": "東京", "days": 1})
+        etag = first.headers["etag"]
+        second = client.get("/weather/query", params={"city": "東京", "days": 1}, headers={"If-None-Match": etag})
+        other = client.get("/weather/query", params={"city": "東京", "days": 2}, headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert first.json()["city"] == "東京" and first.json()["days"] == 1
+    assert first.headers["cache-control"].startswith("public, max-age=")
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+    assert other.status_code == 200
+    # 304 では天気を取得しない
+    assert fetch.await_count == 2
+
+
+def test_weather_query_post_is_never_cached(client, sample_weather_result):
+    fetch = AsyncMock(return_value=sample_weather_result)
+    with patch.object(app_module, "fetch_weather_async", fetch):
+        etag = client.get("/weather/query", params={"city": "東京", "days": 1}).headers["etag"]
+        response = client.post("/weather/query", json={"city": "東京", "days": 1}, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["city"] == "東京"
+    assert "etag" not in response.headers
+    assert fetch.await_count == 2
+
+
+def test_current_weather_has_no_etag(client, sample_weather_result):
+    fetch = AsyncMock(return_value=sample_weather_result)
+    with patch.object(app_module, "fetch_weather_async", fetch):
+        first = client.get("/weather/query", params={"city": "東京", "days": 0})
+        second = client.get(
+            "/weather/query", params={"city": "東京", "days": 0},
+            headers={"If-None-Match": weather_etag("東京", 0)},
+        )
+
+    assert first.status_code == 200 and second.status_code == 200
+    assert "etag" not in first.headers
+    assert first.headers["cache-control"] == "no-cache"
+    assert fetch.await_count == 2
+
+
+def test_errors_are_not_cacheable(client):
+    fetch = AsyncMock(side_effect=RuntimeError("upstream down"))
+    with patch.object(app_module, "fetch_weather_async", fetch):
+        response = client.get("/weather/query", params={"city": "東京", "days": 1})
+
+    assert response.status_code == 500
+    assert "etag" not in response.headers
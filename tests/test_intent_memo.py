@@ -0,0 +1,133 @@
+import dataclasses
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from aerocast import intent_parser
+from aerocast.intent_parser import (
+    JST,
+    IntentMemo,
+    WeatherIntent,
+    _next_jst_midnight,
+    clear_intent_memo,
+    parse_weather_intent,
+)
+from aerocast.metrics import cache_requests
+
+
+@pytest.fixture(autouse=True)
+def _fresh_memo():
+    clear_intent_memo()
+    yield
+    clear_intent_memo()
+
+
+def _counts():
+    return (
+        cache_requests.labels("intent", "hit").value(),
+        cache_requests.labels("intent", "miss").value(),
+    )
+
+
+def test_repeated_query_is_served_from_memo():
+    hits, misses = _counts()
+    with patch.object(intent_parser, "_parse_weather_intent", wraps=intent_parser._parse_weather_intent) as parse:
+        first = parse_weather_intent("今日の東京の天気")
+        second = parse_weather_intent("今日の東京の天気")
+
+    assert first == WeatherIntent(city="東京", days=0)
+    assert second is first
+    assert parse.call_count == 1
+    assert _counts() == (hits + 1, misses + 1)
+
+
+def test_failed_parse_is_memoized():
+    with patch.object(intent_parser, "_parse_weather_intent", wraps=intent_parser._parse_weather_intent) as parse:
+        assert parse_weather_intent("こんにちは") is None
+        assert parse_weather_intent("こんにちは") is None
+    assert parse.call_count == 1
+
+
+def test_context_is_part_of_key():
+    assert parse_weather_intent("明日は？", context_city="東京") == WeatherIntent(city="東京", days=1)
+    assert parse_weather_intent("明日は？", context_city="札幌") == WeatherIntent(city="札幌", days=1)
+    assert parse_weather_intent("明日は？") is None
+
+
+def test_intent_is_frozen():
+    intent = parse_weather_intent("東京の天気")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        intent.days = 3
+
+
+def test_memo_is_bounded_lru():
+    memo = IntentMemo(maxsize=2)
+    memo.put("a", WeatherIntent("A", 0))
+    memo.put("b", WeatherIntent("B", 0))
+    memo.get("a")
+    memo.put("c", WeatherIntent("C", 0))
+
+    assert len(memo) == 2
+    assert memo.get("a") == WeatherIntent("A", 0)
+    assert memo.get("b") is intent_parser._MISSING
+
+
+def test_next_jst_midnight():
+    # 2026-03-13 23:59:59 JST
+    now = datetime(2026, 3, 13, 23, 59, 59, tzinfo=JST).timestamp()
+    assert _next_jst_midnight(now) == datetime(2026, 3, 14, tzinfo=JST).timestamp()
+    # ちょうど 0時（JST）は次の日の 0時まで
+    midnight = datetime(2026, 3, 14, tzinfo=JST).timestamp()
+    assert _next_jst_midnight(midnight) == datetime(2026, 3, 15, tzinfo=JST).timestamp()
+
+
+def test_weekend_is_recomputed_after_jst_date_change():
+    # 2026-03-13 は金曜日、2026-03-14 は土曜日
+    friday = datetime(2026, 3, 13, 23, 59, tzinfo=JST)
+    saturday = datetime(2026, 3, 14, 0, 1, tzinfo=JST)
+
+    with patch.object(intent_parser, "datetime") as mock_datetime, \
+            patch.object(intent_parser.time, "time") as mock_time:
+        mock_datetime.now.return_value = friday
+        mock_time.return_value = friday.timestamp()
+        assert parse_weather_intent("週末の東京の天気").days == 1
+
+        # 日付が変わるまではキャッシュから返す
+        mock_datetime.now.return_value = saturday
+        assert parse_weather_intent("週末の東京の天気").days == 1
+
+        mock_time.return_value = saturday.timestamp()
+        assert parse_weather_intent("週末の東京の天気").days == 0
+
+
+def test_result_parsed_across_date_change_is_not_memoized():
+    friday = datetime(2026, 3, 13, 23, 59, 59, tzinfo=JST)
+    saturday = datetime(2026, 3, 14, 0, 0, 1, tzinfo=JST)
+
+    def parse_across_midnight(*args):
+        # 金曜日の日付で解析している間に JST の日付が変わる
+        intent = WeatherIntent(city="東京", days=1)
+        mock_time.return_value = saturday.timestamp()
+        return intent
+
+    with patch.object(intent_parser.time, "time") as mock_time, \
+            patch.object(intent_parser, "_parse_weather_intent", side_effect=parse_across_midnight) as parse:
+        mock_time.return_value = friday.timestamp()
+        assert parse_weather_intent("週末の東京の天気").days == 1
+        # 金曜日の結果は土曜日のキャッシュに残らない
+        assert intent_parser._memo.get(("週末の東京の天気", None, None)) is intent_parser._MISSING
+        parse_weather_intent("週末の東京の天気")
+
+    assert parse.call_count == 2
+
+
+def test_put_with_stale_generation_is_dropped():
+    memo = IntentMemo()
+    generation = memo.generation()
+    memo.clear()
+    memo.put("a", WeatherIntent("A", 0), generation)
+    assert memo.get("a") is intent_parser._MISSING
+
+    memo.put("a", WeatherIntent("A", 0), memo.generation())
+    assert memo.get("a") == WeatherIntent("A", 0)
@@ -0,0 +1,112 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+from aerocast.fallback_formatter import simple_format
+from aerocast.formatter import format_weather
+from aerocast.llm_cache import SLOT_SECONDS, SlotTTLCache, clear_llm_cache, context_key, slot_end
+from aerocast.models import WeatherContext
+from aerocast.rules import decide_all
+
+
+def _context(weather):
+    umbrella, wind, comfort = decide_all(weather)
+    return WeatherContext(weather=weather, umbrella=umbrella, wind=wind, comfort=comfort)
+
+
+def _stream(deltas, delay=0.0):
+    for d in deltas:
+        if delay:
+            time.sleep(delay)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=d))])
+
+
+class _Stream:
+    def __init__(self, deltas, delay=0.0):
+        self._it = _stream(deltas, delay)
+
+    def __iter__(self):
+        return self._it
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    clear_llm_cache()
+    yield
+    clear_llm_cache()
+
+
+def test_slot_end_aligns_to_three_hours():
+    assert slot_end(0) == SLOT_SECONDS
+    assert slot_end(SLOT_SECONDS - 1) == SLOT_SECONDS
+    assert slot_end(SLOT_SECONDS) == 2 * SLOT_SECONDS
+
+
+def test_cache_expires_at_slot_end():
+    now = [SLOT_SECONDS * 10 + 60]
+    cache = SlotTTLCache(maxsize=10, clock=lambda: now[0])
+    cache.put("k", "v")
+    now[0] = SLOT_SECONDS * 11 - 1
+    assert cache.get("k") == "v"
+    now[0] = SLOT_SECONDS * 11
+    assert cache.get("k") is None
+
+
+def test_context_key_depends_on_content(sample_weather_result):
+    key = context_key(_context(sample_weather_result))
+    assert context_key(_context(sample_weather_result)) == key
+    sample_weather_result.temp += 1
+    assert context_key(_context(sample_weather_result)) != key
+
+
+def test_concurrent_requests_share_one_llm_call(sample_weather_result):
+    client = Mock()
+    client.chat.completions.create.side_effect = lambda **kw: _Stream(["東京は", "晴れです。"], delay=0.05)
+    context = _context(sample_weather_result)
+    results = []
+
+    def worker():
+        results.append(format_weather(context))
+
+    with patch("aerocast.formatter._get_client", return_value=client):
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 2回目以降はキャッシュから返す
+        assert format_weather(context) == "東京は晴れです。"
+
+    assert results == ["東京は晴れです。"] * 8
+    assert client.chat.completions.create.call_count == 1
+
+
+def test_timeout_falls_back_to_simple_format(sample_weather_result):
+    client = Mock()
+    client.chat.completions.create.return_value = _Stream(["東京は", "晴れ", "です。"], delay=0.05)
+    context = _context(sample_weather_result)
+
+    with patch("aerocast.formatter._get_client", return_value=client):
+        assert format_weather(context, timeout=0.07) == simple_format(context)
+
+
+def test_semaphore_wait_counts_against_timeout(sample_weather_result):
+    client = Mock()
+    context = _context(sample_weather_result)
+
+    with patch("aerocast.formatter._get_client", return_value=client), \
+            patch("aerocast.formatter.llm_semaphore", threading.BoundedSemaphore(1)) as sem:
+        sem.acquire()
+        try:
+            assert format_weather(context, timeout=0.01) == simple_format(context)
+        finally:
+            sem.release()
+
+    client.chat.completions.create.assert_not_called()
+
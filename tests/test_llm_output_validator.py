@@ -1,9 +1,85 @@
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
 import pytest
-from aerocast.validators import validate_llm_output, LLMOutputValidation
+
+from aerocast.fallback_formatter import simple_format
+from aerocast.formatter import format_weather
+from aerocast.llm_cache import clear_llm_cache
+from aerocast.models import WeatherContext
+from aerocast.validators import FORBIDDEN_PATTERNS, LLMOutputValidation, stream_validated, validate_llm_output
 
 def test_valid_text():
     validate_llm_output("今日の東京の天気は晴れです。")
 
 def test_forbidden_text():
     with pytest.raises(LLMOutputValidation):
-        validate_llm_output("防寒対策をお勧めします")
\ No newline at end of file
+        validate_llm_output("防寒対策をお勧めします")
+
+def test_forbidden_text_split_across_chunks():
+    chunks = ["今日は晴れです。傘は不要と思い", "ます。"]
+    received = []
+    with pytest.raises(LLMOutputValidation):
+        for safe in stream_validated(chunks):
+            received.append(safe)
+    # 禁止フレーズの途中（「思い」）は送出前に保留されている
+    assert "".join(received) == "今日は晴れです。傘は不要と"
+
+
+def test_stream_validated_returns_full_text():
+    chunks = ["今日の東京", "は晴れで", "す。思い出", "の一日に。"]
+    assert "".join(stream_validated(chunks)) == "".join(chunks)
+
+
+def test_matches_each_forbidden_pattern():
+    for pattern in FORBIDDEN_PATTERNS:
+        with pytest.raises(LLMOutputValidation):
+            validate_llm_output(f"天気は晴れ。{pattern}。")
+
+
+class _FakeStream:
+    def __init__(self, deltas):
+        self._deltas = deltas
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for d in self._deltas:
+            self.consumed += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=d))])
+
+    def close(self):
+        self.closed = True
+
+
+def _context(weather):
+    from aerocast.rules import decide_all
+    clear_llm_cache()
+    umbrella, wind, comfort = decide_all(weather)
+    return WeatherContext(weather=weather, umbrella=umbrella, wind=wind, comfort=comfort)
+
+
+def test_format_weather_aborts_stream_on_forbidden_phrase(sample_weather_result):
+    stream = _FakeStream(["東京は晴れ。", "傘をお勧め", "します。", "残り"] + ["。"] * 100)
+    client = Mock()
+    client.chat.completions.create.return_value = stream
+    context = _context(sample_weather_result)
+
+    with patch("aerocast.formatter._get_client", return_value=client):
+        text = format_weather(context)
+
+    assert text == simple_format(context)
+    assert stream.closed
+    assert stream.consumed == 2
+
+
+def test_format_weather_returns_streamed_text(sample_weather_result):
+    stream = _FakeStream(["東京は晴れ、", "気温25℃です。"])
+    client = Mock()
+    client.chat.completions.create.return_value = stream
+
+    with patch("aerocast.formatter._get_client", return_value=client):
+        text = format_weather(_context(sample_weather_result))
+
+    assert text == "東京は晴れ、気温25℃です。"
+    assert not stream.closed
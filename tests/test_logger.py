@@ -0,0 +1,103 @@
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+from aerocast.logger import (
+    DeferredQueueHandler,
+    configure_logging,
+    logger,
+    parse_sampling,
+    shutdown_logging,
+)
+from aerocast.metrics import record_cache
+
+
+@pytest.fixture
+def stream():
+    out = io.StringIO()
+    yield out
+    # 既定（CRITICAL・出力なし）に戻す
+    configure_logging("CRITICAL")
+
+
+def _lines(stream: io.StringIO) -> list[dict]:
+    shutdown_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class _Counted:
+    """文字列にされた回数を数える"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "counted"
+
+
+def test_default_is_quiet():
+    configure_logging("CRITICAL")
+    assert not logger.isEnabledFor(logging.ERROR)
+    assert all(isinstance(h, logging.NullHandler) for h in logger.handlers)
+
+
+def test_structured_line_includes_event_and_extra(stream):
+    configure_logging("DEBUG", sampling="", stream=stream)
+    logger.warning("HTTP %s: %.2f秒後にリトライ", 503, 1.5, extra={"event": "retry", "attempt": 2})
+
+    [line] = _lines(stream)
+    assert line["level"] == "WARNING"
+    assert line["event"] == "retry"
+    assert line["message"] == "HTTP 503: 1.50秒後にリトライ"
+    assert line["attempt"] == 2
+
+
+def test_message_is_not_formatted_below_level(stream):
+    configure_logging("WARNING", stream=stream)
+    arg = _Counted()
+    logger.debug("value=%s", arg)
+
+    assert _lines(stream) == []
+    assert arg.calls == 0
+
+
+def test_message_is_formatted_by_listener(stream):
+    configure_logging("DEBUG", sampling="", stream=stream)
+    handler = next(h for h in logger.handlers if isinstance(h, DeferredQueueHandler))
+    record = logging.makeLogRecord({"msg": "value=%s", "args": (1,)})
+
+    # キューには整形前の LogRecord をそのまま入れる
+    assert handler.prepare(record) is record
+    assert record.args == (1,)
+
+
+def test_sampling_drops_and_marks_events(stream):
+    configure_logging("DEBUG", sampling="cache_hit=0,retry=1", stream=stream)
+    for _ in range(50):
+        record_cache("intent", True)
+    logger.info("retry", extra={"event": "retry"})
+
+    lines = _lines(stream)
+    assert [line["event"] for line in lines] == ["retry"]
+    assert lines[0]["sample_rate"] == 1.0
+
+
+def test_full_queue_drops_without_blocking():
+    handler = DeferredQueueHandler(queue.Queue(maxsize=1))
+    handler.emit(logging.makeLogRecord({"msg": "a"}))
+    handler.emit(logging.makeLogRecord({"msg": "b"}))
+
+    assert handler.dropped == 1
+
+
+def test_parse_sampling():
+    assert parse_sampling("cache_hit=0.01, retry=0.5") == {"cache_hit": 0.01, "retry": 0.5}
+    assert parse_sampling("") == {}
+    with pytest.raises(ValueError):
+        parse_sampling("retry")
+    with pytest.raises(ValueError):
+        parse_sampling("retry=2")
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# 計測の処理と上限は benchmarks/bench_memory.py と共有する
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+from bench_memory import BUDGETS, SCENARIOS, measure
+
+ITEMS = 2000
+
+
+@pytest.mark.parametrize("name", list(SCENARIOS))
+def test_memory_per_item_is_within_budget(name):
+    result = measure(name, ITEMS, top=5)
+
+    sites = "\n".join(f"  {s['bytes'] / ITEMS:.1f} B/item  {s['site']}" for s in result["top_sites"])
+    assert result["bytes_per_item"] <= BUDGETS[name], (
+        f"{name}: {result['bytes_per_item']:.1f} bytes/item > {BUDGETS[name]}\n{sites}"
+    )
+
+
+def test_items_are_held_while_measured():
+    # 保持しているものを数えられていること（0 や負の値にならない）
+    result = measure("session", 200, top=3)
+
+    assert result["bytes_per_item"] > 0
+    assert result["top_sites"]
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from unittest.mock import Mock, patch
+
+import anyio.to_thread
+import pytest
+from requests.exceptions import HTTPError
+
+from aerocast.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    _thread_pools,
+    _worker_thread_counts,
+    cache_hit_ratio,
+    record_cache,
+    retries,
+    track_thread_pools,
+)
+from aerocast.retry import exponential_backoff
+
+
+def test_counter_sums_across_threads():
+    counter = Counter("test_total", "test", ["kind"])
+
+    def worker():
+        for _ in range(1000):
+            counter.labels("a").inc()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counter.value("a") == 8000
+
+
+def test_counter_rejects_wrong_label_count():
+    counter = Counter("test_total", "test", ["kind"])
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    hist = registry.register(Histogram("test_seconds", "test", ["route"], buckets=(0.1, 1.0)))
+    for v in (0.05, 0.1, 0.5, 2.0):
+        hist.labels("/chat").observe(v)
+
+    text = registry.render()
+
+    assert 'test_seconds_bucket{route="/chat",le="0.1"} 2' in text
+    assert 'test_seconds_bucket{route="/chat",le="1"} 3' in text
+    assert 'test_seconds_bucket{route="/chat",le="+Inf"} 4' in text
+    assert 'test_seconds_count{route="/chat"} 4' in text
+
+
+def test_gauge_uses_callback():
+    registry = Registry()
+    registry.register(Gauge("test_items", "test", callback=lambda: {(): 3}))
+
+    assert "test_items 3" in registry.render()
+
+
+def test_cache_hit_ratio():
+    record_cache("test-cache", True)
+    record_cache("test-cache", True)
+    record_cache("test-cache", True)
+    record_cache("test-cache", False)
+
+    assert 'aerocast_cache_hit_ratio{cache="test-cache"} 0.75' in "\n".join(cache_hit_ratio.render())
+
+
+@patch("aerocast.retry.time.sleep")
+def test_retry_counts_are_recorded(_mock_sleep):
+    before = retries.value("http_503")
+    response = Mock(status_code=503)
+
+    @exponential_backoff(max_retries=2, base_delay=0.01, jitter=False)
+    def always_unavailable():
+        raise HTTPError(response=response)
+
+    with pytest.raises(HTTPError):
+        always_unavailable()
+
+    assert retries.value("http_503") - before == 2
+
+
+def test_worker_threads_gauge_reports_tracked_pools():
+    async def main():
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        track_thread_pools(limiter, asyncio.get_running_loop())
+        await asyncio.to_thread(lambda: None)
+        return _worker_thread_counts(), limiter.total_tokens
+
+    try:
+        counts, limit = asyncio.run(main())
+    finally:
+        _thread_pools.clear()
+    assert counts[("process", "threads")] >= 1
+    assert counts[("anyio", "busy")] == 0
+    assert counts[("anyio", "limit")] == limit
+    assert counts[("asyncio", "threads")] >= 1
+    assert counts[("asyncio", "busy")] == 0
+    assert counts[("asyncio", "queued")] == 0
+
+
+def test_worker_threads_gauge_tolerates_unknown_executor():
+    # ThreadPoolExecutor の非公開の属性が変わっていても、メトリクスの出力を止めない
+    loop = Mock(_default_executor=object())
+    track_thread_pools(loop=loop)
+    try:
+        counts = _worker_thread_counts()
+    finally:
+        _thread_pools.clear()
+    assert counts[("process", "threads")] >= 1
+    assert counts[("asyncio", "threads")] == 0
+    assert ("asyncio", "queued") not in counts
@@ -0,0 +1,99 @@
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from aerocast import profiler
+from aerocast.profiler import SamplingProfiler
+
+
+def _wait_here(ready: threading.Event, done: threading.Event) -> None:
+    ready.set()
+    done.wait()
+
+
+@pytest.fixture
+def waiting_thread():
+    ready, done = threading.Event(), threading.Event()
+    thread = threading.Thread(target=_wait_here, args=(ready, done))
+    thread.start()
+    ready.wait()
+    yield thread
+    done.set()
+    thread.join()
+
+
+def test_sample_keeps_only_focused_stacks(waiting_thread):
+    p = SamplingProfiler(focus=str(Path(__file__).parent))
+    p.sample(skip=threading.get_ident())
+
+    [line] = p.collapsed().splitlines()
+    stack, count = line.rsplit(" ", 1)
+    # 根から葉の順に ";" でつなぐ。計測したスレッド（ここ）は数えない
+    assert stack.startswith("threading.Thread._bootstrap;")
+    assert ";test_profiler._wait_here;threading.Event.wait" in stack
+    assert count == "1"
+    assert p.samples == 1
+
+
+def test_package_focus_ignores_unrelated_threads(waiting_thread):
+    p = SamplingProfiler()
+    p.sample(skip=threading.get_ident())
+
+    assert p.collapsed() == ""
+
+
+def test_start_and_stop(waiting_thread):
+    p = SamplingProfiler(focus=str(Path(__file__).parent))
+    assert p.start(interval_ms=1, max_seconds=0)
+    assert not p.start(interval_ms=1)
+    time.sleep(0.05)
+    assert p.stop()
+    assert not p.stop()
+
+    status = p.status()
+    assert not status["running"]
+    assert status["samples"] > 0
+    assert status["stopped_at"] >= status["started_at"]
+    assert "test_profiler._wait_here" in p.collapsed()
+
+
+def test_stops_after_max_seconds_and_dumps(waiting_thread, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "DEFAULT_PROFILE_DIR", str(tmp_path))
+    p = SamplingProfiler(focus=str(Path(__file__).parent))
+    p.start(interval_ms=1, max_seconds=0.05)
+    p._thread.join(timeout=1)
+
+    assert not p.running
+    # 自動的に止まった結果は、次の開始で破棄される前にファイルに残る
+    [path] = tmp_path.glob("*.folded")
+    assert path.read_text(encoding="utf-8") == p.collapsed()
+    assert "test_profiler._wait_here" in p.collapsed()
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR2"), reason="SIGUSR2 is not available")
+def test_signal_toggles_and_dumps(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "_profiler", SamplingProfiler())
+    monkeypatch.setattr(profiler, "DEFAULT_PROFILE_DIR", str(tmp_path))
+    previous = signal.getsignal(signal.SIGUSR2)
+    try:
+        assert profiler.install_signal_handler()
+        os.kill(os.getpid(), signal.SIGUSR2)
+        _wait_for(lambda: profiler.profile_status()["running"])
+        os.kill(os.getpid(), signal.SIGUSR2)
+        _wait_for(lambda: list(tmp_path.glob("*.folded")))
+    finally:
+        signal.signal(signal.SIGUSR2, previous)
+        profiler.stop_profiling()
+
+    assert not profiler.profile_status()["running"]
+
+
+def _wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
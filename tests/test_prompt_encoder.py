@@ -0,0 +1,52 @@
+import json
+from dataclasses import asdict
+
+from aerocast.formatter import _SYSTEM_PROMPT
+from aerocast.models import WeatherContext
+from aerocast.prompt_encoder import compact_context, encode_context, estimate_tokens
+from aerocast.rules import decide_all
+
+# prompt_encoder 導入前のシステムプロンプト（キーの凡例なし）
+_FULL_JSON_SYSTEM_PROMPT = (
+    "あなたは天気情報を分かりやすく説明するアシスタントです。"
+    "与えられた情報のみを説明してください。新しい判断や推測は行わないでください。"
+    "回答には必ずデータの基準時刻(observed_at_jst)を含めてください。"
+    "snow_probabilityは推定値の可能性があるため、推定の場合は『推定』と明記してください。"
+)
+
+
+def _context(weather):
+    umbrella, wind, comfort = decide_all(weather)
+    return WeatherContext(weather=weather, umbrella=umbrella, wind=wind, comfort=comfort)
+
+
+def _prompt_tokens(messages):
+    return sum(estimate_tokens(content) for content in messages)
+
+
+def test_compact_prompt_is_smaller_than_full_json(sample_weather_result):
+    context = _context(sample_weather_result)
+    full = [_FULL_JSON_SYSTEM_PROMPT, json.dumps(asdict(context), ensure_ascii=False)]
+    compact = [_SYSTEM_PROMPT, encode_context(context)]
+
+    # 凡例を含むシステムプロンプトまで合わせた合計で比べる
+    assert _prompt_tokens(compact) < _prompt_tokens(full)
+    assert estimate_tokens(compact[1]) * 2 < estimate_tokens(full[1])
+
+
+def test_compact_context_drops_nulls_and_uses_short_keys(sample_weather_result):
+    context = _context(sample_weather_result)
+    data = compact_context(context)
+
+    assert data["c"] == "東京"
+    assert data["t"] == 25 and isinstance(data["t"], int)
+    assert "sp" not in data  # null は送らない
+    assert "fc" not in data  # 現在の天気
+    assert data["u"] == 0 and data["cf"] == context.comfort.level
+
+
+def test_estimate_tokens_counts_non_ascii_per_char():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens("東京") == 2
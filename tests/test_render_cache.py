@@ -0,0 +1,70 @@
+from dataclasses import replace
+from unittest.mock import patch
+
+from aerocast import rules
+from aerocast.advice_engine import build_advice
+from aerocast.formatter import format_to_markdown
+from aerocast.render_cache import RenderCache, RenderedReply, clear_render_cache, render_key, render_reply
+from aerocast.weather_summary import build_summary
+
+
+def test_render_reply_matches_uncached_pipeline(sample_weather_result):
+    clear_render_cache()
+
+    rendered = render_reply(sample_weather_result, days_offset=1)
+
+    expected = format_to_markdown(
+        build_summary(sample_weather_result, days_offset=1),
+        build_advice(sample_weather_result),
+    )
+    assert rendered.markdown == expected
+    assert rendered.judgement["umbrella"] == {"needed": False, "rain_code": "RAIN_PROB_LT_40"}
+
+
+def test_render_reply_is_served_from_cache(sample_weather_result):
+    clear_render_cache()
+    render_reply(sample_weather_result, days_offset=0)
+
+    with patch("aerocast.render_cache.format_to_markdown") as mock_format:
+        rendered = render_reply(replace(sample_weather_result), days_offset=0)
+
+    mock_format.assert_not_called()
+    assert rendered.markdown.startswith("## 東京")
+
+
+def test_cached_judgement_is_not_shared(sample_weather_result):
+    clear_render_cache()
+    first = render_reply(sample_weather_result)
+    first.judgement["wind"]["alert"] = True
+
+    assert render_reply(sample_weather_result).judgement["wind"]["alert"] is False
+
+
+def test_render_key_depends_on_content_days_and_date(sample_weather_result):
+    base = render_key(sample_weather_result, 0, "2026-03-13")
+
+    assert render_key(replace(sample_weather_result), 0, "2026-03-13") == base
+    assert render_key(replace(sample_weather_result, rain_probability=80), 0, "2026-03-13") != base
+    assert render_key(sample_weather_result, 3, "2026-03-13") != base
+    assert render_key(sample_weather_result, 0, "2026-03-14") != base
+
+
+def test_decisions_are_made_once_per_render(sample_weather_result):
+    clear_render_cache()
+    with patch("aerocast.rules.decide_umbrella", wraps=rules.decide_umbrella) as mock_decide:
+        render_reply(sample_weather_result)
+
+    assert mock_decide.call_count == 1
+
+
+def test_render_cache_evicts_least_recently_used():
+    cache = RenderCache(maxsize=2)
+    reply = RenderedReply(markdown="x", judgement={})
+    cache.put("a", reply)
+    cache.put("b", reply)
+    cache.get("a")
+    cache.put("c", reply)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is reply
+    assert len(cache) == 2
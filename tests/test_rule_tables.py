@@ -0,0 +1,127 @@
+import json
+import os
+
+import pytest
+
+from aerocast.models import WeatherResult
+from aerocast.rule_tables import RuleStore, RuleTable, compile_rules, get_rule_store, set_rule_store
+from aerocast.rules import decide_all, decide_comfort, decide_umbrella
+
+
+def _weather(pop=0, wind=2.0, feels_like=20.0):
+    return WeatherResult(
+        city="東京",
+        weather="晴れ",
+        temp=feels_like,
+        feels_like=feels_like,
+        humidity=60,
+        rain_probability=pop,
+        wind_speed=wind,
+        type="current",
+    )
+
+
+def _write(path, data, mtime):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def store(tmp_path):
+    previous = get_rule_store()
+    path = tmp_path / "rules.json"
+    _write(path, {
+        "umbrella": {"bounds": [40], "codes": ["RAIN_PROB_LT_40", "RAIN_PROB_GE_40"], "flags": [False, True]},
+        "comfort": {"bounds": [5, 15, 25], "codes": ["COLD", "COOL", "WARM", "HOT"]},
+    }, 1_000_000_000)
+    s = RuleStore(str(path), check_interval=0)
+    set_rule_store(s)
+    yield s, path
+    set_rule_store(previous)
+
+
+def test_table_bands():
+    table = RuleTable(bounds=(10.0, 20.0, 30.0), codes=("COLD", "COOL", "WARM", "HOT"))
+    assert [table.code(v) for v in (-5, 9.99, 10, 19.9, 20, 30, 45)] == [
+        "COLD", "COLD", "COOL", "COOL", "WARM", "HOT", "HOT",
+    ]
+    assert table.code(float("nan")) == "COLD"
+    assert table.indices([9.99, 10, 30, float("nan")]).tolist() == [0, 1, 3, 0]
+
+
+@pytest.mark.parametrize("table", [
+    {"bounds": [10], "codes": ["NO_RAIN"]},
+    {"bounds": [20, 10], "codes": ["NO_RAIN", "RAIN_PROB_LT_40", "RAIN_PROB_GE_40"]},
+    {"bounds": [40], "codes": ["RAIN_PROB_LT_40", "RAIN_PROB_GE_40"], "flags": [True]},
+    {"codes": ["NO_RAIN"]},
+    # 判定結果の型にないコード
+    {"bounds": [10], "codes": ["LOW", "HIGH"]},
+    {"bounds": [10], "codes": ["WIND_LT_10", "WIND_GE_10"]},
+])
+def test_invalid_tables_are_rejected(table):
+    with pytest.raises(ValueError):
+        compile_rules({"umbrella": table})
+
+
+@pytest.mark.parametrize("name, codes", [
+    ("wind", ["WIND_LT_10", "STORM"]),
+    ("comfort", ["COLD", "MILD"]),
+])
+def test_codes_must_match_decision_literals(name, codes):
+    with pytest.raises(ValueError, match="使えないコード"):
+        compile_rules({name: {"bounds": [10], "codes": codes}})
+
+
+def test_unknown_codes_keep_previous_rules(store):
+    s, path = store
+    before = s.get()
+    _write(path, {"comfort": {"bounds": [15], "codes": ["COLD", "TYPO"]}}, 4_000_000_000)
+
+    assert s.get() is before
+    assert decide_comfort(_weather(feels_like=16)).level == "WARM"
+
+
+def test_rules_are_loaded_from_file(store):
+    # umbrella と comfort を上書きし、wind は既定値のまま
+    umbrella, wind, comfort = decide_all(_weather(pop=39.9, wind=10.0, feels_like=26))
+    assert umbrella.needed is False and umbrella.rain_code == "RAIN_PROB_LT_40"
+    assert wind.alert is True
+    # 既定値なら WARM の体感温度
+    assert comfort.level == "HOT"
+    # 境界値ちょうどは上の帯に入る
+    umbrella = decide_umbrella(_weather(pop=40))
+    assert umbrella.needed is True and umbrella.rain_code == "RAIN_PROB_GE_40"
+
+
+def test_file_change_is_reloaded(store):
+    s, path = store
+    before = s.get()
+    _write(path, {"comfort": {"bounds": [15], "codes": ["COLD", "HOT"]}}, 2_000_000_000)
+
+    assert decide_comfort(_weather(feels_like=16)).level == "HOT"
+    after = s.get()
+    assert after.version == before.version + 1
+    # 取得済みのテーブルは差し替えの影響を受けない
+    assert decide_comfort(_weather(feels_like=16), before).level == "WARM"
+
+
+def test_invalid_file_keeps_previous_rules(store):
+    s, path = store
+    before = s.get()
+    path.write_text("{ broken", encoding="utf-8")
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+
+    assert s.get() is before
+    assert decide_umbrella(_weather(pop=39.9)).rain_code == "RAIN_PROB_LT_40"
+    assert decide_umbrella(_weather(pop=40)).rain_code == "RAIN_PROB_GE_40"
+
+
+def test_batch_uses_same_tables(store):
+    np = pytest.importorskip("numpy")
+    from aerocast.rules_batch import decide_batch, labels
+
+    result = decide_batch(np.array([39.9, 40.0]), np.array([9.9, 10.0]), np.array([4.9, 25.0]))
+    assert labels(result.rules.umbrella.codes, result.rain_code) == ["RAIN_PROB_LT_40", "RAIN_PROB_GE_40"]
+    assert result.umbrella_needed.tolist() == [False, True]
+    assert result.wind_alert.tolist() == [False, True]
+    assert labels(result.rules.comfort.codes, result.comfort_level) == ["COLD", "HOT"]
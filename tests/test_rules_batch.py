@@ -0,0 +1,77 @@
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from aerocast.models import WeatherResult
+from aerocast.rules import (
+    decide_umbrella,
+    decide_wind,
+    decide_comfort,
+    RAIN_UMBRELLA_THRESHOLD,
+    WIND_ALERT_THRESHOLD,
+)
+from aerocast.rules_batch import (
+    COMFORT_LEVELS,
+    RAIN_CODES,
+    WIND_CODES,
+    decide_batch,
+    decide_results_batch,
+    labels,
+)
+
+
+def _weather(pop, wind, feels_like):
+    return WeatherResult(
+        city="東京",
+        weather="晴れ",
+        temp=feels_like,
+        feels_like=feels_like,
+        humidity=60,
+        rain_probability=pop,
+        wind_speed=wind,
+        type="forecast",
+    )
+
+
+def _assert_same_as_scalar(results):
+    batch = decide_results_batch(results)
+    assert labels(RAIN_CODES, batch.rain_code) == [decide_umbrella(w).rain_code for w in results]
+    assert batch.umbrella_needed.tolist() == [decide_umbrella(w).needed for w in results]
+    assert labels(WIND_CODES, batch.wind_code) == [decide_wind(w).reason_code for w in results]
+    assert batch.wind_alert.tolist() == [decide_wind(w).alert for w in results]
+    assert labels(COMFORT_LEVELS, batch.comfort_level) == [decide_comfort(w).level for w in results]
+
+
+def test_matches_scalar_rules_at_thresholds():
+    """test_rules.py と同じ境界値"""
+    results = [
+        _weather(RAIN_UMBRELLA_THRESHOLD, 5.0, 20.0),
+        _weather(RAIN_UMBRELLA_THRESHOLD - 1, 3.0, 25.0),
+        _weather(0, WIND_ALERT_THRESHOLD, 20.0),
+        _weather(0, WIND_ALERT_THRESHOLD - 1, 20.0),
+        _weather(0, 2.0, 30.0),
+        _weather(0, 2.0, 25.0),
+        _weather(0, 2.0, 15.0),
+        _weather(0, 2.0, 5.0),
+        _weather(0, 2.0, 10.0),
+        _weather(0, 2.0, 9.999),
+        _weather(0, 2.0, math.nan),
+    ]
+    _assert_same_as_scalar(results)
+
+
+def test_matches_scalar_rules_random():
+    rnd = random.Random(0)
+    results = [
+        _weather(rnd.randint(0, 100), round(rnd.uniform(0, 25), 1), round(rnd.uniform(-15, 40), 1))
+        for _ in range(2000)
+    ]
+    _assert_same_as_scalar(results)
+
+
+def test_length_mismatch_raises():
+    with pytest.raises(ValueError):
+        decide_batch([10, 20], [1.0], [20.0, 21.0])
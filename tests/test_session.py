@@ -0,0 +1,303 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from aerocast.session import ConversationContext, SessionManager, SQLiteSessionBackend
+
+
+def test_get_context_creates_and_reuses_context():
+    manager = SessionManager(num_shards=4)
+
+    context = manager.get_context("s1")
+    context.update(city="東京", days=1)
+
+    assert manager.get_context("s1") is context
+    assert manager.get_context("s1").last_city == "東京"
+    assert len(manager) == 1
+
+
+def test_num_shards_must_be_power_of_two():
+    with pytest.raises(ValueError):
+        SessionManager(num_shards=3)
+
+
+def test_clear_session_removes_context():
+    manager = SessionManager(num_shards=4)
+    manager.get_context("s1").update(city="大阪")
+
+    manager.clear_session("s1")
+
+    assert manager.get_context("s1").last_city is None
+
+
+def test_cleanup_expired_skips_sessions_in_use():
+    manager = SessionManager(num_shards=4)
+    stale = datetime.now() - timedelta(hours=1)
+    manager.get_context("idle").last_updated = stale
+
+    with manager.session("busy") as busy:
+        busy.last_updated = stale
+        manager.cleanup_expired()
+
+    assert len(manager) == 1
+
+
+def test_session_scope_serializes_same_session_updates():
+    """同一セッションの読み書きが交互に混ざらないこと（更新の取りこぼしがない）"""
+    manager = SessionManager(num_shards=4)
+    manager.get_context("s1").update(days=0)
+    n_threads, n_iter = 8, 200
+
+    def worker():
+        for _ in range(n_iter):
+            with manager.session("s1") as context:
+                days = context.last_days
+                # 読み取りと書き込みの間でスレッド切り替えを誘発する
+                threading.Event().wait(0)
+                context.update(days=days + 1)
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert manager.get_context("s1").last_days == n_threads * n_iter
+
+
+def test_expired_context_is_cleared_on_access():
+    manager = SessionManager(num_shards=4)
+    context = manager.get_context("s1")
+    context.update(city="札幌")
+    context.last_updated = datetime.now() - ConversationContext().session_timeout - timedelta(seconds=1)
+
+    with manager.session("s1") as current:
+        assert current.last_city is None
+
+
+def test_session_scope_async_serializes_same_session():
+    """同一セッションの async 処理が交互に混ざらないこと"""
+    manager = SessionManager()
+    order = []
+
+    async def turn(i):
+        async with manager.session_async("s1") as context:
+            order.append(("start", i))
+            await asyncio.sleep(0.01)
+            context.update(days=i)
+            order.append(("end", i))
+
+    async def main():
+        await asyncio.gather(turn(1), turn(2), turn(3))
+
+    asyncio.run(main())
+
+    for k in range(0, len(order), 2):
+        assert order[k][0] == "start"
+        assert order[k + 1] == ("end", order[k][1])
+
+
+def test_cancelled_async_waiter_does_not_keep_lock():
+    manager = SessionManager()
+
+    async def main():
+        holder_entered = asyncio.Event()
+        release = asyncio.Event()
+
+        async def holder():
+            async with manager.session_async("s1"):
+                holder_entered.set()
+                await release.wait()
+
+        async def waiter():
+            async with manager.session_async("s1"):
+                pass
+
+        h = asyncio.create_task(holder())
+        await holder_entered.wait()
+        w = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        w.cancel()
+        release.set()
+        await h
+        # 取り消された待機者がロックを残していなければ、次のターンはすぐに入れる
+        await asyncio.wait_for(waiter(), timeout=1)
+
+    asyncio.run(main())
+    assert not manager._in_use("s1")
+
+
+def test_run_cleanup_removes_expired_sessions_periodically():
+    manager = SessionManager(num_shards=4)
+    manager.get_context("idle").last_updated = datetime.now() - timedelta(hours=1)
+    manager.get_context("active").update(city="東京")
+
+    async def main():
+        task = asyncio.create_task(manager.run_cleanup(interval=0.01))
+        deadline = time.monotonic() + 2
+        while len(manager) > 1:
+            assert time.monotonic() < deadline
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert manager.get_context("active").last_city == "東京"
+
+
+def test_context_is_compact():
+    """__dict__ を持たず、都市名はインターンされ、有効期限はデフォルトを共有する"""
+    a, b = ConversationContext(), ConversationContext()
+    a.update(city="".join(["東", "京"]), intent="forecast")
+    b.update(city="".join(["東", "京"]), intent="forecast")
+
+    assert not hasattr(a, "__dict__")
+    assert a.last_city is b.last_city
+    assert a.session_timeout is b.session_timeout
+    assert isinstance(a.updated_at, int)
+
+
+def test_context_custom_timeout():
+    context = ConversationContext(session_timeout=timedelta(minutes=5))
+    context.update(city="東京")
+    context.last_updated = datetime.now() - timedelta(minutes=6)
+
+    assert context.session_timeout == timedelta(minutes=5)
+    assert context.is_expired()
+
+
+class TestSQLiteSessionBackend:
+    def test_context_is_shared_between_backends(self, tmp_path):
+        """別ワーカー（別インスタンス）から同じ文脈が見えること"""
+        path = str(tmp_path / "sessions.db")
+        worker_a = SessionManager(SQLiteSessionBackend(path))
+        worker_b = SessionManager(SQLiteSessionBackend(path))
+
+        with worker_a.session("s1") as context:
+            context.update(city="東京", days=2, intent="forecast")
+        worker_a.backend.flush()
+
+        with worker_b.session("s1") as context:
+            assert context.last_city == "東京"
+            assert context.last_days == 2
+            assert context.last_intent == "forecast"
+
+        worker_a.close()
+        worker_b.close()
+
+    def test_session_async_does_io_off_the_event_loop(self, tmp_path):
+        """async 版では SQLite の読み込み・保存をイベントループのスレッドで行わないこと"""
+        backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+        manager = SessionManager(backend)
+        threads = []
+        load, save = backend.load, backend.save
+
+        def recording_load(session_id):
+            threads.append(("load", threading.get_ident()))
+            return load(session_id)
+
+        def recording_save(session_id, context):
+            threads.append(("save", threading.get_ident()))
+            save(session_id, context)
+
+        async def turn():
+            async with manager.session_async("s1") as context:
+                context.update(city="神戸")
+            return threading.get_ident()
+
+        with patch.object(backend, "load", recording_load), patch.object(backend, "save", recording_save):
+            loop_thread = asyncio.run(turn())
+
+        assert [name for name, _ in threads] == ["load", "save"]
+        assert all(ident != loop_thread for _, ident in threads)
+        assert manager.get_context("s1").last_city == "神戸"
+        manager.close()
+
+    def test_session_async_does_not_deadlock_with_small_executor(self, tmp_path):
+        """同一セッションの待機で executor が埋まっても、ロックを持つ側の読み込み・保存が進むこと"""
+        manager = SessionManager(SQLiteSessionBackend(str(tmp_path / "sessions.db")))
+
+        async def turn(session_id, i):
+            async with manager.session_async(session_id) as context:
+                await asyncio.sleep(0.01)
+                context.update(days=i)
+
+        async def main():
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2))
+            turns = [turn(sid, i) for sid in ("s1", "s2") for i in range(3)]
+            await asyncio.wait_for(asyncio.gather(*turns), timeout=5)
+
+        asyncio.run(main())
+        assert all(manager.get_context(sid).last_days is not None for sid in ("s1", "s2"))
+        manager.close()
+
+    def test_flush_against_locked_database_keeps_writes(self, tmp_path):
+        """他の接続が書き込みロックを持っていても、失敗した分を戻して後で反映すること"""
+        path = str(tmp_path / "sessions.db")
+        backend = SQLiteSessionBackend(path, busy_timeout=0.05)
+        manager = SessionManager(backend)
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            with manager.session("s1") as context:
+                context.update(city="横浜")
+            backend.flush()
+
+            # 反映できなくても文脈は失われない
+            assert manager.get_context("s1").last_city == "横浜"
+        finally:
+            other.execute("ROLLBACK")
+
+        # ロックが外れたら、反映スレッドが再試行して書き込む（スレッドは止まっていない）
+        with manager.session("s2") as context:
+            context.update(city="川崎")
+        deadline = time.monotonic() + 2
+        while other.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] < 2:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert backend._flusher.is_alive()
+        assert dict(other.execute("SELECT session_id, last_city FROM sessions")) == {"s1": "横浜", "s2": "川崎"}
+        other.close()
+        manager.close()
+
+    def test_pending_writes_are_visible_before_flush(self, tmp_path):
+        backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"), flush_interval=60)
+        manager = SessionManager(backend)
+
+        with manager.session("s1") as context:
+            context.update(city="札幌")
+
+        assert manager.get_context("s1").last_city == "札幌"
+        manager.close()
+
+    def test_clear_and_count(self, tmp_path):
+        manager = SessionManager(SQLiteSessionBackend(str(tmp_path / "sessions.db")))
+        for sid in ("s1", "s2"):
+            with manager.session(sid) as context:
+                context.update(city="大阪")
+
+        manager.clear_session("s1")
+
+        assert len(manager) == 1
+        assert manager.get_context("s1").last_city is None
+        manager.close()
+
+    def test_cleanup_expired(self, tmp_path):
+        manager = SessionManager(SQLiteSessionBackend(str(tmp_path / "sessions.db")))
+        with manager.session("old") as context:
+            context.update(city="京都")
+            context.last_updated = datetime.now() - timedelta(hours=1)
+        with manager.session("new") as context:
+            context.update(city="奈良")
+
+        manager.cleanup_expired()
+
+        assert len(manager) == 1
+        manager.close()
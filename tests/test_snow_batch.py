@@ -0,0 +1,79 @@
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from aerocast.models import WeatherResult
+from aerocast.snow_batch import build_snow_timeline, estimate_snow_probability_batch
+from aerocast.snow_estimator import estimate_snow_probability
+from aerocast.weather_api import _enrich_snow_from_forecast_item
+
+
+def test_batch_matches_scalar_on_grid():
+    pops = np.repeat(np.arange(101), 161)
+    temps = np.tile(np.round(np.arange(-4.0, 12.1, 0.1), 1), 101)
+    expected = [estimate_snow_probability(int(p), float(t)) for p, t in zip(pops, temps)]
+    assert estimate_snow_probability_batch(pops, temps).tolist() == expected
+
+
+def test_batch_matches_scalar_at_edges():
+    temps = [0.0, -0.0, 1e-9, 2.0, 2.0 - 1e-9, 4.0, 4.0 - 1e-9, math.nan, math.inf, -math.inf]
+    for pop in (0, 1, 33, 99, 100):
+        result = estimate_snow_probability_batch([pop] * len(temps), temps).tolist()
+        assert result == [estimate_snow_probability(pop, t) for t in temps]
+
+
+def test_batch_rejects_out_of_range_pop():
+    with pytest.raises(ValueError):
+        estimate_snow_probability_batch([101], [0.0])
+
+
+def _payload(n=40, seed=0):
+    rnd = random.Random(seed)
+    items = []
+    for i in range(n):
+        item = {
+            "dt": 1_767_225_600 + i * 3 * 3600,
+            "main": {"temp": round(rnd.uniform(-6, 8), 2)},
+            "pop": round(rnd.random(), 2),
+            "weather": [{"id": rnd.choice([500, 600, 601, 622, 701, 800])}],
+        }
+        r = rnd.random()
+        if r < 0.3:
+            item["snow"] = {"3h": round(rnd.uniform(0, 3), 2)}
+        elif r < 0.4:
+            item["snow"] = {}
+        items.append(item)
+    return {"list": items}
+
+
+def test_timeline_matches_per_slot_scalar_path():
+    data = _payload()
+    timeline = build_snow_timeline(data)
+    assert len(timeline) == 40
+
+    for i, item in enumerate(data["list"]):
+        w = WeatherResult(
+            city="札幌", weather="", temp=item["main"]["temp"], feels_like=0.0, humidity=0,
+            rain_probability=int(item.get("pop", 0) * 100), wind_speed=0.0,
+        )
+        _enrich_snow_from_forecast_item(w, item)
+        estimated = w.snow_probability is None
+        if estimated:
+            w.snow_probability = estimate_snow_probability(w.rain_probability, w.temp)
+
+        assert timeline.snow_probability[i] == w.snow_probability
+        assert bool(timeline.estimated[i]) is estimated
+        assert timeline.snow_volume_mm_3h[i] == (w.snow_volume_mm_3h or 0.0)
+
+    assert timeline.accumulated_mm.tolist() == pytest.approx(
+        np.cumsum([(item.get("snow") or {}).get("3h", 0.0) for item in data["list"]]).tolist()
+    )
+
+
+def test_empty_timeline():
+    timeline = build_snow_timeline({"list": []})
+    assert len(timeline) == 0
+    assert timeline.to_dict()["snow_probability"] == []
@@ -0,0 +1,123 @@
+import itertools
+import re
+import unicodedata
+
+import pytest
+
+from aerocast.intent_parser import parse_weather_intent
+from aerocast.preprocessor import normalize_user_input
+from aerocast.text_normalizer import NOISE, SEPARATOR, TIME, TRIGGER, fold, tokenize
+
+
+# ===============================
+# 旧実装（語ごとの部分文字列検索・str.replace の繰り返し）
+# ===============================
+
+_LEGACY_PHRASE_MAP = [
+    (re.compile(r"教えてく$"), "教えてください"),
+    (re.compile(r"教えて$"), "教えてください"),
+    (re.compile(r"おしえてく$"), "おしえてください"),
+    (re.compile(r"おしえて$"), "おしえてください"),
+    (re.compile(r"おしえて下さい$"), "おしえてください"),
+    (re.compile(r"教えて下さい$"), "教えてください"),
+]
+_LEGACY_TRIGGER = ["天気", "予報", "雨", "気温", "暑い", "寒い"]
+_LEGACY_NOISE = [
+    "の", "を", "について", "教えて", "教えてください", "おしえて", "おしえてください",
+    "ください", "下さい", "知りたい", "は", "って",
+]
+_LEGACY_TIME = ["今日", "明日", "明後日", "明々後日"]
+
+
+def _legacy_normalize(text):
+    t = text.strip()
+    for pat, repl in _LEGACY_PHRASE_MAP:
+        t = pat.sub(repl, t)
+    return t
+
+
+def _legacy_days(text):
+    if "今日" in text:
+        return 0
+    if "明日" in text or "あした" in text:
+        return 1
+    if "明後日" in text or "あさって" in text:
+        return 2
+    if "明々後日" in text:
+        return 3
+    m = re.search(r"(\d+)日後", text)
+    return int(m.group(1)) if m else None
+
+
+def _legacy_city(text):
+    city = text
+    for w in _LEGACY_TIME:
+        city = city.replace(w, "")
+    city = re.sub(r"\d+日後", "", city)
+    for w in _LEGACY_TRIGGER:
+        city = city.replace(w, "")
+    for w in _LEGACY_NOISE:
+        city = city.replace(w, "")
+    city = re.sub(r"[?？!！。、]", "", city)
+    city = re.sub(r"\s+", "", city)
+    return city.strip() or None
+
+
+def _legacy_parse(text, context_city=None, context_days=None):
+    text = text.strip()
+    if not any(w in text for w in _LEGACY_TRIGGER) and context_city is None:
+        return None
+    days = _legacy_days(text)
+    if days is None:
+        days = context_days if context_days is not None else 0
+    city = _legacy_city(text) or context_city
+    if not city:
+        return None
+    return city, days
+
+
+# 実際の問い合わせに近い入力（時間表現 + 都市 + トリガー + 文末）
+_TIMES = ["", "今日の", "明日の", "明後日の", "明々後日の", "3日後の", "今日 ", "明日は"]
+_CITIES = ["", "東京", "札幌", "那覇市", "ニューヨーク", "大阪府 堺市", "函館"]
+_TRIGGERS = ["", "の天気", "の天気予報", "は雨", "の気温", "暑い", "って寒い"]
+_ENDINGS = ["", "？", "?", "は？", "教えて", "おしえてください", "について知りたい", "を教えて下さい。", "！"]
+_CORPUS = ["".join(p) for p in itertools.product(_TIMES, _CITIES, _TRIGGERS, _ENDINGS)]
+
+
+def test_normalize_matches_legacy():
+    # 新しい実装は NFKC を適用してから旧実装と同じ補正を行う
+    for text in _CORPUS:
+        assert normalize_user_input(text) == _legacy_normalize(unicodedata.normalize("NFKC", text)), text
+
+
+@pytest.mark.parametrize("context", [(None, None), ("仙台", 2)])
+def test_parse_matches_legacy(context):
+    for text in _CORPUS:
+        intent = parse_weather_intent(normalize_user_input(text), *context)
+        expected = _legacy_parse(_legacy_normalize(text), *context)
+        actual = None if intent is None else (intent.city, intent.days)
+        assert actual == expected, text
+
+
+def test_tokenize_single_pass_spans():
+    tokenized = tokenize("明日の東京の天気教えて？")
+    assert tokenized.tokens == [
+        (TIME, 0, "明日"), (NOISE, 2, "の"), (NOISE, 5, "の"), (TRIGGER, 6, "天気"),
+        (NOISE, 8, "教えて"), (SEPARATOR, 11, "？"),
+    ]
+    assert tokenized.residue() == "東京"
+    assert tokenized.has_trigger and tokenized.time_days == 1
+
+
+def test_fullwidth_input_is_folded():
+    assert fold("　ＮＹの天気　") == "NYの天気"
+    intent = parse_weather_intent("３日後の東京の天気")
+    assert (intent.city, intent.days) == ("東京", 3)
+
+
+def test_kana_time_words_are_removed_from_city():
+    # 旧実装では「あさって」の「って」だけがノイズとして消え、都市名が「あさ東京」になっていた
+    intent = parse_weather_intent("あさっての東京の天気")
+    assert (intent.city, intent.days) == ("東京", 2)
+    intent = parse_weather_intent("あしたの札幌の天気")
+    assert (intent.city, intent.days) == ("札幌", 1)
@@ -0,0 +1,132 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aerocast import app as app_module
+
+from aerocast.agent_loop import _run_inner, _run_inner_async
+from aerocast.intent_parser import WeatherIntent
+from aerocast.render_cache import clear_render_cache
+from aerocast.tracing import (
+    SlowTraceBuffer,
+    Trace,
+    clear_slow_traces,
+    get_slow_traces,
+    set_slow_threshold_ms,
+    get_slow_threshold_ms,
+    input_attrs,
+    span,
+    trace_request,
+)
+
+
+def test_span_outside_trace_is_noop():
+    with span("parse"):
+        pass
+
+
+def test_trace_request_records_spans():
+    with trace_request("test") as trace:
+        with span("parse"):
+            pass
+        with span("parse"):
+            pass
+        with span("markdown"):
+            pass
+
+    assert [sp.name for sp in trace.spans] == ["parse", "parse", "markdown"]
+    assert set(trace.durations()) == {"parse", "markdown"}
+    assert trace.total_ms is not None
+
+
+def test_span_records_error_name():
+    with trace_request("test") as trace:
+        try:
+            with span("geocode"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+
+    assert trace.spans[0].error == "ValueError"
+
+
+def test_slow_trace_buffer_keeps_only_slow_and_newest_first():
+    buf = SlowTraceBuffer(capacity=2, threshold_ms=100)
+    for i, total in enumerate([50, 150, 200, 300]):
+        trace = Trace(name=f"t{i}", started_at=0)
+        trace.total_ms = total
+        buf.offer(trace)
+
+    assert [t["name"] for t in buf.snapshot()] == ["t3", "t2"]
+
+
+@patch("aerocast.agent_loop.fetch_weather")
+def test_agent_run_keeps_full_trace_when_slow(mock_fetch_weather, sample_weather_result):
+    mock_fetch_weather.return_value = sample_weather_result
+    threshold = get_slow_threshold_ms()
+    set_slow_threshold_ms(0)
+    clear_slow_traces()
+    # 返信キャッシュに当たると summary 以降のステップは実行されない
+    clear_render_cache()
+    try:
+        _run_inner("今日の東京の天気", session_id="test-trace")
+    finally:
+        set_slow_threshold_ms(threshold)
+
+    traces = get_slow_traces()
+    assert len(traces) == 1
+    names = [sp["name"] for sp in traces[0]["spans"]]
+    for name in ("normalize", "parse", "summary", "advice", "markdown"):
+        assert name in names
+    assert traces[0]["attrs"]["steps"][-1] == "format"
+    # 発話そのものは残さない
+    assert "今日の東京の天気" not in str(traces[0])
+    assert traces[0]["attrs"]["input_chars"] == len("今日の東京の天気")
+    clear_slow_traces()
+
+
+@patch("aerocast.agent_loop.fetch_weather_async")
+@patch("aerocast.agent_loop.parse_weather_intent")
+def test_async_run_attaches_trace_to_state(mock_parse, mock_fetch, sample_weather_result):
+    mock_parse.return_value = WeatherIntent(city="東京", days=0)
+    mock_fetch.return_value = sample_weather_result
+    clear_slow_traces()
+    threshold = get_slow_threshold_ms()
+    set_slow_threshold_ms(float("inf"))
+    try:
+        result = asyncio.run(_run_inner_async("x", session_id="test-trace-async"))
+    finally:
+        set_slow_threshold_ms(threshold)
+
+    assert result.location == "東京"
+    assert get_slow_traces() == []
+
+
+def test_input_attrs_keeps_only_hash_and_length():
+    attrs = input_attrs("明日の東京の天気は？")
+
+    assert set(attrs) == {"input_sha256", "input_chars"}
+    assert attrs["input_chars"] == 10
+    assert len(attrs["input_sha256"]) == 16
+    assert input_attrs("明日の大阪の天気は？")["input_sha256"] != attrs["input_sha256"]
+
+
+@pytest.mark.parametrize("configured, header, expected", [
+    (None, None, 404),
+    (None, "anything", 404),
+    ("secret", None, 403),
+    ("secret", "wrong", 403),
+    ("secret", "secret", 200),
+])
+def test_admin_traces_require_configured_token(monkeypatch, configured, header, expected):
+    if configured is None:
+        monkeypatch.delenv("AEROCAST_ADMIN_TOKEN", raising=False)
+    else:
+        monkeypatch.setenv("AEROCAST_ADMIN_TOKEN", configured)
+    headers = {"X-Admin-Token": header} if header is not None else {}
+    with TestClient(app_module.app) as client:
+        response = client.get("/admin/traces", headers=headers)
+
+    assert response.status_code == expected
@@ -1,11 +1,22 @@
+import asyncio
 from datetime import date, datetime, timezone as dt_timezone
 from unittest.mock import Mock, patch
 
+import httpx
 import pytest
 
 from aerocast.error import AmbiguousCityError, CityNotFoundError, WeatherAPIError
 from aerocast.models import WeatherResult
-from aerocast.weather_api import fetch_forecast_weather, fetch_weather, resolve_city
+from aerocast.tracing import trace_request
+from aerocast.weather_api import (
+    _current_url,
+    _forecast_url,
+    _geo_url,
+    fetch_forecast_weather,
+    fetch_weather,
+    fetch_weather_async,
+    resolve_city,
+)
 
 
 class TestResolveCity:
@@ -80,6 +91,18 @@ class TestFetchWeather:
             fetch_weather("Tokyo", 0)
 
 
+class TestBaseUrl:
+    def test_default_base_url(self, monkeypatch):
+        monkeypatch.delenv("OPENWEATHER_BASE_URL", raising=False)
+        assert _geo_url("東京", 5, "k").startswith("https://api.openweathermap.org/geo/1.0/direct?")
+
+    def test_base_url_override(self, monkeypatch):
+        monkeypatch.setenv("OPENWEATHER_BASE_URL", "http://127.0.0.1:8900/")
+        assert _geo_url("東京", 5, "k").startswith("http://127.0.0.1:8900/geo/1.0/direct?")
+        assert _current_url(35.6, 139.7, "k").startswith("http://127.0.0.1:8900/data/2.5/weather?")
+        assert _forecast_url(35.6, 139.7, "k").startswith("http://127.0.0.1:8900/data/2.5/forecast?")
+
+
 class TestFetchForecastWeather:
     @patch("aerocast.weather_api._get_openweather_key", return_value="dummy-key")
     @patch("aerocast.weather_api._SESSION")
@@ -151,3 +174,53 @@ class TestFetchForecastWeather:
 
         with pytest.raises(WeatherAPIError):
             fetch_forecast_weather("Tokyo", 35.6762, 139.6503, 1)
+
+
+class TestFetchWeatherAsync:
+    @patch("aerocast.weather_api._get_openweather_key", return_value="dummy-key")
+    @patch("aerocast.weather_api._get_async_client")
+    def test_fetch_weather_async_current(self, mock_client, _mock_key):
+        now = int(datetime.now(dt_timezone.utc).timestamp())
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/geo/1.0/direct":
+                return httpx.Response(200, json=[{"name": "東京", "lat": 35.6, "lon": 139.7}])
+            if request.url.path == "/data/2.5/weather":
+                return httpx.Response(200, json={
+                    "weather": [{"description": "晴れ"}],
+                    "main": {"temp": 1.0, "feels_like": -1.0, "humidity": 50},
+                    "wind": {"speed": 2.0},
+                })
+            return httpx.Response(200, json={"list": [
+                {"dt": now + 3600, "pop": 0.6, "weather": [{"id": 800}]},
+            ]})
+
+        mock_client.return_value = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        async def run():
+            with trace_request("test") as trace:
+                return await fetch_weather_async("東京", 0), trace
+
+        result, trace = asyncio.run(run())
+
+        assert {"geocode", "fetch_current", "fetch_nowcast"} <= set(trace.durations())
+        assert result.weather == "晴れ"
+        assert result.rain_probability == 60
+        # 0℃ < 気温 < 2℃ なので推定モデルで 60 * 0.7
+        assert result.snow_probability == 42
+
+    @pytest.mark.parametrize("days", [0, 1])
+    @patch("aerocast.retry._backoff_delay", return_value=0)
+    @patch("aerocast.weather_api._get_openweather_key", return_value="dummy-key")
+    @patch("aerocast.weather_api._get_async_client")
+    def test_non_json_body_raises_weather_api_error(self, mock_client, _mock_key, _mock_delay, days):
+        """200 でも JSON でない本文（プロキシのエラーページなど）は同期版と同じく WeatherAPIError"""
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/geo/1.0/direct":
+                return httpx.Response(200, json=[{"name": "東京", "lat": 35.6, "lon": 139.7}])
+            return httpx.Response(200, text="<html>Bad Gateway</html>", headers={"content-type": "text/html"})
+
+        mock_client.return_value = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        with pytest.raises(WeatherAPIError):
+            asyncio.run(fetch_weather_async("東京", days))